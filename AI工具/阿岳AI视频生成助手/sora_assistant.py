@@ -13,6 +13,14 @@ Sora视频助手（完整优化版）
 9.  支持ICO文件打包（无需和EXE同目录）
 10. 启动默认最大化窗口
 11. 新增Markdown解析功能：基于markdown+bs4将MD转为纯文本
+12. 提交引擎：共享连接池 + 令牌桶限流 + 并发上限，429/5xx指数退避重试
+13. 状态轮询：到期任务并发查询，按进度速度/任务年龄自适应查询间隔，有变化才保存
+14. 任务列表增量刷新：只更新变化的行，后台线程的刷新请求按帧合并，历史任务分页显示
+15. 任务日志：追加写入JSONL（只写变化的字段），定期压缩；参考图按内容哈希单独存放
+16. 参考图内容寻址缓存：同一张图只编码/存储一次，任务只保存哈希，提交时才读取Base64
+17. 下载管理：限制同时下载数，共享连接池，Range断点续传到.part文件，校验容器后原子改名
+18. Base64简写快速判断：长度阈值 + 首尾有限长度的字符集检查，不解码、不复制大字符串
+19. 批量导入：流式读取CSV/JSONL/Markdown提示词，套用前缀/后缀，去重后后台加入提交队列
 """
 import sys  # 新增：用于获取打包后的临时目录
 import os
@@ -21,20 +29,33 @@ from tkinter import filedialog, messagebox, Menu
 import ttkbootstrap as ttkb
 from ttkbootstrap.constants import *
 import requests
-import urllib3
 import threading
 import time
 import json
 import uuid
 import base64
-import re
+import hashlib
+import io
+import csv
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from markdown_it import MarkdownIt
 from mdit_plain.renderer import RendererPlain
-from dataclasses import dataclass, field
 from typing import List
 
-# 屏蔽不安全的HTTPS请求警告
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# 无GUI的接口客户端（与压测脚本共用）：任务数据类、Base64简写、限流/重试、提交/查询、轮询间隔、下载
+from sora_client import (
+    DOWNLOAD_CONCURRENCY, DEFAULT_SUBMIT_CONCURRENCY, DEFAULT_SUBMIT_RATE, DEFAULT_SUBMIT_BURST,
+    POLL_CONCURRENCY, POLL_TICK, SoraTask, shorten_base64_in_data, create_http_session, TokenBucket,
+    WorkQueue, build_submit_params, submit_video, apply_submit_result, query_video, apply_query_result,
+    schedule_next_poll, download_file
+)
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
 
 
 # ==================== 资源路径兼容（打包/开发环境） ====================
@@ -60,11 +81,27 @@ APP_NAME = "Sora视频助手4.2"
 ICON_FILE = get_resource_path("../阿岳AI视频生成助手/4odpx-r40oi-001.ico")  # 兼容打包/开发环境的ICO路径
 API_FILE_PATH = "../阿岳veo视频生成助手/api.txt"
 CONFIG_FILE = "../阿岳AI视频生成助手/config.json"
-TASKS_CACHE_FILE = "../阿岳AI视频生成助手/tasks.json"
+TASKS_CACHE_FILE = "../阿岳AI视频生成助手/tasks.json"  # 旧版整体保存的任务文件，仅用于首次迁移
+TASKS_JOURNAL_FILE = "../阿岳AI视频生成助手/tasks.jsonl"
+REF_IMAGE_DIR = "../阿岳AI视频生成助手/ref_images"
 DEFAULT_DOWNLOAD_DIR = "./sora_videos"
 MAX_HISTORY_COUNT = 10
-VIDEO_DOWNLOAD_TIMEOUT = 300
-MIN_VALID_VIDEO_SIZE = 10240
+# 任务有变化时最短保存间隔（秒）
+SAVE_INTERVAL = 5.0
+# 任务日志行数超过 max(最小行数, 任务数×倍数) 时压缩
+JOURNAL_COMPACT_MIN_LINES = 1000
+JOURNAL_COMPACT_RATIO = 3
+
+# 参考图：最长边超过该值时缩小后重新编码（需要Pillow），内存中保留的Base64个数，
+# 未被任务引用且超过该秒数的缓存文件在日志压缩时删除
+REF_IMAGE_MAX_SIDE = 1920
+REF_IMAGE_MEMORY_ITEMS = 8
+REF_IMAGE_GC_AGE = 3600
+
+# 任务列表：每页行数、合并刷新间隔（毫秒）
+TASK_PAGE_SIZE = 200
+TREE_REFRESH_MS = 50
+STATUS_ICONS = {"pending": "⚪", "running": "🔵", "succeeded": "🟢", "failed": "🔴"}
 
 DEFAULT_API_HOSTS = [
     "https://grsai.dakka.com.cn",
@@ -119,58 +156,111 @@ def parse_markdown_text_to_plain(md_text: str) -> str:
         return md_text.strip()
 
 
-# ==================== 辅助函数：Base64判断与简写 ====================
-def is_base64(s: str) -> bool:
-    """判断字符串是否为标准超长Base64格式"""
-    if not s:
-        return False
-    try:
-        s_stripped = s.rstrip('=')
-        if not re.fullmatch(r'[A-Za-z0-9+/]+', s_stripped):
-            return False
-        base64.b64decode(s, validate=True)
-        return len(s) > 100
-    except (base64.binascii.Error, ValueError):
-        return False
+# ==================== 批量导入提示词 ====================
+# 导入文件的列名/字段名（不区分大小写）→ SoraTask字段
+IMPORT_FIELD_ALIASES = {
+    "prompt": "main_prompt", "main": "main_prompt", "main_prompt": "main_prompt", "主体": "main_prompt",
+    "prefix": "prefix_prompt", "prefix_prompt": "prefix_prompt", "前缀": "prefix_prompt",
+    "suffix": "suffix_prompt", "suffix_prompt": "suffix_prompt", "后缀": "suffix_prompt",
+    "prefix_template": "prefix_template", "前缀模板": "prefix_template",
+    "suffix_template": "suffix_template", "后缀模板": "suffix_template",
+    "ref_image": "ref_image_path", "ref": "ref_image_path", "ref_image_path": "ref_image_path", "参考图": "ref_image_path",
+    "aspect_ratio": "aspect_ratio", "aspect": "aspect_ratio", "比例": "aspect_ratio",
+    "duration": "duration", "时长": "duration",
+    "size": "size", "清晰度": "size"
+}
+IMPORT_FILE_TYPES = [("提示词文件", "*.csv *.jsonl *.ndjson *.md *.markdown *.txt")]
+# 每导入多少条输出一次进度；无效记录最多逐条提示多少次
+IMPORT_LOG_EVERY = 500
+# 导入的任务按批交给界面线程加入任务列表（self.tasks只在界面线程修改）
+IMPORT_BATCH_SIZE = 200
+IMPORT_MAX_WARNINGS = 20
 
 
-def shorten_base64_in_data(data: dict or list or str) -> dict or list or str:
-    """递归遍历数据，将超长Base64简写为"base64" """
-    if isinstance(data, dict):
-        for key, value in data.items():
-            data[key] = shorten_base64_in_data(value)
-        return data
-    elif isinstance(data, list):
-        return [shorten_base64_in_data(item) for item in data]
-    elif isinstance(data, str) and is_base64(data):
-        return "base64"
+def iter_prompt_records(path: str):
+    """
+    流式读取批量提示词文件，逐条产出 (行号, 记录)，不把整个文件读进内存
+    CSV：首行为列名；JSONL：每行一个对象或字符串；
+    Markdown/TXT：单独一行 --- 分隔每条（没有 --- 时空行分隔的段落各为一条），转为纯文本
+    无法解析的JSONL行产出记录None
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    elif ext in (".jsonl", ".ndjson"):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield line_no, {"prompt": record} if isinstance(record, str) else record
+    elif ext in (".md", ".markdown", ".txt"):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            has_separator = any(line.strip() == "---" for line in f)
+            f.seek(0)
+            block, start = [], 1
+            for line_no, line in enumerate(f, 1):
+                is_break = line.strip() == "---" if has_separator else not line.strip()
+                if is_break:
+                    if "".join(block).strip():
+                        yield start, {"prompt": parse_markdown_text_to_plain("".join(block))}
+                    block, start = [], line_no + 1
+                else:
+                    block.append(line)
+            if "".join(block).strip():
+                yield start, {"prompt": parse_markdown_text_to_plain("".join(block))}
     else:
-        return data
-
-
-# ==================== 任务数据类 ====================
-@dataclass
-class SoraTask:
-    task_id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    prefix_prompt: str = ""
-    main_prompt: str = ""
-    suffix_prompt: str = ""
-    full_prompt: str = ""
-    ref_image_path: str = ""
-    ref_image_base64: str = ""
-    aspect_ratio: str = "16:9"
-    duration: int = 15
-    size: str = "small"
-    status: str = "pending"
-    progress: int = 0
-    error: str = ""
-    api_task_id: str = ""
-    video_url: str = ""
-    remove_watermark: bool = True
-    download_path: str = ""
-    download_failed: bool = False
-    request_json: str = ""
-    response_json: str = ""
+        raise ValueError(f"不支持的文件类型：{ext}（支持 CSV / JSONL / Markdown）")
+
+
+def normalize_prompt_record(record, base_dir: str, defaults: dict) -> dict:
+    """
+    把一条导入记录转为SoraTask字段：未填写的前缀/后缀/比例/时长/清晰度取界面当前值，
+    前缀/后缀模板按名称套用，参考图相对路径按导入文件所在目录解析
+    :raises ValueError: 记录无效
+    """
+    if not isinstance(record, dict):
+        raise ValueError("无法解析")
+    fields = {}
+    for key, value in record.items():
+        target = IMPORT_FIELD_ALIASES.get(str(key).strip().lower())
+        if target and value is not None and str(value).strip():
+            fields[target] = str(value).strip()
+    if not fields.get("main_prompt"):
+        raise ValueError("主体提示词为空")
+
+    for side in ("prefix", "suffix"):
+        template = fields.pop(f"{side}_template", None)
+        if template is not None and f"{side}_prompt" not in fields:
+            if template not in defaults[f"{side}_templates"]:
+                raise ValueError(f"未知的{'前缀' if side == 'prefix' else '后缀'}模板：{template}")
+            fields[f"{side}_prompt"] = defaults[f"{side}_templates"][template]
+        fields.setdefault(f"{side}_prompt", defaults[f"{side}_prompt"])
+
+    fields.setdefault("aspect_ratio", defaults["aspect_ratio"])
+    fields.setdefault("size", defaults["size"])
+    if fields["aspect_ratio"] not in ("16:9", "9:16"):
+        raise ValueError(f"视频比例只能是16:9或9:16：{fields['aspect_ratio']}")
+    if fields["size"] not in ("small", "large"):
+        raise ValueError(f"清晰度只能是small或large：{fields['size']}")
+    duration = fields.get("duration", defaults["duration"])
+    try:
+        fields["duration"] = int(float(duration))
+    except (ValueError, OverflowError):
+        raise ValueError(f"时长不是数字：{duration}")
+    if fields["duration"] not in (10, 15):
+        raise ValueError(f"时长只能是10或15秒：{fields['duration']}")
+
+    if fields.get("ref_image_path"):
+        fields["ref_image_path"] = os.path.normpath(os.path.join(base_dir, os.path.expanduser(fields["ref_image_path"])))
+    fields["full_prompt"] = f"{fields['prefix_prompt']} {fields['main_prompt']} {fields['suffix_prompt']}".strip()
+    return fields
 
 
 # ==================== 配置读写函数 ====================
@@ -183,7 +273,10 @@ def load_config():
         "main_templates": DEFAULT_MAIN_TEMPLATES,
         "suffix_templates": DEFAULT_SUFFIX_TEMPLATES,
         "api_host": DEFAULT_API_HOSTS[0],
-        "api_hosts": DEFAULT_API_HOSTS
+        "api_hosts": DEFAULT_API_HOSTS,
+        "submit_concurrency": DEFAULT_SUBMIT_CONCURRENCY,
+        "submit_rate": DEFAULT_SUBMIT_RATE,
+        "submit_burst": DEFAULT_SUBMIT_BURST
     }
     if not os.path.exists(CONFIG_FILE):
         return default
@@ -223,37 +316,245 @@ def save_api_key(key):
         return False
 
 
-def save_tasks(tasks: List[SoraTask]):
-    try:
-        data = [vars(t) for t in tasks]
-        with open(TASKS_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except:
-        pass
-
-
 def load_tasks() -> List[SoraTask]:
+    """读取旧版tasks.json（只在任务日志不存在时迁移用）"""
     if not os.path.exists(TASKS_CACHE_FILE):
         return []
     try:
         with open(TASKS_CACHE_FILE, "r", encoding="utf-8") as f:
             data = json.load(f)
-        return [SoraTask(**item) for item in data]
+        tasks = []
+        for item in data:
+            # 旧版任务内嵌参考图Base64，迁移时转存到参考图缓存
+            encoded = item.pop("ref_image_base64", "")
+            if encoded:
+                item["ref_image_hash"] = store_ref_image_blob(encoded)
+            tasks.append(SoraTask(**item))
+        return tasks
     except:
         return []
 
 
-# ==================== 工具函数 ====================
-def image_to_base64(path: str) -> str:
+# ==================== 参考图缓存（内容寻址） ====================
+def store_ref_image_blob(encoded: str, blob_dir: str = REF_IMAGE_DIR) -> str:
+    """参考图Base64按内容哈希存为单独文件（已存在则只刷新修改时间），返回哈希"""
+    digest = hashlib.sha256(encoded.encode("ascii")).hexdigest()
+    path = os.path.join(blob_dir, f"{digest}.b64")
+    if touch_ref_image_blob(digest, blob_dir):
+        return digest
+    os.makedirs(blob_dir, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="ascii") as f:
+        f.write(encoded)
+    os.replace(tmp_path, path)
+    return digest
+
+
+def touch_ref_image_blob(digest: str, blob_dir: str = REF_IMAGE_DIR) -> bool:
+    """
+    复用已有的参考图文件时刷新修改时间：日志压缩只保留日志中引用的和最近修改的文件，
+    刷新后刚被重新引用、还没写入日志的旧文件不会被清理
+    :return: 文件是否存在
+    """
     try:
-        if not os.path.exists(path):
-            return ""
-        with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
-    except:
+        os.utime(os.path.join(blob_dir, f"{digest}.b64"))
+        return True
+    except OSError:
+        return False
+
+
+def load_ref_image_blob(digest: str, blob_dir: str = REF_IMAGE_DIR) -> str:
+    try:
+        with open(os.path.join(blob_dir, f"{digest}.b64"), "r", encoding="ascii") as f:
+            return f.read()
+    except OSError:
         return ""
 
 
+def encode_ref_image(path: str) -> str:
+    """
+    读取参考图并转为Base64；安装了Pillow且最长边超过REF_IMAGE_MAX_SIDE时先等比缩小再编码
+    （有透明通道的保存为PNG，其余保存为JPEG）
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if HAS_PIL:
+        try:
+            with Image.open(io.BytesIO(raw)) as img:
+                if max(img.size) > REF_IMAGE_MAX_SIDE:
+                    img.thumbnail((REF_IMAGE_MAX_SIDE, REF_IMAGE_MAX_SIDE))
+                    buffer = io.BytesIO()
+                    if img.mode in ("RGBA", "LA", "P"):
+                        img.save(buffer, format="PNG", optimize=True)
+                    else:
+                        img.convert("RGB").save(buffer, format="JPEG", quality=90)
+                    raw = buffer.getvalue()
+        except Exception:
+            pass  # 无法识别的格式按原文件上传
+    return base64.b64encode(raw).decode("ascii")
+
+
+class RefImageCache:
+    """
+    参考图内容寻址缓存：哈希 → Base64文件（ref_images/哈希.b64）
+    同一文件（路径+修改时间+大小不变）只编码一次；任务只保存哈希，提交时才读取Base64，
+    内存中只保留最近用到的几张
+    """
+
+    def __init__(self, blob_dir=REF_IMAGE_DIR, memory_items=REF_IMAGE_MEMORY_ITEMS):
+        self.blob_dir = blob_dir
+        self.memory_items = memory_items
+        self.file_hashes = {}  # (绝对路径, 修改时间, 大小) → 哈希
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add_file(self, path: str) -> str:
+        """登记参考图文件，返回哈希（文件不存在/读取失败时返回空字符串）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return ""
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+        with self.lock:
+            digest = self.file_hashes.get(key)
+        if digest and touch_ref_image_blob(digest, self.blob_dir):
+            return digest
+        try:
+            digest = store_ref_image_blob(encode_ref_image(path), self.blob_dir)
+        except OSError:
+            return ""
+        with self.lock:
+            self.file_hashes[key] = digest
+        return digest
+
+    def get_base64(self, digest: str) -> str:
+        """按哈希取Base64（最近用过的从内存取，否则读缓存文件）"""
+        if not digest:
+            return ""
+        with self.lock:
+            if digest in self.memory:
+                self.memory.move_to_end(digest)
+                return self.memory[digest]
+        encoded = load_ref_image_blob(digest, self.blob_dir)
+        if encoded:
+            with self.lock:
+                self.memory[digest] = encoded
+                while len(self.memory) > self.memory_items:
+                    self.memory.popitem(last=False)
+        return encoded
+
+    def restore(self, digest: str, path: str) -> str:
+        """缓存文件丢失时从原图片重新编码；原图片不存在或内容已变（哈希不同）时返回空字符串"""
+        if not path or self.add_file(path) != digest:
+            return ""
+        return self.get_base64(digest)
+
+
+# ==================== 任务日志（追加写入 + 压缩） ====================
+class TaskJournal:
+    """
+    任务日志（JSONL）：新任务写一行完整记录，之后只追加变化的字段，删除写删除记录；
+    参考图只记内容哈希（Base64在参考图缓存中）；日志行数过多时按当前状态重写（压缩）
+    """
+
+    def __init__(self, path=TASKS_JOURNAL_FILE, blob_dir=REF_IMAGE_DIR):
+        self.path = path
+        self.blob_dir = blob_dir
+        self.snapshots = {}  # task_id → 上次写入的记录
+        self.lines = 0
+        self.lock = threading.Lock()
+
+    def load(self) -> List[SoraTask]:
+        """回放日志得到任务列表；日志不存在时从旧版tasks.json迁移"""
+        if not os.path.exists(self.path):
+            tasks = load_tasks() if os.path.exists(TASKS_CACHE_FILE) else []
+            self.write(tasks)
+            return tasks
+
+        records = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                self.lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 写入中断留下的半行
+                op = entry.get("op")
+                if op == "put":
+                    records[entry["task"]["task_id"]] = entry["task"]
+                elif op == "update" and entry["id"] in records:
+                    records[entry["id"]].update(entry["fields"])
+                elif op == "delete":
+                    for task_id in entry["ids"]:
+                        records.pop(task_id, None)
+
+        tasks = []
+        for task_id, record in records.items():
+            self.snapshots[task_id] = dict(record)
+            tasks.append(SoraTask(**{k: v for k, v in record.items() if k in SoraTask.__dataclass_fields__}))
+        return tasks
+
+    def write(self, tasks):
+        """追加写入任务的变化（新任务写完整记录，已有任务只写变化的字段）"""
+        with self.lock:
+            entries = []
+            for task in tasks:
+                record = vars(task).copy()
+                old = self.snapshots.get(task.task_id)
+                if old is None:
+                    entries.append({"op": "put", "task": record})
+                else:
+                    fields = {k: v for k, v in record.items() if old.get(k) != v}
+                    if not fields:
+                        continue
+                    entries.append({"op": "update", "id": task.task_id, "fields": fields})
+                self.snapshots[task.task_id] = record
+            self._append(entries)
+
+    def remove(self, task_ids):
+        """追加删除记录"""
+        with self.lock:
+            task_ids = [task_id for task_id in task_ids if self.snapshots.pop(task_id, None) is not None]
+            if task_ids:
+                self._append([{"op": "delete", "ids": task_ids}])
+
+    def _append(self, entries):
+        if not entries:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+        self.lines += len(entries)
+
+    def needs_compaction(self):
+        return self.lines > max(JOURNAL_COMPACT_MIN_LINES, len(self.snapshots) * JOURNAL_COMPACT_RATIO)
+
+    def compact(self):
+        """按当前状态重写日志（每个任务一行，写临时文件后原子替换），并删除不再引用的旧参考图"""
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in self.snapshots.values():
+                    f.write(json.dumps({"op": "put", "task": record}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.lines = len(self.snapshots)
+
+            # 刚登记、任务还没写入日志的参考图按修改时间保留
+            referenced = {record.get("ref_image_hash") for record in self.snapshots.values()}
+            expire_before = time.time() - REF_IMAGE_GC_AGE
+            if os.path.isdir(self.blob_dir):
+                for name in os.listdir(self.blob_dir):
+                    path = os.path.join(self.blob_dir, name)
+                    if name.endswith(".b64") and name[:-4] not in referenced:
+                        try:
+                            if os.path.getmtime(path) < expire_before:
+                                os.remove(path)
+                        except OSError:
+                            pass
+
+
 # ==================== 主程序类 ====================
 class SoraVideoGenerator:
     def __init__(self, root):
@@ -289,7 +590,32 @@ class SoraVideoGenerator:
         self.main_templates = self.config.get("main_templates", DEFAULT_MAIN_TEMPLATES)
         self.suffix_templates = self.config.get("suffix_templates", DEFAULT_SUFFIX_TEMPLATES)
 
-        self.tasks = load_tasks()
+        self.store = TaskJournal()
+        self.ref_cache = RefImageCache()
+        self.tasks = self.store.load()
+        self.task_index = {t.task_id: t for t in self.tasks}
+
+        # 任务列表：当前页、是否跟随最后一页、已显示行的取值缓存、待刷新的任务
+        self.page = 0
+        self.follow_last_page = True
+        self.visible_ids = []
+        self.row_values = {}
+        self.refresh_pending = set()
+        self.refresh_full = False
+        self.refresh_lock = threading.Lock()
+
+        # 提交引擎：共享连接池会话 + 令牌桶限流 + 并发上限
+        self.session = create_http_session()
+        self.submit_bucket = TokenBucket(self.config["submit_rate"], self.config["submit_burst"])
+        self.submitter = WorkQueue(self.submit_task, self.config["submit_concurrency"], "sora-submit")
+        self.downloader = WorkQueue(self._download_video, DOWNLOAD_CONCURRENCY, "sora-download")
+
+        # 状态轮询：task_id → 轮询状态；正在查询的任务；有未保存变化的任务
+        self.poll_executor = ThreadPoolExecutor(max_workers=POLL_CONCURRENCY, thread_name_prefix="sora-poll")
+        self.poll_state = {}
+        self.polling = set()
+        self.changed_tasks = set()
+        self.state_lock = threading.Lock()
 
         # 第四步：构建UI（创建log_text等UI组件）
         self._build_ui()
@@ -299,9 +625,11 @@ class SoraVideoGenerator:
 
         # 后续初始化步骤
         self._bind_events()
-        self._update_task_tree()
+        self._render_page()
+        self._tree_refresh_pump()
         self._refresh_all_menus()
         self._start_monitor()
+        self._resume_downloads()
 
         self.log("🚀 Sora视频助手启动完成！")
 
@@ -472,6 +800,8 @@ class SoraVideoGenerator:
             side=LEFT, padx=30)
         ttkb.Button(btns, text="🗑️ 清空输入", command=self.clear_input, bootstyle="danger-outline").pack(side=RIGHT,
                                                                                                          padx=20)
+        ttkb.Button(btns, text="📥 批量导入", command=self.import_prompts_from_file, bootstyle="info-outline").pack(
+            side=RIGHT, padx=20)
         ttkb.Button(btns, text="✅ 添加任务", command=self.add_single_task, bootstyle="success").pack(side=RIGHT,
                                                                                                      padx=20)
 
@@ -506,6 +836,14 @@ class SoraVideoGenerator:
         ttkb.Button(top, text="🗑️ 清空已完成", command=self.clear_finished_tasks, bootstyle="danger", width=20).pack(
             side=LEFT, padx=10)
 
+        # 分页（只渲染当前页，启动耗时不随历史任务数增长）
+        ttkb.Button(top, text="下一页 ▶", command=lambda: self._change_page(1), bootstyle="secondary-outline",
+                    width=10).pack(side=RIGHT, padx=5)
+        self.page_label = ttkb.Label(top, text="")
+        self.page_label.pack(side=RIGHT, padx=10)
+        ttkb.Button(top, text="◀ 上一页", command=lambda: self._change_page(-1), bootstyle="secondary-outline",
+                    width=10).pack(side=RIGHT, padx=5)
+
         # 任务列表
         tree_frame = ttkb.Labelframe(self.manage_tab, text="任务列表", padding=10)
         tree_frame.pack(fill=BOTH, expand=True, padx=10, pady=10)
@@ -703,50 +1041,184 @@ class SoraVideoGenerator:
         save_config(self.config)
         self._refresh_all_menus()
 
+        # 参考图登记到内容寻址缓存，任务只保存哈希
+        ref_path = self.ref_image_path.get()
+        ref_hash = self.ref_cache.add_file(ref_path) if ref_path else ""
+        if ref_path and not ref_hash:
+            self.log(f"⚠️ 参考图读取失败，任务将不带参考图：{ref_path}")
+
         # 创建任务
         task = SoraTask(
             prefix_prompt=prefix,
             main_prompt=main,
             suffix_prompt=suffix,
             full_prompt=full_prompt,
-            ref_image_path=self.ref_image_path.get(),
-            ref_image_base64=image_to_base64(self.ref_image_path.get()),
+            ref_image_path=ref_path,
+            ref_image_hash=ref_hash,
             aspect_ratio=self.aspect_ratio.get(),
             duration=int(self.duration.get()),
             size=self.size.get()
         )
 
-        self.tasks.append(task)
-        self._update_task_tree()
+        self._add_task(task)
         self.log(f"✅ 任务添加成功 | 任务ID：{task.task_id[:8]}")
 
         # 自动提交
         if self.auto_submit.get():
-            threading.Thread(target=self.submit_task, args=(task,), daemon=True).start()
+            self.submitter.enqueue(task.task_id, task)
 
         self.clear_input()
 
-    def _update_task_tree(self):
-        """更新任务列表"""
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+    def import_prompts_from_file(self):
+        """批量导入提示词：在界面线程读取当前前缀/后缀/参数，导入本身在后台线程执行"""
+        path = filedialog.askopenfilename(filetypes=IMPORT_FILE_TYPES)
+        if not path:
+            return
+        defaults = {
+            "prefix_prompt": self.prefix_prompt.get("1.0", tk.END).strip(),
+            "suffix_prompt": self.suffix_prompt.get("1.0", tk.END).strip(),
+            "prefix_templates": dict(self.prefix_templates),
+            "suffix_templates": dict(self.suffix_templates),
+            "aspect_ratio": self.aspect_ratio.get(),
+            "duration": self.duration.get(),
+            "size": self.size.get()
+        }
+        known_prompts = {t.full_prompt for t in self.tasks}
+        self.log(f"📥 开始批量导入：{os.path.basename(path)}")
+        threading.Thread(target=self._import_prompts_worker,
+                         args=(path, defaults, self.auto_submit.get(), known_prompts), daemon=True).start()
+
+    def _import_prompts_worker(self, path, defaults, auto_submit, known_prompts):
+        """后台线程：逐条转为任务，跳过完整提示词重复的记录，按批交给界面线程加入列表"""
+        added = duplicated = invalid = 0
+        base_dir = os.path.dirname(os.path.abspath(path))
+        batch = []
+        try:
+            for line_no, record in iter_prompt_records(path):
+                try:
+                    fields = normalize_prompt_record(record, base_dir, defaults)
+                    ref_hash = self.ref_cache.add_file(fields["ref_image_path"]) if fields.get("ref_image_path") else ""
+                    if fields.get("ref_image_path") and not ref_hash:
+                        raise ValueError(f"参考图读取失败：{fields['ref_image_path']}")
+                except ValueError as e:
+                    invalid += 1
+                    if invalid <= IMPORT_MAX_WARNINGS:
+                        self.log(f"⚠️ 第 {line_no} 行已跳过：{str(e)}")
+                    continue
+                if fields["full_prompt"] in known_prompts:
+                    duplicated += 1
+                    continue
+                known_prompts.add(fields["full_prompt"])
+
+                batch.append(SoraTask(ref_image_hash=ref_hash, **fields))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self.root.after(0, self._add_imported_tasks, batch, auto_submit)
+                    batch = []
+                added += 1
+                if added % IMPORT_LOG_EVERY == 0:
+                    self.log(f"📥 已导入 {added} 条…")
+        except Exception as e:
+            self.log(f"❌ 批量导入中断：{str(e)}")
+        if batch:
+            self.root.after(0, self._add_imported_tasks, batch, auto_submit)
+        self.log(f"📥 批量导入完成 | 新增：{added} | 重复跳过：{duplicated} | 无效：{invalid}"
+                 f"{' | 已加入提交队列' if auto_submit and added else ''}")
+
+    def _add_imported_tasks(self, tasks, auto_submit):
+        """界面线程：把一批导入的任务加入列表，按需加入提交队列"""
+        for task in tasks:
+            self._add_task(task)
+            if auto_submit:
+                self.submitter.enqueue(task.task_id, task)
+
+    def _add_task(self, task):
+        """加入任务列表（索引、待保存标记、列表刷新）"""
+        self.tasks.append(task)
+        self.task_index[task.task_id] = task
+        self._mark_changed(task)
+        self._schedule_tree_refresh()
+
+    def _task_row(self, task):
+        """任务在列表中的一行：(列取值, 标签)"""
+        action = "重试" if task.status == "failed" else "下载" if task.status == "succeeded" and task.video_url else "-"
+        return (
+            task.task_id[:8],
+            task.prefix_prompt[:35] + "..." if len(task.prefix_prompt) > 35 else task.prefix_prompt,
+            task.main_prompt[:60] + "..." if len(task.main_prompt) > 60 else task.main_prompt,
+            task.suffix_prompt[:35] + "..." if len(task.suffix_prompt) > 35 else task.suffix_prompt,
+            os.path.basename(task.ref_image_path) or "无",
+            f"{STATUS_ICONS.get(task.status, '⚪')} {task.status}",
+            f"{task.progress}%",
+            task.api_task_id or "无",
+            "复用",
+            "详情",
+            action
+        ), (task.status,)
+
+    def _schedule_tree_refresh(self, task=None):
+        """
+        请求刷新任务列表（可在任意线程调用，不直接操作界面）
+        :param task: 只刷新该任务所在行；为None时按当前页重新核对全部行
+        """
+        with self.refresh_lock:
+            if task is None:
+                self.refresh_full = True
+            else:
+                self.refresh_pending.add(task.task_id)
 
-        icons = {"pending": "⚪", "running": "🔵", "succeeded": "🟢", "failed": "🔴"}
-        for task in self.tasks:
-            action = "重试" if task.status == "failed" else "下载" if task.status == "succeeded" and task.video_url else "-"
-            self.tree.insert("", "end", values=(
-                task.task_id[:8],
-                task.prefix_prompt[:35] + "..." if len(task.prefix_prompt) > 35 else task.prefix_prompt,
-                task.main_prompt[:60] + "..." if len(task.main_prompt) > 60 else task.main_prompt,
-                task.suffix_prompt[:35] + "..." if len(task.suffix_prompt) > 35 else task.suffix_prompt,
-                os.path.basename(task.ref_image_path) or "无",
-                f"{icons.get(task.status, '⚪')} {task.status}",
-                f"{task.progress}%",
-                task.api_task_id or "无",
-                "复用",
-                "详情",
-                action
-            ), tags=(task.status,))
+    def _tree_refresh_pump(self):
+        """界面线程定时合并处理刷新请求，每帧最多刷新一次"""
+        try:
+            with self.refresh_lock:
+                full, pending = self.refresh_full, self.refresh_pending
+                self.refresh_full, self.refresh_pending = False, set()
+            if full:
+                self._render_page()
+            else:
+                for task_id in pending:
+                    if task_id in self.row_values:
+                        self._update_row(self.task_index[task_id])
+        except Exception as e:
+            print(f"[任务列表刷新失败] {str(e)}")
+        self.root.after(TREE_REFRESH_MS, self._tree_refresh_pump)
+
+    def _page_count(self):
+        return max(1, (len(self.tasks) + TASK_PAGE_SIZE - 1) // TASK_PAGE_SIZE)
+
+    def _render_page(self):
+        """渲染当前页：行集合不变时只更新变化的行，末尾新增任务时只插入新行"""
+        pages = self._page_count()
+        if self.follow_last_page:
+            self.page = pages - 1
+        self.page = min(self.page, pages - 1)
+        visible = self.tasks[self.page * TASK_PAGE_SIZE:(self.page + 1) * TASK_PAGE_SIZE]
+        ids = [t.task_id for t in visible]
+
+        if ids[:len(self.visible_ids)] != self.visible_ids:
+            self.tree.delete(*self.tree.get_children())
+            self.row_values.clear()
+            self.visible_ids = []
+        for task in visible[len(self.visible_ids):]:
+            values, tags = self._task_row(task)
+            self.tree.insert("", "end", iid=task.task_id, values=values, tags=tags)
+            self.row_values[task.task_id] = values
+        for task in visible[:len(self.visible_ids)]:
+            self._update_row(task)
+        self.visible_ids = ids
+        self.page_label.config(text=f"第 {self.page + 1}/{pages} 页（共 {len(self.tasks)} 个任务）")
+
+    def _update_row(self, task):
+        """只在取值变化时更新一行"""
+        values, tags = self._task_row(task)
+        if self.row_values.get(task.task_id) != values:
+            self.tree.item(task.task_id, values=values, tags=tags)
+            self.row_values[task.task_id] = values
+
+    def _change_page(self, delta):
+        """翻页（翻到最后一页时自动跟随新任务）"""
+        self.page = max(0, min(self._page_count() - 1, self.page + delta))
+        self.follow_last_page = self.page == self._page_count() - 1
+        self._render_page()
 
     def _on_tree_click(self, event):
         """任务列表点击事件"""
@@ -757,8 +1229,7 @@ class SoraVideoGenerator:
 
         col_idx = int(col[1:]) - 1
         col_name = self.tree["columns"][col_idx]
-        task_short_id = self.tree.item(item, "values")[0]
-        task = next((t for t in self.tasks if t.task_id.startswith(task_short_id)), None)
+        task = self.task_index.get(item)
 
         if not task:
             return
@@ -877,15 +1348,14 @@ class SoraVideoGenerator:
                 suffix_prompt=task.suffix_prompt,
                 full_prompt=task.full_prompt,
                 ref_image_path=task.ref_image_path,
-                ref_image_base64=task.ref_image_base64,
+                ref_image_hash=task.ref_image_hash,
                 aspect_ratio=task.aspect_ratio,
                 duration=task.duration,
                 size=task.size
             )
-            self.tasks.append(new_task)
-            self._update_task_tree()
+            self._add_task(new_task)
             self.log(f"🔄 已创建重试任务 | 原任务ID：{task.task_id[:8]} | 新任务ID：{new_task.task_id[:8]}")
-            threading.Thread(target=self.submit_task, args=(new_task,), daemon=True).start()
+            self.submitter.enqueue(new_task.task_id, new_task)
         elif task.status == "succeeded" and task.video_url:
             # 手动下载（仅以任务ID命名）
             save_path = filedialog.asksaveasfilename(
@@ -894,8 +1364,7 @@ class SoraVideoGenerator:
             )
             if save_path:
                 self.log(f"📥 开始手动下载 | 任务ID：{task.task_id[:8]}")
-                threading.Thread(target=self._download_video, args=(task.video_url, save_path, task, False),
-                                 daemon=True).start()
+                self.downloader.enqueue(save_path, task.video_url, save_path, task, False)
 
     def submit_task(self, task):
         """提交任务"""
@@ -905,167 +1374,155 @@ class SoraVideoGenerator:
         if not host:
             task.status = "failed"
             task.error = "API接口为空"
-            self.root.after(0, self._update_task_tree)
+            self._mark_changed(task)
+            self._schedule_tree_refresh(task)
             self.log(f"❌ 任务提交失败 | 任务ID：{task.task_id[:8]} | 原因：API接口为空")
             return
 
         if not api_key:
             task.status = "failed"
             task.error = "API Key为空"
-            self.root.after(0, self._update_task_tree)
+            self._mark_changed(task)
+            self._schedule_tree_refresh(task)
             self.log(f"❌ 任务提交失败 | 任务ID：{task.task_id[:8]} | 原因：API Key为空")
             return
 
+        # 参考图缓存文件丢失（被手动删除等）时从原图片重新编码，仍取不到则不提交，避免静默去掉参考图
+        ref_image_base64 = self.ref_cache.get_base64(task.ref_image_hash)
+        if task.ref_image_hash and not ref_image_base64:
+            ref_image_base64 = self.ref_cache.restore(task.ref_image_hash, task.ref_image_path)
+            if not ref_image_base64:
+                task.status = "failed"
+                task.error = f"参考图缓存丢失，且原图片不存在或已修改：{task.ref_image_path or '无路径'}"
+                self._mark_changed(task)
+                self._schedule_tree_refresh(task)
+                self.log(f"❌ 任务提交失败 | 任务ID：{task.task_id[:8]} | 原因：{task.error}")
+                return
+
         # 更新任务状态
         task.status = "running"
-        self.root.after(0, self._update_task_tree)
+        task.error = ""
+        self._schedule_tree_refresh(task)
         self.log(f"🚀 开始提交任务 | 任务ID：{task.task_id[:8]}")
 
         # 构建请求参数
-        params = {
-            "model": "sora-2",
-            "prompt": task.full_prompt,
-            "url": task.ref_image_base64,
-            "aspectRatio": task.aspect_ratio,
-            "duration": task.duration,
-            "size": task.size,
-            "webHook": "-1",
-            "shutProgress": False
-        }
+        params = build_submit_params(task, ref_image_base64)
 
         # 处理Base64并保存请求参数
         try:
-            params_short = shorten_base64_in_data(params.copy())
+            params_short = shorten_base64_in_data(params)
             task.request_json = json.dumps(params_short, ensure_ascii=False, indent=2)
         except:
             task.request_json = f"请求参数：{str(params)}"
 
-        # 发送请求
+        def on_retry(attempt, delay, reason):
+            task.retries += 1
+            self.log(f"⏳ 任务提交重试 | 任务ID：{task.task_id[:8]} | 第{attempt}次 | 原因：{reason} | {delay:.1f}秒后重试")
+
+        # 发送请求（令牌桶限流，429/503和连接失败时退避重试；读超时和500/502/504不重试，避免重复提交收费任务）
         try:
-            r = requests.post(
-                f"{host.rstrip('/')}/v1/video/sora-video",
-                json=params,
-                headers={"Authorization": f"Bearer {api_key}"},
-                timeout=60,
-                verify=False
-            )
-            r.raise_for_status()
-            data = r.json()
+            data = submit_video(self.session, host, api_key, params, bucket=self.submit_bucket, on_retry=on_retry)
 
             # 处理响应数据
-            data_short = shorten_base64_in_data(data.copy())
+            data_short = shorten_base64_in_data(data)
             task.response_json = json.dumps(data_short, ensure_ascii=False, indent=2)
 
-            if data.get("code") == 0 and data.get("data", {}).get("id"):
-                task.api_task_id = data["data"]["id"]
-                self.log(f"✅ 任务提交成功 | 任务ID：{task.task_id[:8]} | API ID：{task.api_task_id[:8]}")
-            else:
-                raise Exception(data.get("message", "未知错误"))
+            apply_submit_result(task, data)
+            self.log(f"✅ 任务提交成功 | 任务ID：{task.task_id[:8]} | API ID：{task.api_task_id[:8]}")
         except Exception as e:
             task.status = "failed"
             task.error = str(e)
             task.response_json = f"请求失败：{str(e)}"
             self.log(f"❌ 任务提交失败 | 任务ID：{task.task_id[:8]} | 原因：{str(e)}")
 
-        self.root.after(0, self._update_task_tree)
+        self._mark_changed(task)
+        self._schedule_tree_refresh(task)
 
     def query_task(self, task):
-        """查询任务状态"""
+        """
+        查询任务状态（共享连接池会话）
+        :return: 查询是否成功；网络/HTTP错误只记日志，任务保持原状态，由轮询稍后重试
+        """
         if not task.api_task_id:
-            return
+            return False
 
         host = self.api_host.get().strip()
         api_key = self.api_key.get().strip()
+        old_values = (task.status, task.progress, task.video_url)
 
         try:
-            r = requests.post(
-                f"{host.rstrip('/')}/v1/draw/result",
-                json={"id": task.api_task_id},
-                headers={"Authorization": f"Bearer {api_key}"},
-                timeout=30,
-                verify=False
-            )
-            r.raise_for_status()
-            result = r.json()
+            result = query_video(self.session, host, api_key, task.api_task_id)
 
             # 处理响应数据
-            result_short = shorten_base64_in_data(result.copy())
+            result_short = shorten_base64_in_data(result)
             task.response_json = json.dumps(result_short, ensure_ascii=False, indent=2)
 
-            if result.get("code") != 0:
-                raise Exception(result.get("message", "查询失败"))
-
-            data = result["data"]
-            task.progress = data.get("progress", task.progress)
             old_status = task.status
-            task.status = data.get("status", task.status)
+            apply_query_result(task, result)
 
             # 任务成功，获取视频链接并自动下载（仅以任务ID命名）
-            if task.status == "succeeded" and data.get("results"):
-                task.video_url = data["results"][0].get("url", "")
+            if task.status == "succeeded" and task.video_url:
                 if self.auto_download_video.get() and not task.download_path:
                     save_path = os.path.join(self.download_dir.get(), f"{task.task_id}.mp4")
-                    threading.Thread(target=self._download_video, args=(task.video_url, save_path, task, True),
-                                     daemon=True).start()
+                    self.downloader.enqueue(save_path, task.video_url, save_path, task, True)
 
             if task.status != old_status:
                 self.log(f"📊 任务状态更新 | 任务ID：{task.task_id[:8]} | 旧状态：{old_status} | 新状态：{task.status}")
 
+        except requests.RequestException as e:
+            self.log(f"⚠️ 任务查询暂时失败，稍后重试 | 任务ID：{task.task_id[:8]} | 原因：{str(e)}")
+            return False
         except Exception as e:
             task.status = "failed"
             task.error = str(e)
             task.response_json = f"查询失败：{str(e)}"
             self.log(f"❌ 任务查询失败 | 任务ID：{task.task_id[:8]} | 原因：{str(e)}")
 
-        self.root.after(0, self._update_task_tree)
+        # 只有状态/进度/视频链接变化时才刷新列表并标记待保存
+        if (task.status, task.progress, task.video_url) != old_values:
+            self._mark_changed(task)
+            self._schedule_tree_refresh(task)
+        return True
 
     def _download_video(self, url, save_path, task, auto):
-        """下载视频（仅以任务ID命名，避免特殊字符）"""
+        """下载视频（下载线程池中执行，仅以任务ID命名，避免特殊字符）"""
         try:
-            headers = {"User-Agent": "Mozilla/5.0"}
-            r = requests.get(
-                url,
-                stream=True,
-                headers=headers,
-                timeout=VIDEO_DOWNLOAD_TIMEOUT,
-                verify=False
-            )
-            r.raise_for_status()
-
-            # 保存视频
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            total_size = 0
-            with open(save_path, "wb") as f:
-                for chunk in r.iter_content(8192):
-                    if chunk:
-                        f.write(chunk)
-                        total_size += len(chunk)
-
-            # 验证文件大小
-            if total_size < MIN_VALID_VIDEO_SIZE:
-                raise Exception(f"文件过小（{total_size} 字节），可能无效")
+            total_size = download_file(self.session, url, save_path)
 
             # 更新任务信息
             task.download_path = save_path
             task.download_failed = False
-            self.log(f"✅ 视频下载完成 | 任务ID：{task.task_id[:8]} | 保存路径：{save_path}")
+            self._mark_changed(task)
+            self.log(f"✅ 视频下载完成 | 任务ID：{task.task_id[:8]} | 大小：{total_size / 1048576:.1f}MB | 保存路径：{save_path}")
 
             if not auto:
                 messagebox.showinfo("下载成功", f"视频已保存到：\n{save_path}")
         except Exception as e:
             task.download_failed = True
+            self._mark_changed(task)
             self.log(f"❌ 视频下载失败 | 任务ID：{task.task_id[:8]} | 原因：{str(e)}")
             if not auto:
                 messagebox.showerror("下载失败", str(e))
 
+    def _resume_downloads(self):
+        """启动时继续上次中断的自动下载（下载目录中留有.part文件的已完成任务）"""
+        resumed = 0
+        for task in self.tasks:
+            if task.status == "succeeded" and task.video_url and not task.download_path:
+                save_path = os.path.join(self.download_dir.get(), f"{task.task_id}.mp4")
+                if os.path.exists(save_path + ".part") and self.downloader.enqueue(save_path, task.video_url, save_path, task, True):
+                    resumed += 1
+        if resumed:
+            self.log(f"📥 继续 {resumed} 个中断的下载")
+
     def manual_refresh_all_tasks(self):
-        """手动刷新所有任务"""
+        """手动刷新所有任务（把查询时间提前到现在，由轮询线程并发查询）"""
         refreshed_count = 0
-        for task in self.tasks:
-            if task.api_task_id and task.status in ("running", "pending"):
-                refreshed_count += 1
-                threading.Thread(target=self.query_task, args=(task,), daemon=True).start()
-                time.sleep(0.2)
+        with self.state_lock:
+            for task in self.tasks:
+                if task.api_task_id and task.status in ("running", "pending"):
+                    refreshed_count += 1
+                    self.poll_state.setdefault(task.task_id, {})["next"] = 0
 
         if refreshed_count == 0:
             self.log("ℹ️ 暂无需要刷新的任务")
@@ -1080,10 +1537,9 @@ class SoraVideoGenerator:
             self.log("ℹ️ 暂无待处理任务")
             return
 
-        self.log(f"🚀 开始批量提交 {len(pending_tasks)} 个任务")
-        for task in pending_tasks:
-            threading.Thread(target=self.submit_task, args=(task,), daemon=True).start()
-            time.sleep(0.3)
+        queued = sum(1 for task in pending_tasks if self.submitter.enqueue(task.task_id, task))
+        self.log(f"🚀 开始批量提交 {queued} 个任务（并发 {self.config['submit_concurrency']}，"
+                 f"限流 {self.config['submit_rate']} 个/秒）")
 
     def clear_finished_tasks(self):
         """清空已完成任务"""
@@ -1097,10 +1553,36 @@ class SoraVideoGenerator:
             return
 
         self.tasks = [t for t in self.tasks if t.status not in ("succeeded", "failed")]
-        self._update_task_tree()
-        save_tasks(self.tasks)
+        self.task_index = {t.task_id: t for t in self.tasks}
+        self._render_page()
+        self.store.remove([t.task_id for t in finished_tasks])
         self.log(f"🗑️ 已清空 {len(finished_tasks)} 个已完成任务")
 
+    def _mark_changed(self, task):
+        """标记任务有未保存的变化，由监控线程按SAVE_INTERVAL合并保存"""
+        with self.state_lock:
+            self.changed_tasks.add(task.task_id)
+
+    def _persist_tasks(self):
+        """把有变化的任务追加写入日志（先取走变化标记，保存期间的新变化留到下一轮）"""
+        with self.state_lock:
+            changed, self.changed_tasks = self.changed_tasks, set()
+        try:
+            self.store.write([self.task_index[i] for i in changed if i in self.task_index])
+            if self.store.needs_compaction():
+                self.store.compact()
+        except Exception as e:
+            self.log(f"⚠️ 任务保存失败：{str(e)}")
+
+    def _poll_task(self, task):
+        """轮询线程：查询一个任务，并按结果安排下次查询时间"""
+        try:
+            ok = self.query_task(task)
+        finally:
+            with self.state_lock:
+                schedule_next_poll(self.poll_state.setdefault(task.task_id, {}), task, ok, time.monotonic())
+                self.polling.discard(task.task_id)
+
     def _start_monitor(self):
         """启动任务监控"""
         if self.is_monitoring:
@@ -1110,22 +1592,40 @@ class SoraVideoGenerator:
         self.log("🔍 任务监控已启动")
 
         def monitor_loop():
+            last_save = time.monotonic()
             while self.is_monitoring:
-                # 查询运行中的任务
-                for task in self.tasks:
-                    if task.status == "running":
-                        self.query_task(task)
-                        time.sleep(0.5)
-                # 保存任务
-                save_tasks(self.tasks)
-                time.sleep(5)
+                # 到期的运行中任务并发查询（每个任务的查询间隔各自自适应）
+                now = time.monotonic()
+                with self.state_lock:
+                    due = []
+                    for task in list(self.tasks):
+                        if not task.api_task_id or task.status not in ("running", "pending") or task.task_id in self.polling:
+                            continue
+                        if self.poll_state.setdefault(task.task_id, {}).get("next", 0) <= now:
+                            self.polling.add(task.task_id)
+                            due.append(task)
+                for task in due:
+                    self.poll_executor.submit(self._poll_task, task)
+                # 有变化才保存
+                if self.changed_tasks and now - last_save >= SAVE_INTERVAL:
+                    self._persist_tasks()
+                    last_save = now
+                time.sleep(POLL_TICK)
 
         threading.Thread(target=monitor_loop, daemon=True).start()
 
     def stop_monitor(self):
         """停止任务监控"""
         self.is_monitoring = False
-        save_tasks(self.tasks)
+        self.submitter.shutdown()
+        self.downloader.shutdown()
+        self.poll_executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            self.store.write(self.tasks)
+            if self.store.needs_compaction():
+                self.store.compact()
+        except Exception as e:
+            print(f"[任务保存失败] {str(e)}")
         self.log("🛑 任务监控已停止")
 
 
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Sora助手压测脚本（无GUI）
+调用助手同样使用的 sora_client（提交/查询接口、令牌桶限流、退避重试、自适应轮询间隔、断点续传下载），
+驱动N个任务走完 提交 → 轮询 → 下载，统计各阶段吞吐、延迟和错误率。
+可连接已启动的模拟服务器，也可用 --spawn-server 在本进程内启动（其余参数原样传给模拟服务器）。
+
+用法：
+    python sora_load_test.py --spawn-server --tasks 200 --rate-limit-rate 0.1 --drop-rate 0.2
+    python sora_load_test.py --host http://127.0.0.1:8765 --tasks 500 --submit-rate 5 --submit-concurrency 8
+标准输出为一行JSON汇总，可读进度输出到标准错误。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import sora_client as client
+from sora_mock_server import build_parser as build_server_parser, start_server
+
+# 进度输出间隔（秒）
+REPORT_INTERVAL = 5.0
+
+
+# ==================== 统计 ====================
+class PhaseStats:
+    """单个阶段（提交/查询/下载）的请求数、成功/失败、重试、延迟和字节数"""
+
+    def __init__(self):
+        self.ok = 0
+        self.failed = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latencies = []
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, ok, latency, error=None, nbytes=0):
+        with self.lock:
+            self.latencies.append(latency)
+            self.bytes += nbytes
+            if ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+                key = (error or "未知错误")[:80]
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def add_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def summary(self, wall):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            total = self.ok + self.failed
+
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else None
+
+            return {
+                "requests": total,
+                "ok": self.ok,
+                "failed": self.failed,
+                "error_rate": round(self.failed / total, 4) if total else 0,
+                "retries": self.retries,
+                "per_second": round(self.ok / wall, 2) if wall > 0 else 0,
+                "p50_ms": percentile(0.5),
+                "p95_ms": percentile(0.95),
+                "mb": round(self.bytes / 1048576, 1),
+                "top_errors": dict(sorted(self.errors.items(), key=lambda item: -item[1])[:5])
+            }
+
+
+# ==================== 压测驱动 ====================
+class LoadTest:
+    def __init__(self, args, host):
+        self.args = args
+        self.host = host.rstrip("/")
+        self.session = client.create_http_session(args.submit_concurrency + args.poll_concurrency + args.download_concurrency)
+        self.bucket = client.TokenBucket(args.submit_rate, args.submit_burst)
+        self.submitter = client.WorkQueue(self.submit, args.submit_concurrency, "load-submit")
+        self.poller = ThreadPoolExecutor(max_workers=args.poll_concurrency, thread_name_prefix="load-poll")
+        self.downloader = client.WorkQueue(self.download, args.download_concurrency, "load-download")
+        self.download_dir = args.download_dir or tempfile.mkdtemp(prefix="sora_load_")
+        self.stats = {"submit": PhaseStats(), "poll": PhaseStats(), "download": PhaseStats()}
+        self.poll_state = {}
+        self.polling = set()
+        self.lock = threading.Lock()
+        self.tasks = [
+            client.SoraTask(main_prompt=f"压测任务 {i}", full_prompt=f"压测任务 {i}", duration=10)
+            for i in range(args.tasks)
+        ]
+
+    def submit(self, task):
+        """与助手submit_task相同的提交流程（令牌桶 + 429/503/连接失败退避重试）"""
+        stats = self.stats["submit"]
+
+        def on_retry(attempt, delay, reason):
+            task.retries += 1
+            stats.add_retry()
+
+        task.status = "running"
+        start = time.perf_counter()
+        try:
+            data = client.submit_video(self.session, self.host, self.args.api_key, client.build_submit_params(task),
+                                       bucket=self.bucket, on_retry=on_retry)
+            client.apply_submit_result(task, data)
+            stats.record(True, time.perf_counter() - start)
+        except Exception as e:
+            task.status = "failed"
+            task.error = str(e)
+            stats.record(False, time.perf_counter() - start, str(e))
+
+    def poll(self, task):
+        """与助手query_task/_poll_task相同的查询流程，并按同样的自适应间隔安排下次查询"""
+        stats = self.stats["poll"]
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = client.query_video(self.session, self.host, self.args.api_key, task.api_task_id,
+                                        on_retry=lambda *a: stats.add_retry())
+            ok = True
+            client.apply_query_result(task, result)
+            if task.status == "succeeded" and task.video_url:
+                save_path = os.path.join(self.download_dir, f"{task.task_id}.mp4")
+                self.downloader.enqueue(save_path, task, save_path)
+            stats.record(True, time.perf_counter() - start)
+        except requests.RequestException as e:
+            # 与助手一致：网络/HTTP错误时任务保持原状态，稍后重试
+            stats.record(False, time.perf_counter() - start, str(e))
+        except Exception as e:
+            task.status = "failed"
+            task.error = str(e)
+            stats.record(False, time.perf_counter() - start, str(e))
+        finally:
+            with self.lock:
+                client.schedule_next_poll(self.poll_state.setdefault(task.task_id, {}), task, ok, time.monotonic())
+                self.polling.discard(task.task_id)
+
+    def download(self, task, save_path):
+        """与助手相同的下载方式（.part断点续传 + 容器校验 + 原子改名）"""
+        start = time.perf_counter()
+        try:
+            size = client.download_file(self.session, task.video_url, save_path)
+            task.download_path = save_path
+            self.stats["download"].record(True, time.perf_counter() - start, nbytes=size)
+        except Exception as e:
+            task.download_failed = True
+            self.stats["download"].record(False, time.perf_counter() - start, str(e))
+
+    def is_finished(self, task):
+        return task.status == "failed" or task.download_path or task.download_failed
+
+    def run(self):
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.args.timeout
+        for task in self.tasks:
+            self.submitter.enqueue(task.task_id, task)
+
+        last_report = time.monotonic()
+        while time.monotonic() < deadline:
+            now = time.monotonic()
+            if all(self.is_finished(task) for task in self.tasks):
+                break
+            with self.lock:
+                due = []
+                for task in self.tasks:
+                    if task.status != "running" or not task.api_task_id or task.task_id in self.polling:
+                        continue
+                    if self.poll_state.setdefault(task.task_id, {}).get("next", 0) <= now:
+                        self.polling.add(task.task_id)
+                        due.append(task)
+            for task in due:
+                self.poller.submit(self.poll, task)
+            if now - last_report >= REPORT_INTERVAL:
+                last_report = now
+                self.report_progress(time.perf_counter() - start)
+            time.sleep(client.POLL_TICK / 4)
+
+        wall = time.perf_counter() - start
+        self.submitter.shutdown()
+        self.downloader.shutdown()
+        self.poller.shutdown(wait=False, cancel_futures=True)
+        return {
+            "host": self.host,
+            "tasks": len(self.tasks),
+            "wall_seconds": round(wall, 2),
+            "timed_out": not all(self.is_finished(task) for task in self.tasks),
+            "tasks_downloaded": sum(1 for task in self.tasks if task.download_path),
+            "tasks_failed": sum(1 for task in self.tasks if task.status == "failed" or task.download_failed),
+            "tasks_per_minute": round(sum(1 for task in self.tasks if task.download_path) / wall * 60, 1) if wall else 0,
+            "submit": self.stats["submit"].summary(wall),
+            "poll": self.stats["poll"].summary(wall),
+            "download": self.stats["download"].summary(wall)
+        }
+
+    def report_progress(self, elapsed):
+        counts = {}
+        for task in self.tasks:
+            key = "downloaded" if task.download_path else task.status
+            counts[key] = counts.get(key, 0) + 1
+        print(f"⏱ {elapsed:.0f}秒 | " + " | ".join(f"{k}：{v}" for k, v in sorted(counts.items())), file=sys.stderr)
+
+
+def fetch_server_stats(session, host):
+    try:
+        return session.get(f"{host.rstrip('/')}/mock/stats", timeout=5).json()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sora助手压测（提交/轮询/下载吞吐与错误率）")
+    parser.add_argument("--host", default="http://127.0.0.1:8765",
+                        help="模拟服务器地址（--spawn-server时忽略）")
+    parser.add_argument("--spawn-server", action="store_true", help="在本进程内启动模拟服务器，未识别的参数传给它")
+    parser.add_argument("--api-key", default="mock-key")
+    parser.add_argument("--tasks", type=int, default=100, help="任务数")
+    parser.add_argument("--submit-concurrency", type=int, default=client.DEFAULT_SUBMIT_CONCURRENCY)
+    parser.add_argument("--submit-rate", type=float, default=client.DEFAULT_SUBMIT_RATE, help="提交限流（个/秒）")
+    parser.add_argument("--submit-burst", type=int, default=client.DEFAULT_SUBMIT_BURST)
+    parser.add_argument("--poll-concurrency", type=int, default=client.POLL_CONCURRENCY)
+    parser.add_argument("--download-concurrency", type=int, default=client.DOWNLOAD_CONCURRENCY)
+    parser.add_argument("--download-dir", help="下载目录（默认临时目录，结束后删除）")
+    parser.add_argument("--timeout", type=float, default=600, help="最长运行时间（秒）")
+    args, server_argv = parser.parse_known_args(argv)
+
+    server = None
+    host = args.host
+    if args.spawn_server:
+        server_options = build_server_parser().parse_args(server_argv + ["--port", "0"])
+        server_options.api_key = args.api_key
+        server = start_server(server_options)
+        host = f"http://{server_options.host}:{server.server_address[1]}"
+        print(f"🧪 已在本进程启动模拟服务器：{host}", file=sys.stderr)
+    elif server_argv:
+        parser.error(f"未识别的参数：{' '.join(server_argv)}（模拟服务器参数需配合 --spawn-server）")
+
+    test = LoadTest(args, host)
+    try:
+        summary = test.run()
+        summary["server_stats"] = fetch_server_stats(test.session, host)
+    finally:
+        if server:
+            server.shutdown()
+        if not args.download_dir:
+            shutil.rmtree(test.download_dir, ignore_errors=True)
+
+    for phase in ("submit", "poll", "download"):
+        s = summary[phase]
+        print(f"{phase}：成功 {s['ok']}/{s['requests']}，错误率 {s['error_rate']:.1%}，重试 {s['retries']}，"
+              f"{s['per_second']}/秒，p50 {s['p50_ms']}ms，p95 {s['p95_ms']}ms", file=sys.stderr)
+    print(f"完成 {summary['tasks_downloaded']}/{summary['tasks']} 个任务，用时 {summary['wall_seconds']} 秒"
+          f"（{summary['tasks_per_minute']} 个/分钟）", file=sys.stderr)
+    print(json.dumps(summary, ensure_ascii=False))
+    return 1 if summary["timed_out"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
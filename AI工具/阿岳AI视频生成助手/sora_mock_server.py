@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Sora/Veo 接口本地模拟服务器（仅标准库，不需要真实API Key）
+实现接口：
+1.  POST /v1/video/sora-video              提交视频任务
+2.  POST /v1/video/sora-upload-character   提交角色提取任务
+3.  POST /v1/draw/result                   查询任务（进度按曲线随时间增长）
+4.  GET  /files/<任务ID>.mp4               下载生成的视频（支持Range续传）
+5.  GET  /mock/stats                       各接口的请求/错误计数
+可配置：响应延迟、5xx失败率、429比例（带Retry-After）、任务耗时与进度曲线、任务失败率、
+视频大小、下载限速与中途断开比例
+
+用法：
+    python sora_mock_server.py --port 8765 --latency 0.2 --rate-limit-rate 0.1 --task-seconds 30
+    然后在助手里把 API 接口改为 http://127.0.0.1:8765
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# ==================== 默认配置 ====================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PROGRESS_CURVES = ("linear", "ease", "stall")
+# stall曲线：进度先到该值，停留一段时间后再完成
+STALL_PROGRESS = 90
+STALL_FRACTION = 0.4
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+# ==================== 模拟视频文件 ====================
+def build_mp4_bytes(size_kb):
+    """生成结构完整的MP4（ftyp + mdat + moov），能通过助手的容器校验；内容为随机字节"""
+    def box(box_type, payload):
+        return (8 + len(payload)).to_bytes(4, "big") + box_type + payload
+
+    ftyp = box(b"ftyp", b"isom" + (512).to_bytes(4, "big") + b"isomiso2avc1mp41")
+    moov = box(b"moov", box(b"mvhd", bytes(100)))
+    mdat_size = max(1024, size_kb * 1024 - len(ftyp) - len(moov) - 8)
+    return ftyp + box(b"mdat", random.Random(0).randbytes(mdat_size)) + moov
+
+
+def progress_at(elapsed, total, curve):
+    """按进度曲线计算0~100的进度"""
+    t = min(1.0, elapsed / total) if total > 0 else 1.0
+    if curve == "ease":
+        t = t * t * (3 - 2 * t)
+    elif curve == "stall":
+        ramp = 1 - STALL_FRACTION
+        t = min(t / ramp, 1.0) * STALL_PROGRESS / 100 if t < 1.0 else 1.0
+    return min(100, int(t * 100))
+
+
+# ==================== 模拟服务状态 ====================
+class MockState:
+    """任务表、统计计数和可配置参数（多线程共享）"""
+
+    def __init__(self, options):
+        self.options = options
+        self.tasks = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.video = build_mp4_bytes(options.video_size_kb)
+
+    def count(self, endpoint, outcome):
+        with self.lock:
+            entry = self.stats.setdefault(endpoint, {})
+            entry[outcome] = entry.get(outcome, 0) + 1
+
+    def create_task(self, kind):
+        task_id = uuid.uuid4().hex
+        seconds = max(0.0, random.gauss(self.options.task_seconds, self.options.task_seconds * 0.2))
+        with self.lock:
+            self.tasks[task_id] = {
+                "kind": kind,
+                "created": time.monotonic(),
+                "seconds": seconds,
+                "fails": random.random() < self.options.task_fail_rate
+            }
+        return task_id
+
+    def task_result(self, task_id, base_url):
+        """按经过的时间给出任务状态（data部分），任务不存在时返回None"""
+        with self.lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        elapsed = time.monotonic() - task["created"]
+        progress = progress_at(elapsed, task["seconds"], self.options.progress_curve)
+        data = {"id": task_id, "progress": progress, "status": "running", "results": []}
+        if elapsed >= task["seconds"]:
+            if task["fails"]:
+                data.update(status="failed", failure_reason="mock_failure", error="模拟生成失败")
+            elif task["kind"] == "character":
+                data.update(status="succeeded", progress=100,
+                            results=[{"character_id": f"mock.{task_id[:12]}"}])
+            else:
+                data.update(status="succeeded", progress=100,
+                            results=[{"url": f"{base_url}/files/{task_id}.mp4"}])
+        return data
+
+
+# ==================== 请求处理 ====================
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "SoraMock/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, fmt, *args):
+        if self.state.options.verbose:
+            sys.stderr.write(f"[{time.strftime('%H:%M:%S')}] {fmt % args}\n")
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return None
+
+    def simulate_faults(self, endpoint):
+        """按配置注入延迟、429和5xx；已返回错误时返回True"""
+        options = self.state.options
+        if options.latency > 0:
+            time.sleep(max(0.0, random.gauss(options.latency, options.latency * 0.3)))
+        if random.random() < options.rate_limit_rate:
+            self.state.count(endpoint, "429")
+            self.send_json(429, {"code": 429, "msg": "rate limited"}, {"Retry-After": str(options.retry_after)})
+            return True
+        if random.random() < options.fail_rate:
+            self.state.count(endpoint, "5xx")
+            self.send_json(503, {"code": 503, "msg": "service unavailable"})
+            return True
+        return False
+
+    def check_auth(self, endpoint):
+        expected = self.state.options.api_key
+        if expected and self.headers.get("Authorization") != f"Bearer {expected}":
+            self.state.count(endpoint, "401")
+            self.send_json(401, {"code": 401, "msg": "invalid api key"})
+            return False
+        return True
+
+    def do_POST(self):
+        endpoint = self.path.split("?")[0]
+        # 先读完请求体，保持长连接可复用
+        body = self.read_json()
+        if endpoint not in ("/v1/video/sora-video", "/v1/video/sora-upload-character", "/v1/draw/result"):
+            self.send_json(404, {"code": 404, "msg": "not found"})
+            return
+        if not self.check_auth(endpoint) or self.simulate_faults(endpoint):
+            return
+        if body is None:
+            self.state.count(endpoint, "400")
+            self.send_json(400, {"code": 400, "msg": "invalid json"})
+            return
+
+        if endpoint == "/v1/draw/result":
+            data = self.state.task_result(str(body.get("id", "")), f"http://{self.headers.get('Host')}")
+            if data is None:
+                self.state.count(endpoint, "not_found")
+                self.send_json(200, {"code": -22, "msg": "任务不存在", "message": "任务不存在"})
+                return
+            self.state.count(endpoint, "ok")
+            self.send_json(200, {"code": 0, "msg": "success", "data": data})
+            return
+
+        if not body.get("url") and endpoint == "/v1/video/sora-upload-character":
+            self.state.count(endpoint, "400")
+            self.send_json(200, {"code": -1, "msg": "url不能为空", "message": "url不能为空"})
+            return
+        if endpoint == "/v1/video/sora-video" and not body.get("prompt"):
+            self.state.count(endpoint, "400")
+            self.send_json(200, {"code": -1, "msg": "prompt不能为空", "message": "prompt不能为空"})
+            return
+        kind = "character" if endpoint == "/v1/video/sora-upload-character" else "video"
+        self.state.count(endpoint, "ok")
+        self.send_json(200, {"code": 0, "msg": "success", "data": {"id": self.state.create_task(kind)}})
+
+    def do_GET(self):
+        endpoint = self.path.split("?")[0]
+        if endpoint == "/mock/stats":
+            with self.state.lock:
+                stats = json.loads(json.dumps(self.state.stats))
+                stats["tasks"] = len(self.state.tasks)
+            self.send_json(200, stats)
+            return
+        match = re.fullmatch(r"/files/([0-9a-f]+)\.mp4", endpoint)
+        if not match or self.state.task_result(match.group(1), "") is None:
+            self.send_json(404, {"code": 404, "msg": "not found"})
+            return
+        self.send_video("/files")
+
+    def send_video(self, endpoint):
+        """发送模拟视频，支持 Range: bytes=起点-；可限速，可按比例在中途断开连接"""
+        options = self.state.options
+        video = self.state.video
+        start = 0
+        range_match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if range_match:
+            start = int(range_match.group(1))
+            if start >= len(video):
+                self.state.count(endpoint, "416")
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(video)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(video) - 1}/{len(video)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(video) - start))
+        self.end_headers()
+
+        drop_at = len(video)
+        if random.random() < options.drop_rate:
+            drop_at = random.randint(start, len(video) - 1)
+        delay = DOWNLOAD_CHUNK_SIZE / (options.download_kbps * 1024) if options.download_kbps > 0 else 0
+        offset = start
+        try:
+            while offset < len(video):
+                end = min(len(video), offset + DOWNLOAD_CHUNK_SIZE, drop_at if drop_at > offset else len(video))
+                self.wfile.write(video[offset:end])
+                offset = end
+                if offset == drop_at and drop_at < len(video):
+                    self.state.count(endpoint, "dropped")
+                    self.close_connection = True
+                    return
+                if delay:
+                    time.sleep(delay)
+            self.state.count(endpoint, "206" if start else "ok")
+        except (BrokenPipeError, ConnectionResetError):
+            self.state.count(endpoint, "client_closed")
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, MockHandler)
+        self.state = MockState(options)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Sora/Veo 接口本地模拟服务器")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--api-key", default="", help="设置后校验 Authorization: Bearer <key>")
+    parser.add_argument("--latency", type=float, default=0.1, help="平均响应延迟（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="返回503的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回429的比例")
+    parser.add_argument("--retry-after", type=int, default=1, help="429响应的Retry-After（秒）")
+    parser.add_argument("--task-seconds", type=float, default=20.0, help="任务平均生成耗时（秒）")
+    parser.add_argument("--task-fail-rate", type=float, default=0.0, help="任务最终失败的比例")
+    parser.add_argument("--progress-curve", choices=PROGRESS_CURVES, default="linear", help="进度曲线")
+    parser.add_argument("--video-size-kb", type=int, default=2048, help="模拟视频大小（KB）")
+    parser.add_argument("--download-kbps", type=int, default=0, help="单连接下载限速（KB/s，0不限速）")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="下载中途断开连接的比例")
+    parser.add_argument("--verbose", action="store_true", help="输出每个请求的日志")
+    return parser
+
+
+def start_server(options):
+    """在后台线程启动模拟服务器（压测脚本内嵌使用），返回服务器对象"""
+    server = MockServer((options.host, options.port), options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    server = MockServer((options.host, options.port), options)
+    print(f"🧪 模拟服务器已启动：http://{options.host}:{server.server_address[1]}（Ctrl+C 停止）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
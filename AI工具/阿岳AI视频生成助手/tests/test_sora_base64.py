@@ -0,0 +1,33 @@
+import base64
+
+from sora_client import BASE64_MIN_LENGTH, is_base64, shorten_base64_in_data
+
+LONG_BASE64 = base64.b64encode(b"\x00\xff" * 300).decode()
+
+
+def test_is_base64():
+    assert is_base64(LONG_BASE64)
+    assert not is_base64("QUJD")  # 太短
+    assert not is_base64(LONG_BASE64[:-1])  # 长度不是4的倍数
+    assert not is_base64("a b=" * (BASE64_MIN_LENGTH // 4 + 1))
+    assert not is_base64("https://example.com/" + "a" * 200)
+    assert not is_base64(LONG_BASE64[:-4] + "!!!!")
+
+
+def test_shorten_base64_in_data_does_not_modify_input():
+    data = {"image": LONG_BASE64, "prompt": "猫", "items": [LONG_BASE64, {"inner": [LONG_BASE64, 3]}], "n": None}
+    result = shorten_base64_in_data(data)
+    assert result == {"image": "base64", "prompt": "猫", "items": ["base64", {"inner": ["base64", 3]}], "n": None}
+    assert data["image"] == LONG_BASE64 and data["items"][1]["inner"][0] == LONG_BASE64
+    assert shorten_base64_in_data(LONG_BASE64) == "base64"
+    assert shorten_base64_in_data(5) == 5
+
+
+def test_shorten_base64_in_data_deep_nesting():
+    data = LONG_BASE64
+    for _ in range(5000):
+        data = [data]
+    result = shorten_base64_in_data(data)
+    for _ in range(5000):
+        result = result[0]
+    assert result == "base64"
@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from sora_client import MIN_VALID_VIDEO_SIZE, create_http_session, download_file, verify_video_container
+
+
+def mp4_box(box_type, size):
+    return size.to_bytes(4, "big") + box_type + b"\0" * (size - 8)
+
+
+def write_file(tmp_path, data):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_verify_video_container(tmp_path):
+    body = mp4_box(b"ftyp", 24) + mp4_box(b"moov", 1000) + mp4_box(b"mdat", MIN_VALID_VIDEO_SIZE)
+    verify_video_container(write_file(tmp_path, body))
+    # 最后一个box大小为0表示延伸到文件末尾
+    verify_video_container(write_file(tmp_path, body[:-MIN_VALID_VIDEO_SIZE] + b"\0\0\0\0mdat" +
+                                      b"\0" * MIN_VALID_VIDEO_SIZE))
+    verify_video_container(write_file(tmp_path, b"\x1a\x45\xdf\xa3" + b"\0" * MIN_VALID_VIDEO_SIZE))
+
+    for data in (body[:-100],  # 下载中断
+                 b"<html>" + b"\0" * MIN_VALID_VIDEO_SIZE,  # 错误页面
+                 body[:100],  # 过小
+                 mp4_box(b"ftyp", 24) + b"\0\0\0\x04moov" + b"\0" * MIN_VALID_VIDEO_SIZE):  # box大小非法
+        with pytest.raises(Exception):
+            verify_video_container(write_file(tmp_path, data))
+
+
+
+VIDEO = mp4_box(b"ftyp", 24) + mp4_box(b"moov", 1000) + mp4_box(b"mdat", MIN_VALID_VIDEO_SIZE)
+
+
+class VideoHandler(BaseHTTPRequestHandler):
+    """支持Range的视频文件服务；mode为wrong_offset时总是从0开始返回206片段，missing时返回404"""
+    mode = "normal"
+    ranges = []
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        start = int(match.group(1)) if match else None
+        self.ranges.append(start)
+        if self.mode == "missing":
+            self.send_error(404)
+            return
+        if start is None:
+            self.send_response(200)
+            body = VIDEO
+        elif start >= len(VIDEO):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(VIDEO)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        else:
+            if self.mode == "wrong_offset":
+                start = 0
+            body = VIDEO[start:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(VIDEO) - 1}/{len(VIDEO)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def video_server():
+    VideoHandler.mode = "normal"
+    VideoHandler.ranges = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), VideoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+    server.shutdown()
+    server.server_close()
+
+
+def start_part(save_path, size):
+    with open(save_path + ".part", "wb") as f:
+        f.write(VIDEO[:size])
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_download_full_file(tmp_path, video_server):
+    save_path = str(tmp_path / "out" / "video.mp4")
+    assert download_file(create_http_session(), video_server, save_path) == len(VIDEO)
+    assert read(save_path) == VIDEO and not os.path.exists(save_path + ".part")
+    assert VideoHandler.ranges == [None]
+
+
+def test_download_resumes_with_206(tmp_path, video_server):
+    save_path = str(tmp_path / "video.mp4")
+    start_part(save_path, 5000)
+    assert download_file(create_http_session(), video_server, save_path) == len(VIDEO)
+    assert read(save_path) == VIDEO
+    assert VideoHandler.ranges == [5000]
+
+
+def test_download_restarts_when_206_starts_at_wrong_offset(tmp_path, video_server):
+    VideoHandler.mode = "wrong_offset"
+    save_path = str(tmp_path / "video.mp4")
+    start_part(save_path, 5000)
+    assert download_file(create_http_session(), video_server, save_path) == len(VIDEO)
+    # 丢弃.part后不带Range重新下载，文件没有重复的片段
+    assert read(save_path) == VIDEO
+    assert VideoHandler.ranges == [5000, None]
+
+
+def test_download_416_means_part_is_complete(tmp_path, video_server):
+    save_path = str(tmp_path / "video.mp4")
+    start_part(save_path, len(VIDEO))
+    assert download_file(create_http_session(), video_server, save_path) == len(VIDEO)
+    assert read(save_path) == VIDEO
+    assert VideoHandler.ranges == [len(VIDEO)]
+
+
+def test_download_invalid_file_removes_part(tmp_path, video_server):
+    save_path = str(tmp_path / "video.mp4")
+    # .part开头不是视频：续传后的完整文件校验失败，删除.part以便下次从头下载
+    with open(save_path + ".part", "wb") as f:
+        f.write(b"x" * 100)
+    with pytest.raises(Exception, match="ftyp"):
+        download_file(create_http_session(), video_server, save_path)
+    assert not os.path.exists(save_path + ".part") and not os.path.exists(save_path)
+
+
+def test_download_404_is_not_retried(tmp_path, video_server):
+    VideoHandler.mode = "missing"
+    with pytest.raises(requests.HTTPError):
+        download_file(create_http_session(), video_server, str(tmp_path / "video.mp4"))
+    assert VideoHandler.ranges == [None]
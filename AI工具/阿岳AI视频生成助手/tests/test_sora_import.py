@@ -0,0 +1,96 @@
+import os
+import types
+
+import pytest
+
+from sora_assistant import RefImageCache, SoraVideoGenerator, iter_prompt_records, normalize_prompt_record
+
+DEFAULTS = {
+    "prefix_prompt": "默认前缀", "suffix_prompt": "默认后缀",
+    "prefix_templates": {"电影": "电影感"}, "suffix_templates": {"4K": "4K画质"},
+    "aspect_ratio": "9:16", "duration": "10", "size": "small"
+}
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_csv_records_use_aliases_and_line_numbers(tmp_path):
+    path = write(tmp_path, "prompts.csv", "﻿Prompt,时长,参考图\n一只猫,15,img/cat.png\n一只狗,,\n")
+    records = list(iter_prompt_records(path))
+    assert [line_no for line_no, _ in records] == [2, 3]
+    fields = normalize_prompt_record(records[0][1], str(tmp_path), DEFAULTS)
+    assert fields["main_prompt"] == "一只猫" and fields["duration"] == 15
+    assert fields["ref_image_path"] == os.path.normpath(str(tmp_path / "img" / "cat.png"))
+    assert fields["full_prompt"] == "默认前缀 一只猫 默认后缀"
+    # 未填写的字段取界面当前值
+    fields = normalize_prompt_record(records[1][1], str(tmp_path), DEFAULTS)
+    assert fields["duration"] == 10 and "ref_image_path" not in fields
+
+
+def test_jsonl_records_objects_strings_and_bad_lines(tmp_path):
+    path = write(tmp_path, "prompts.jsonl",
+                 '{"prompt": "一只猫", "prefix_template": "电影", "aspect": "16:9"}\n'
+                 '\n'
+                 '"一只狗"\n'
+                 '{"prompt": "断开的行\n')
+    records = list(iter_prompt_records(path))
+    assert [line_no for line_no, _ in records] == [1, 3, 4]
+    fields = normalize_prompt_record(records[0][1], str(tmp_path), DEFAULTS)
+    assert fields["prefix_prompt"] == "电影感" and fields["aspect_ratio"] == "16:9"
+    assert normalize_prompt_record(records[1][1], str(tmp_path), DEFAULTS)["main_prompt"] == "一只狗"
+    assert records[2][1] is None
+    with pytest.raises(ValueError, match="无法解析"):
+        normalize_prompt_record(records[2][1], str(tmp_path), DEFAULTS)
+
+
+def test_markdown_records_split_by_separator_or_blank_lines(tmp_path):
+    path = write(tmp_path, "prompts.md", "**一只猫**\n在草地上\n\n奔跑\n---\n# 一只狗\n---\n\n")
+    records = list(iter_prompt_records(path))
+    assert [line_no for line_no, _ in records] == [1, 6]
+    assert "一只猫" in records[0][1]["prompt"] and "**" not in records[0][1]["prompt"]
+    assert "奔跑" in records[0][1]["prompt"]
+
+    path = write(tmp_path, "prompts.txt", "一只猫\n\n\n一只狗\n第二行\n")
+    assert [(line_no, record["prompt"].split()[0]) for line_no, record in iter_prompt_records(path)] == \
+        [(1, "一只猫"), (4, "一只狗")]
+
+
+def test_unsupported_file_type(tmp_path):
+    with pytest.raises(ValueError, match="不支持的文件类型"):
+        list(iter_prompt_records(write(tmp_path, "prompts.xlsx", "")))
+
+
+@pytest.mark.parametrize("record, message", [
+    ({"prompt": "  "}, "主体提示词为空"),
+    ({"prompt": "猫", "prefix_template": "不存在"}, "未知的前缀模板"),
+    ({"prompt": "猫", "aspect_ratio": "1:1"}, "视频比例"),
+    ({"prompt": "猫", "size": "huge"}, "清晰度"),
+    ({"prompt": "猫", "duration": "十秒"}, "时长不是数字"),
+    ({"prompt": "猫", "duration": "inf"}, "时长不是数字"),
+    ({"prompt": "猫", "duration": "12"}, "时长只能是10或15秒"),
+])
+def test_bad_rows_raise_value_error(record, message):
+    with pytest.raises(ValueError, match=message):
+        normalize_prompt_record(record, ".", DEFAULTS)
+
+
+def test_import_worker_skips_bad_rows_and_duplicates(tmp_path):
+    path = write(tmp_path, "prompts.csv",
+                 "prompt,duration\n一只猫,10\n一只狗,inf\n一只猫,10\n已有任务,10\n一只鸟,15\n")
+    imported, logs = [], []
+    app = types.SimpleNamespace(
+        root=types.SimpleNamespace(after=lambda ms, func, *args: func(*args)),
+        ref_cache=RefImageCache(str(tmp_path / "ref_images")),
+        _add_imported_tasks=lambda tasks, auto_submit: imported.extend(tasks),
+        log=logs.append,
+    )
+    known = {"默认前缀 已有任务 默认后缀"}
+    SoraVideoGenerator._import_prompts_worker(app, path, DEFAULTS, False, known)
+    assert [task.main_prompt for task in imported] == ["一只猫", "一只鸟"]
+    assert not any("批量导入中断" in msg for msg in logs)
+    assert any("第 3 行已跳过" in msg for msg in logs)
+    assert "新增：2 | 重复跳过：2 | 无效：1" in logs[-1]
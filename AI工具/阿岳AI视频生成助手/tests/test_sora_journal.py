@@ -0,0 +1,65 @@
+import json
+import os
+
+import sora_assistant
+from sora_assistant import SoraTask, TaskJournal
+
+
+def make_journal(tmp_path):
+    return TaskJournal(str(tmp_path / "tasks.jsonl"), str(tmp_path / "ref_images"))
+
+
+def read_ops(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["op"] for line in f]
+
+
+def test_journal_appends_only_changes_and_replays(tmp_path):
+    journal = make_journal(tmp_path)
+    first, second = SoraTask(main_prompt="一只猫"), SoraTask(main_prompt="一只狗")
+    journal.write([first, second])
+    journal.write([first, second])  # 没有变化不写
+    first.status = "succeeded"
+    first.progress = 100
+    journal.write([first, second])
+    journal.remove([second.task_id, "unknown"])
+
+    assert read_ops(journal.path) == ["put", "put", "update", "delete"]
+    with open(journal.path, encoding="utf-8") as f:
+        update = json.loads(f.readlines()[2])
+    assert update["fields"] == {"status": "succeeded", "progress": 100}
+
+    replayed = make_journal(tmp_path)
+    tasks = replayed.load()
+    assert [vars(task) for task in tasks] == [vars(first)]
+    assert replayed.lines == 4
+
+
+def test_journal_ignores_truncated_last_line(tmp_path):
+    journal = make_journal(tmp_path)
+    task = SoraTask(main_prompt="一只猫")
+    journal.write([task])
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"op": "update", "id": "')
+    assert [t.task_id for t in make_journal(tmp_path).load()] == [task.task_id]
+
+
+def test_journal_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(sora_assistant, "JOURNAL_COMPACT_MIN_LINES", 5)
+    journal = make_journal(tmp_path)
+    kept, removed = SoraTask(main_prompt="保留"), SoraTask(main_prompt="删除")
+    journal.write([kept, removed])
+    assert not journal.needs_compaction()
+    for progress in range(1, 6):
+        kept.progress = progress
+        journal.write([kept])
+    journal.remove([removed.task_id])
+    assert journal.needs_compaction()
+
+    journal.compact()
+    assert read_ops(journal.path) == ["put"]
+    assert journal.lines == 1 and not journal.needs_compaction()
+    assert not os.path.exists(journal.path + ".tmp")
+
+    tasks = make_journal(tmp_path).load()
+    assert [vars(task) for task in tasks] == [vars(kept)]
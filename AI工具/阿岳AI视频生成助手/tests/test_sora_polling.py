@@ -0,0 +1,60 @@
+import time
+
+from sora_client import (POLL_INITIAL_INTERVAL, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_STALL_AGE, SoraTask,
+                         next_poll_interval, schedule_next_poll)
+
+
+def test_first_poll_uses_initial_interval():
+    state = {}
+    assert next_poll_interval(state, 0, 0, 100.0) == POLL_INITIAL_INTERVAL
+    assert state == {"changed_at": 100.0, "progress": 0, "interval": POLL_INITIAL_INTERVAL}
+
+
+def test_rising_progress_polls_at_quarter_of_remaining_time():
+    state = {}
+    next_poll_interval(state, 0, 0, 100.0)
+    # 20秒涨了20%：预计还要80秒，按1/4即20秒后查询
+    assert next_poll_interval(state, 20, 20, 120.0) == 20.0
+    assert state["changed_at"] == 120.0
+    # 接近完成时查询更频繁，但不低于最短间隔
+    assert next_poll_interval(state, 90, 30, 130.0) == POLL_MIN_INTERVAL
+    # 涨得很慢时不超过最长间隔
+    state = {}
+    next_poll_interval(state, 0, 0, 0.0)
+    assert next_poll_interval(state, 1, 100, 100.0) == POLL_MAX_INTERVAL
+
+
+def test_stalled_progress_backs_off():
+    state = {}
+    next_poll_interval(state, 30, 0, 0.0)
+    intervals = [next_poll_interval(state, 30, 60, 10.0 * i) for i in range(1, 7)]
+    assert intervals[:3] == [15.0, 22.5, 33.75]
+    assert intervals[-1] == POLL_MAX_INTERVAL
+    # 进度变化时间保持在最后一次上涨时
+    assert state["changed_at"] == 0.0
+
+
+def test_long_stalled_task_uses_max_interval():
+    state = {}
+    next_poll_interval(state, 30, POLL_STALL_AGE + 1, 0.0)
+    assert next_poll_interval(state, 30, POLL_STALL_AGE + 1, 10.0) == POLL_MAX_INTERVAL
+
+
+def test_schedule_next_poll_success_and_failure():
+    task = SoraTask(progress=0, submitted_at=time.time())
+    state = {}
+    assert schedule_next_poll(state, task, True, 100.0) == 100.0 + POLL_INITIAL_INTERVAL
+    # 查询失败时间隔加倍，直到最长间隔
+    assert schedule_next_poll(state, task, False, 200.0) == 200.0 + POLL_INITIAL_INTERVAL * 2
+    assert schedule_next_poll(state, task, False, 300.0) == 300.0 + POLL_INITIAL_INTERVAL * 4
+    assert schedule_next_poll(state, task, False, 400.0) == 400.0 + POLL_MAX_INTERVAL
+    # 恢复后按进度重新计算：第一次查询(100秒)以来40秒涨了50%，剩余50%约40秒，1/4即10秒
+    task.progress = 50
+    assert schedule_next_poll(state, task, True, 140.0) == 150.0
+
+
+def test_schedule_next_poll_uses_submit_age_for_stall():
+    task = SoraTask(progress=10, submitted_at=time.time() - POLL_STALL_AGE - 60)
+    state = {}
+    schedule_next_poll(state, task, True, 0.0)
+    assert schedule_next_poll(state, task, True, 10.0) == 10.0 + POLL_MAX_INTERVAL
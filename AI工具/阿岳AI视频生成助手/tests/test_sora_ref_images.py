@@ -0,0 +1,87 @@
+import os
+import time
+import types
+
+import sora_assistant
+from sora_assistant import RefImageCache, SoraTask, SoraVideoGenerator, TaskJournal, store_ref_image_blob
+
+OLD = time.time() - sora_assistant.REF_IMAGE_GC_AGE - 60
+
+
+def make_old(blob_dir, digest):
+    os.utime(os.path.join(blob_dir, f"{digest}.b64"), (OLD, OLD))
+
+
+def blob_names(blob_dir):
+    return sorted(os.listdir(blob_dir))
+
+
+def test_compaction_removes_only_old_unreferenced_blobs(tmp_path):
+    blob_dir = str(tmp_path / "ref_images")
+    journal = TaskJournal(str(tmp_path / "tasks.jsonl"), blob_dir)
+    kept = store_ref_image_blob("a2VlcA==", blob_dir)
+    orphan = store_ref_image_blob("b3JwaGFu", blob_dir)
+    fresh = store_ref_image_blob("ZnJlc2g=", blob_dir)
+    make_old(blob_dir, kept)
+    make_old(blob_dir, orphan)
+    journal.write([SoraTask(main_prompt="保留", ref_image_hash=kept)])
+
+    journal.compact()
+    assert blob_names(blob_dir) == sorted([f"{kept}.b64", f"{fresh}.b64"])
+
+
+def test_reusing_a_blob_protects_it_from_compaction(tmp_path):
+    blob_dir = str(tmp_path / "ref_images")
+    journal = TaskJournal(str(tmp_path / "tasks.jsonl"), blob_dir)
+    digest = store_ref_image_blob("b2xk", blob_dir)
+    make_old(blob_dir, digest)
+
+    # 旧参考图被新任务再次使用，但新任务还没写入日志时发生压缩
+    assert store_ref_image_blob("b2xk", blob_dir) == digest
+    journal.compact()
+    assert blob_names(blob_dir) == [f"{digest}.b64"]
+
+
+def test_add_file_fast_path_refreshes_blob(tmp_path):
+    image = tmp_path / "ref.png"
+    image.write_bytes(b"not really a png")
+    cache = RefImageCache(str(tmp_path / "ref_images"))
+    digest = cache.add_file(str(image))
+    make_old(cache.blob_dir, digest)
+    assert cache.add_file(str(image)) == digest
+    assert os.path.getmtime(os.path.join(cache.blob_dir, f"{digest}.b64")) > OLD + 60
+
+
+def test_restore_reencodes_missing_blob_only_for_same_content(tmp_path):
+    image = tmp_path / "ref.png"
+    image.write_bytes(b"original image")
+    cache = RefImageCache(str(tmp_path / "ref_images"))
+    digest = cache.add_file(str(image))
+    encoded = cache.get_base64(digest)
+    os.remove(os.path.join(cache.blob_dir, f"{digest}.b64"))
+
+    assert RefImageCache(cache.blob_dir).get_base64(digest) == ""
+    assert RefImageCache(cache.blob_dir).restore(digest, str(image)) == encoded
+    # 原图片已被修改：内容不同，不能当作原参考图提交
+    image.write_bytes(b"edited image")
+    os.remove(os.path.join(cache.blob_dir, f"{digest}.b64"))
+    assert RefImageCache(cache.blob_dir).restore(digest, str(image)) == ""
+    assert RefImageCache(cache.blob_dir).restore(digest, "") == ""
+
+
+def test_submit_fails_task_when_ref_image_is_missing(tmp_path):
+    changed, logs = [], []
+    app = types.SimpleNamespace(
+        api_host=types.SimpleNamespace(get=lambda: "http://127.0.0.1:1"),
+        api_key=types.SimpleNamespace(get=lambda: "key"),
+        ref_cache=RefImageCache(str(tmp_path / "ref_images")),
+        _mark_changed=changed.append,
+        _schedule_tree_refresh=lambda task: None,
+        log=logs.append,
+    )
+    task = SoraTask(main_prompt="猫", ref_image_hash="0" * 64, ref_image_path=str(tmp_path / "deleted.png"))
+    # 没有session：如果继续提交会直接报错
+    SoraVideoGenerator.submit_task(app, task)
+    assert task.status == "failed"
+    assert "参考图缓存丢失" in task.error and not task.api_task_id
+    assert changed == [task]
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+import requests
+import urllib3
+
+import sora_client
+from sora_client import TokenBucket, request_with_retry, submit_video
+
+
+def test_token_bucket_allows_burst_then_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=3)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(4):
+        bucket.acquire()
+    assert time.monotonic() - start >= 4 / 20 * 0.9
+
+
+def test_token_bucket_pause_blocks_all_threads():
+    bucket = TokenBucket(rate=100, capacity=5)
+    bucket.pause(0.2)
+    start = time.monotonic()
+    done = []
+    threads = [threading.Thread(target=lambda: (bucket.acquire(), done.append(time.monotonic() - start)))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(done) == 3 and min(done) >= 0.19
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.body = body or {}
+
+    def close(self):
+        pass
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+class FakeSession:
+    """按顺序返回预设的响应或抛出预设的异常，并记录请求次数"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome) if isinstance(outcome, int) else outcome
+
+
+def connect_error():
+    reason = urllib3.exceptions.NewConnectionError(None, "Connection refused")
+    return requests.ConnectionError(urllib3.exceptions.MaxRetryError(None, "/", reason))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(sora_client, "backoff_delay", lambda attempt, retry_after=None: 0)
+
+
+@pytest.mark.parametrize("status", [500, 502, 503, 504, 429])
+def test_idempotent_requests_retry_all_transient_statuses(status):
+    session = FakeSession(status, 200)
+    assert request_with_retry(session, "POST", "http://x/query").status_code == 200
+    assert session.calls == 2
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_create_request_retries_clear_rejections(status):
+    session = FakeSession(status, status, 200)
+    assert request_with_retry(session, "POST", "http://x/create", idempotent=False).status_code == 200
+    assert session.calls == 3
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_create_request_never_resends_after_ambiguous_status(status):
+    session = FakeSession(status, 200)
+    assert request_with_retry(session, "POST", "http://x/create", idempotent=False).status_code == status
+    assert session.calls == 1
+
+
+def test_create_request_network_errors():
+    # 连接阶段失败时服务器没收到请求，可以重试
+    session = FakeSession(connect_error(), 200)
+    assert request_with_retry(session, "POST", "http://x/create", idempotent=False).status_code == 200
+    assert session.calls == 2
+    # 读超时时服务器可能已受理，不重试
+    session = FakeSession(requests.ReadTimeout("read timed out"), 200)
+    with pytest.raises(requests.ReadTimeout):
+        request_with_retry(session, "POST", "http://x/create", idempotent=False)
+    assert session.calls == 1
+
+
+def test_submit_video_reports_ambiguous_gateway_error():
+    session = FakeSession(502)
+    with pytest.raises(requests.HTTPError, match="HTTP 502：服务器可能已受理该任务"):
+        submit_video(session, "http://x", "key", {"prompt": "猫"})
+    assert session.calls == 1
+
+    session = FakeSession(429, FakeResponse(200, {"code": 0, "data": {"id": "api-1"}}))
+    retries = []
+    assert submit_video(session, "http://x", "key", {}, on_retry=lambda *a: retries.append(a))["data"]["id"] == "api-1"
+    assert len(retries) == 1
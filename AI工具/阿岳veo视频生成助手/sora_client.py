@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Sora接口客户端（无GUI）
+Sora视频助手和压测脚本共用：任务数据类、Base64简写、连接池会话、令牌桶限流、退避重试、
+提交/查询接口、自适应轮询间隔、有界工作队列、断点续传下载。不导入tkinter/ttkbootstrap。
+"""
+import os
+import re
+import time
+import uuid
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError
+
+# 屏蔽不安全的HTTPS请求警告（会话不校验证书）
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# ==================== 配置常量 ====================
+VIDEO_DOWNLOAD_TIMEOUT = 300
+MIN_VALID_VIDEO_SIZE = 10240
+# 下载：同时下载数、每次读取/写入的块大小、中断后续传的最多重试次数
+DOWNLOAD_CONCURRENCY = 3
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_MAX_RETRIES = 5
+
+# 提交引擎：并发上限、令牌桶速率（每秒请求数）与突发容量，可在config.json中覆盖
+DEFAULT_SUBMIT_CONCURRENCY = 4
+DEFAULT_SUBMIT_RATE = 2.0
+DEFAULT_SUBMIT_BURST = 4
+# 429/5xx/网络错误的重试：最多重试次数，退避基数与上限（秒）
+SUBMIT_MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# 非幂等请求（创建视频任务）只重试明确拒绝受理的状态码；500/502/504时服务器可能已经创建了任务
+SAFE_RETRY_STATUS_CODES = {429, 503}
+HTTP_POOL_SIZE = 16
+# 提交/查询请求的超时（秒）
+SUBMIT_TIMEOUT = 60
+QUERY_TIMEOUT = 30
+
+# 状态轮询：并发查询数、调度间隔，以及单个任务查询间隔的范围（秒）
+POLL_CONCURRENCY = 8
+POLL_TICK = 1.0
+POLL_INITIAL_INTERVAL = 10.0
+POLL_MIN_INTERVAL = 3.0
+POLL_MAX_INTERVAL = 60.0
+# 提交超过该秒数且进度停滞的任务按最长间隔查询
+POLL_STALL_AGE = 1800
+POLL_MAX_RETRIES = 2
+
+
+# ==================== 辅助函数：Base64判断与简写 ====================
+# 超过该长度才视为Base64；只检查开头这么多字符和结尾4个字符（不扫描/解码整个字符串）
+BASE64_MIN_LENGTH = 100
+BASE64_PREFIX_CHECK = 256
+_BASE64_PATTERN = re.compile(r'[A-Za-z0-9+/]+={0,2}')
+
+
+def is_base64(s: str) -> bool:
+    """判断字符串是否为超长的标准Base64（长度为4的倍数，开头一段和结尾都只含Base64字符）"""
+    if len(s) <= BASE64_MIN_LENGTH or len(s) % 4:
+        return False
+    return bool(_BASE64_PATTERN.fullmatch(s, 0, min(len(s), BASE64_PREFIX_CHECK))
+                and _BASE64_PATTERN.fullmatch(s, len(s) - 4))
+
+
+def shorten_base64_in_data(data: dict or list or str) -> dict or list or str:
+    """
+    将数据中的超长Base64简写为"base64"：迭代遍历（不受嵌套深度限制），
+    只浅复制字典/列表，不修改传入的数据，也不复制字符串
+    """
+    if isinstance(data, str):
+        return "base64" if is_base64(data) else data
+    if not isinstance(data, (dict, list)):
+        return data
+    root = dict(data) if isinstance(data, dict) else list(data)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for key, value in (list(node.items()) if isinstance(node, dict) else enumerate(node)):
+            if isinstance(value, str):
+                if is_base64(value):
+                    node[key] = "base64"
+            elif isinstance(value, (dict, list)):
+                child = dict(value) if isinstance(value, dict) else list(value)
+                node[key] = child
+                stack.append(child)
+    return root
+
+
+# ==================== 任务数据类 ====================
+@dataclass
+class SoraTask:
+    task_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    prefix_prompt: str = ""
+    main_prompt: str = ""
+    suffix_prompt: str = ""
+    full_prompt: str = ""
+    ref_image_path: str = ""
+    ref_image_hash: str = ""
+    aspect_ratio: str = "16:9"
+    duration: int = 15
+    size: str = "small"
+    status: str = "pending"
+    progress: int = 0
+    error: str = ""
+    api_task_id: str = ""
+    video_url: str = ""
+    remove_watermark: bool = True
+    download_path: str = ""
+    download_failed: bool = False
+    request_json: str = ""
+    response_json: str = ""
+    retries: int = 0
+    submitted_at: float = 0.0
+
+
+# ==================== 网络会话与限流 ====================
+def create_http_session(pool_size=HTTP_POOL_SIZE):
+    """创建复用连接的会话（所有提交线程共享，避免每次请求重新握手）"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = False
+    return session
+
+
+class TokenBucket:
+    """令牌桶限流：平均每秒rate个请求，最多允许capacity个突发，多线程共享"""
+
+    def __init__(self, rate, capacity):
+        self.rate = max(0.01, float(rate))
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """收到429时整体暂停发放令牌，所有线程一起退让"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def parse_retry_after(value):
+    """解析Retry-After头（只支持秒数），无效时返回None"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """指数退避 + 随机抖动（服务端给了Retry-After时优先遵循）"""
+    if retry_after is not None:
+        return min(RETRY_MAX_DELAY, retry_after)
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+def is_connect_error(error):
+    """请求是否在建立连接阶段就失败（连接超时/拒绝/域名解析失败），此时服务器一定没有收到请求"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    return isinstance(getattr(reason, "reason", reason), urllib3.exceptions.NewConnectionError)
+
+
+def request_with_retry(session, method, url, bucket=None, max_retries=SUBMIT_MAX_RETRIES, on_retry=None,
+                       idempotent=True, **kwargs):
+    """
+    发送请求，429/5xx/网络错误时退避重试；每次尝试前先从令牌桶取令牌
+    :param on_retry: 重试回调 on_retry(第几次重试, 等待秒数, 原因)
+    :param idempotent: False时（如创建视频任务）只重试连接阶段的错误和429/503响应，
+                       读超时/连接中断/500/502/504时服务器可能已经受理，重试会重复提交
+    :return: 最后一次的响应（非重试状态码或重试次数用尽）
+    """
+    retry_codes = RETRY_STATUS_CODES if idempotent else SAFE_RETRY_STATUS_CODES
+    attempt = 0
+    while True:
+        if bucket:
+            bucket.acquire()
+        try:
+            r = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= max_retries or not (idempotent or is_connect_error(e)):
+                raise
+            reason, retry_after = f"网络错误：{str(e)}", None
+        else:
+            if r.status_code not in retry_codes or attempt >= max_retries:
+                return r
+            reason, retry_after = f"HTTP {r.status_code}", parse_retry_after(r.headers.get("Retry-After"))
+            r.close()
+        delay = backoff_delay(attempt, retry_after)
+        if bucket and reason == "HTTP 429":
+            bucket.pause(delay)
+        attempt += 1
+        if on_retry:
+            on_retry(attempt, delay, reason)
+        time.sleep(delay)
+
+
+def next_poll_interval(state, progress, age, now):
+    """
+    计算任务下次查询的间隔：进度在涨时按预计剩余时间的1/4查询（越接近完成越频繁），
+    进度不变时逐次拉长1.5倍；提交很久仍停滞的任务直接用最长间隔
+    :param state: 该任务的轮询状态（记录上次进度、进度变化时间、当前间隔），原地更新
+    """
+    last_progress = state.get("progress")
+    interval = state.get("interval", POLL_INITIAL_INTERVAL)
+    if last_progress is None:
+        state["changed_at"] = now
+    elif progress > last_progress and now > state["changed_at"]:
+        rate = (progress - last_progress) / (now - state["changed_at"])
+        interval = (100 - progress) / rate / 4
+        state["changed_at"] = now
+    elif progress == last_progress:
+        interval *= 1.5
+        if age > POLL_STALL_AGE:
+            interval = POLL_MAX_INTERVAL
+    state["progress"] = progress
+    state["interval"] = min(POLL_MAX_INTERVAL, max(POLL_MIN_INTERVAL, interval))
+    return state["interval"]
+
+
+class WorkQueue:
+    """有界工作队列（提交/下载共用）：固定大小线程池限制并发，同一个key排队/执行期间不会重复入队"""
+
+    def __init__(self, func, concurrency, name):
+        self.func = func
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(concurrency)), thread_name_prefix=name)
+        self.queued = set()
+        self.lock = threading.Lock()
+
+    def enqueue(self, key, *args):
+        """加入队列执行 func(*args)，key已在队列中时返回False"""
+        with self.lock:
+            if key in self.queued:
+                return False
+            self.queued.add(key)
+        self.executor.submit(self._run, key, args)
+        return True
+
+    def _run(self, key, args):
+        try:
+            self.func(*args)
+        finally:
+            with self.lock:
+                self.queued.discard(key)
+
+    def pending_count(self):
+        with self.lock:
+            return len(self.queued)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ==================== 提交与查询接口 ====================
+def build_submit_params(task: SoraTask, ref_image_base64: str = "") -> dict:
+    """创建视频任务的请求参数"""
+    return {
+        "model": "sora-2",
+        "prompt": task.full_prompt,
+        "url": ref_image_base64,
+        "aspectRatio": task.aspect_ratio,
+        "duration": task.duration,
+        "size": task.size,
+        "webHook": "-1",
+        "shutProgress": False
+    }
+
+
+def submit_video(session, host, api_key, params, bucket=None, on_retry=None):
+    """
+    提交创建视频任务（令牌桶限流，429/503和连接失败时退避重试；
+    读超时和500/502/504不重试，服务器可能已经受理，重试会重复提交收费任务）
+    :return: 接口返回的JSON；HTTP错误时抛出异常
+    """
+    r = request_with_retry(
+        session, "POST",
+        f"{host.rstrip('/')}/v1/video/sora-video",
+        bucket=bucket,
+        on_retry=on_retry,
+        idempotent=False,
+        json=params,
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=SUBMIT_TIMEOUT
+    )
+    if r.status_code in RETRY_STATUS_CODES - SAFE_RETRY_STATUS_CODES:
+        raise requests.HTTPError(f"HTTP {r.status_code}：服务器可能已受理该任务，为避免重复提交未自动重试，"
+                                 f"请先确认平台上是否已生成再重新提交", response=r)
+    r.raise_for_status()
+    return r.json()
+
+
+def apply_submit_result(task: SoraTask, data: dict):
+    """提交成功时记录API任务ID和提交时间，接口返回错误时抛出异常"""
+    if data.get("code") == 0 and data.get("data", {}).get("id"):
+        task.api_task_id = data["data"]["id"]
+        task.submitted_at = time.time()
+    else:
+        raise Exception(data.get("message", "未知错误"))
+
+
+def query_video(session, host, api_key, api_task_id, on_retry=None):
+    """
+    查询任务状态（查询可重复执行，网络错误和429/5xx都会重试）
+    :return: 接口返回的JSON；网络/HTTP错误时抛出requests异常
+    """
+    r = request_with_retry(
+        session, "POST",
+        f"{host.rstrip('/')}/v1/draw/result",
+        max_retries=POLL_MAX_RETRIES,
+        on_retry=on_retry,
+        json={"id": api_task_id},
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=QUERY_TIMEOUT
+    )
+    r.raise_for_status()
+    return r.json()
+
+
+def apply_query_result(task: SoraTask, result: dict):
+    """把查询结果写入任务（进度、状态，成功时的视频链接），接口返回错误时抛出异常"""
+    if result.get("code") != 0:
+        raise Exception(result.get("message", "查询失败"))
+    data = result["data"]
+    task.progress = data.get("progress", task.progress)
+    task.status = data.get("status", task.status)
+    if task.status == "succeeded" and data.get("results"):
+        task.video_url = data["results"][0].get("url", "")
+
+
+def schedule_next_poll(state, task: SoraTask, ok, now):
+    """
+    安排任务下次查询：查询成功时按进度自适应间隔，失败时间隔加倍
+    :param state: 该任务的轮询状态，原地更新（state["next"]为下次查询的monotonic时间）
+    """
+    age = time.time() - task.submitted_at if task.submitted_at else 0
+    if ok:
+        interval = next_poll_interval(state, task.progress, age, now)
+    else:
+        interval = state["interval"] = min(POLL_MAX_INTERVAL, state.get("interval", POLL_INITIAL_INTERVAL) * 2)
+    state["next"] = now + interval
+    return state["next"]
+
+
+# ==================== 视频下载（断点续传 + 容器校验） ====================
+def verify_video_container(path):
+    """
+    校验下载的视频：大小达标；MP4/MOV要求顶层box首尾相接覆盖整个文件且包含ftyp和moov，
+    WebM/MKV只校验文件头
+    """
+    size = os.path.getsize(path)
+    if size < MIN_VALID_VIDEO_SIZE:
+        raise Exception(f"文件过小（{size} 字节），可能无效")
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if head[:4] == b"\x1a\x45\xdf\xa3":
+            return
+        if head[4:8] != b"ftyp":
+            raise Exception("不是有效的MP4文件（缺少ftyp）")
+        offset, box_types = 0, set()
+        while offset < size:
+            f.seek(offset)
+            header = f.read(16)
+            if len(header) < 8:
+                raise Exception("MP4结构不完整")
+            box_size = int.from_bytes(header[:4], "big")
+            if box_size == 1:
+                box_size = int.from_bytes(header[8:16], "big")
+            elif box_size == 0:
+                box_size = size - offset
+            if box_size < 8:
+                raise Exception("MP4结构损坏")
+            box_types.add(header[4:8])
+            offset += box_size
+    if offset != size:
+        raise Exception("MP4文件不完整（可能下载中断）")
+    if b"moov" not in box_types:
+        raise Exception("MP4缺少moov，文件不完整")
+
+
+def download_file(session, url, save_path):
+    """
+    下载到 save_path.part：已有部分时用Range续传，连接中断/5xx时退避后续传；
+    校验通过后原子改名为save_path，校验失败删除.part以便下次从头下载
+    :return: 文件大小（字节）
+    """
+    part_path = save_path + ".part"
+    os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+    for attempt in range(DOWNLOAD_MAX_RETRIES + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"User-Agent": "Mozilla/5.0"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        try:
+            with session.get(url, stream=True, headers=headers, timeout=(15, VIDEO_DOWNLOAD_TIMEOUT)) as r:
+                if offset and r.status_code == 416:
+                    break  # .part已经完整
+                r.raise_for_status()
+                # 服务器不支持续传（返回200）时从头写入
+                resumed = r.status_code == 206 and r.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+                if r.status_code == 206 and not resumed:
+                    # 返回的片段起点与请求不符：不能当作整个文件写入，丢弃.part后不带Range重新请求
+                    if not offset:
+                        raise Exception(f"服务器返回了不完整的片段：{r.headers.get('Content-Range', '')}")
+                    os.remove(part_path)
+                    continue
+                with open(part_path, "ab" if resumed else "wb", buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                    for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            break
+        except (requests.ConnectionError, requests.Timeout, ChunkedEncodingError, requests.HTTPError) as e:
+            retryable = not isinstance(e, requests.HTTPError) or e.response.status_code in RETRY_STATUS_CODES
+            if not retryable or attempt >= DOWNLOAD_MAX_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt))
+
+    try:
+        verify_video_container(part_path)
+    except Exception:
+        os.remove(part_path)
+        raise
+    os.replace(part_path, save_path)
+    return os.path.getsize(save_path)
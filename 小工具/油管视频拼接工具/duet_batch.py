@@ -0,0 +1,196 @@
+"""
+视频拼接批次清单（无GUI）
+清单保存在输出文件夹的 duet_manifest.json 中，记录每个计划任务(a, b, 参数)、
+确定性的输出文件名和状态。重新启动时只调度未完成/失败的任务，
+已完成的任务按文件大小和时长校验后跳过。
+"""
+import os
+import csv
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+# ========== 清单配置 ==========
+MANIFEST_FILE_NAME = "duet_manifest.json"
+# 校验已完成输出时允许的时长误差（秒）
+DURATION_TOLERANCE = 0.5
+# 渲染中的临时文件后缀（渲染成功后原子重命名为正式文件名）
+PART_SUFFIX = ".part.mp4"
+
+_manifest_lock = threading.Lock()
+
+
+# ========== 清单读写 ==========
+def load_manifest(output_folder):
+    """读取输出文件夹中的批次清单，不存在或损坏时返回空清单"""
+    manifest_file = os.path.join(output_folder, MANIFEST_FILE_NAME)
+    if os.path.exists(manifest_file):
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            manifest.setdefault("jobs", {})
+            manifest.setdefault("last_batch", {})
+            return manifest
+        except Exception:
+            pass
+    return {"jobs": {}, "last_batch": {}}
+
+
+def save_manifest(output_folder, manifest):
+    """保存批次清单（临时文件+原子替换，崩溃时不会留下半个清单）"""
+    manifest_file = os.path.join(output_folder, MANIFEST_FILE_NAME)
+    with _manifest_lock:
+        temp_file = manifest_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temp_file, manifest_file)
+
+
+# ========== 任务规划 ==========
+def make_job_id(a_file, b_file, audio_source, duration_source, overlap_pixels):
+    """同一组(a, b, 参数)总是得到同一个任务ID"""
+    key = json.dumps([os.path.abspath(a_file), os.path.abspath(b_file),
+                      audio_source, duration_source, int(overlap_pixels)], ensure_ascii=False)
+    return hashlib.md5(key.encode()).hexdigest()[:12]
+
+
+def make_output_name(a_file, b_file, job_id):
+    """确定性输出文件名（不含时间前缀，重启后仍能对应到同一个文件）"""
+    a_hash = hashlib.md5(a_file.encode()).hexdigest()[:16]
+    b_hash = hashlib.md5(b_file.encode()).hexdigest()[:16]
+    return f"{a_hash}_{b_hash}_{job_id[:6]}.mp4"
+
+
+def make_batch_signature(settings):
+    """批次参数签名：文件夹/模式/数量/音频/时长/蒙板相同视为同一批次"""
+    return hashlib.md5(json.dumps(settings, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def get_resumable_pairs(manifest, settings):
+    """上一批次参数相同且仍有未完成任务时，返回其配对列表用于续跑（随机模式不会重新抽样）"""
+    last_batch = manifest.get("last_batch", {})
+    if last_batch.get("signature") != make_batch_signature(settings):
+        return None
+    jobs = [manifest["jobs"].get(job_id) for job_id in last_batch.get("job_ids", [])]
+    if not jobs or None in jobs or all(job["status"] == "done" for job in jobs):
+        return None
+    return [(job["a_file"], job["b_file"]) for job in jobs]
+
+
+def plan_jobs(manifest, pairs, output_folder, settings, audio_source, duration_source, overlap_pixels):
+    """
+    把配对列表登记到清单中
+    :return: 需要执行的任务列表（新任务、未完成任务和失败任务）
+    """
+    job_ids = []
+    for a_file, b_file in pairs:
+        job_id = make_job_id(a_file, b_file, audio_source, duration_source, overlap_pixels)
+        job_ids.append(job_id)
+        if job_id not in manifest["jobs"]:
+            manifest["jobs"][job_id] = {
+                "job_id": job_id,
+                "a_file": a_file,
+                "b_file": b_file,
+                "audio_source": audio_source,
+                "duration_source": duration_source,
+                "overlap_pixels": int(overlap_pixels),
+                "output_file": os.path.join(output_folder, make_output_name(a_file, b_file, job_id)),
+                "status": "pending",
+                "error": "",
+                "size": 0,
+                "duration": 0
+            }
+    manifest["last_batch"] = {
+        "signature": make_batch_signature(settings),
+        "settings": settings,
+        "job_ids": job_ids,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    return [manifest["jobs"][job_id] for job_id in dict.fromkeys(job_ids)]
+
+
+# ========== 完成校验 ==========
+def verify_output(job, probe=None):
+    """已完成任务的输出文件必须存在，且大小与记录一致、时长在误差范围内"""
+    output_file = job["output_file"]
+    if not os.path.exists(output_file) or os.path.getsize(output_file) != job.get("size"):
+        return False
+    if probe is None:
+        return True
+    try:
+        return abs(probe(output_file)["duration"] - job.get("duration", 0)) <= DURATION_TOLERANCE
+    except Exception:
+        return False
+
+
+def split_done_jobs(jobs, probe=None):
+    """拆分出已完成(校验通过)和待执行的任务；校验不通过的已完成任务重置为pending"""
+    done, todo = [], []
+    for job in jobs:
+        if job["status"] == "done" and verify_output(job, probe):
+            done.append(job)
+        else:
+            if job["status"] == "done":
+                job["status"] = "pending"
+            todo.append(job)
+    return done, todo
+
+
+def finish_job(job, success, error="", probe=None, temp_file=None):
+    """
+    任务结束：成功时把临时文件原子重命名为正式文件，并记录大小和时长
+    :param temp_file: 可选，渲染写入的临时文件（默认 输出文件+PART_SUFFIX；分布式工作进程各用各的）
+    """
+    temp_file = temp_file or job["output_file"] + PART_SUFFIX
+    if success and os.path.exists(temp_file):
+        os.replace(temp_file, job["output_file"])
+        job["status"] = "done"
+        job["error"] = ""
+        job["size"] = os.path.getsize(job["output_file"])
+        if probe is not None:
+            try:
+                job["duration"] = probe(job["output_file"])["duration"]
+            except Exception:
+                job["duration"] = 0
+    else:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        job["status"] = "failed"
+        job["error"] = error or "渲染失败"
+    job["finished_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ========== 耗时报告 ==========
+TIMING_FIELDS = ["probe", "preprocess", "mask", "encode"]
+
+
+def write_timing_report(output_folder, rows, batch_info):
+    """
+    批次结束时写出耗时报告（JSON+CSV），便于对比不同编码器/线程数
+    :param rows: 每个任务一行：{job_id, a_file, b_file, success, stats}
+    :return: (JSON路径, CSV路径)
+    """
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    json_file = os.path.join(output_folder, f"duet_timing_{stamp}.json")
+    csv_file = os.path.join(output_folder, f"duet_timing_{stamp}.csv")
+
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump({"batch": batch_info, "jobs": rows}, f, ensure_ascii=False, indent=2)
+
+    header = ["job_id", "a_file", "b_file", "success", "backend", "encoder"] + TIMING_FIELDS + \
+             ["total_seconds", "frames", "fps", "duration"]
+    with open(csv_file, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            stats = row.get("stats") or {}
+            timings = stats.get("timings", {})
+            writer.writerow(
+                [row["job_id"], os.path.basename(row["a_file"]), os.path.basename(row["b_file"]), row["success"],
+                 stats.get("backend", ""), stats.get("encoder", "")]
+                + [timings.get(name, "") for name in TIMING_FIELDS]
+                + [stats.get("total_seconds", ""), stats.get("frames", ""), stats.get("fps", ""),
+                   stats.get("duration", "")]
+            )
+    return json_file, csv_file
@@ -0,0 +1,261 @@
+"""
+视频拼接渲染基准测试（无GUI）
+用ffmpeg的testsrc画面+sine音频在本地生成不同宽高比/时长的合成素材，
+按 渲染引擎 × 并发数 逐组运行，记录墙钟时间、编码fps、峰值内存(RSS)和输出大小，
+结果保存为JSON（duet_bench_results/bench_时间.json），可用 --compare 与历史结果对比。
+
+用法：
+    python duet_benchmark.py                                   默认：ffmpeg/moviepy/bounded × 并发1、2
+    python duet_benchmark.py --backends ffmpeg --concurrency 1,2,4 --durations 5,30
+    python duet_benchmark.py --compare duet_bench_results/bench_20250101_120000.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import wait
+
+from duet_worker import (
+    HAS_PSUTIL, CPU_PHYSICAL_CORES, CPU_LOGICAL_CORES,
+    get_ffmpeg_binary, probe_video, select_encoder, create_process_pool,
+    process_single_pair_ffmpeg, process_single_pair_moviepy, process_single_pair_bounded, _ffmpeg_fingerprint
+)
+
+if HAS_PSUTIL:
+    import psutil
+
+# ========== 基准配置 ==========
+BENCH_DIR = "duet_bench"
+RESULTS_DIR = "duet_bench_results"
+# 合成素材的宽高比（横屏/竖屏/方形），每种各生成一段
+CLIP_SIZES = {"16x9": (1920, 1080), "9x16": (1080, 1920), "1x1": (1080, 1080)}
+CLIP_FPS = 30
+# 内存采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.2
+BACKENDS = {"ffmpeg": process_single_pair_ffmpeg, "moviepy": process_single_pair_moviepy,
+            "bounded": process_single_pair_bounded}
+
+
+# ========== 合成素材 ==========
+def make_synthetic_clip(path, width, height, duration, frequency=440):
+    """生成testsrc画面+正弦音频的测试素材（已存在时直接复用）"""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        return path
+    cmd = [
+        get_ffmpeg_binary(), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate={CLIP_FPS}:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k", "-shortest", path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="ignore")
+    if result.returncode != 0:
+        raise RuntimeError(f"生成测试素材失败：{result.stderr.strip()[-300:]}")
+    return path
+
+
+def prepare_clips(durations, bench_dir=BENCH_DIR):
+    """为每个时长生成全部宽高比的素材，返回 {时长: [(名称, 路径)]}"""
+    os.makedirs(bench_dir, exist_ok=True)
+    clips = {}
+    for duration in durations:
+        clips[duration] = []
+        for index, (name, (width, height)) in enumerate(CLIP_SIZES.items()):
+            path = os.path.join(bench_dir, f"src_{name}_{duration}s.mp4")
+            clips[duration].append((name, make_synthetic_clip(path, width, height, duration, 440 + 110 * index)))
+    return clips
+
+
+# ========== 峰值内存采样 ==========
+class PeakRssSampler:
+    """后台线程定时统计本进程及全部子孙进程（渲染子进程、ffmpeg）的RSS总和，记录峰值"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def sample(self):
+        root = psutil.Process()
+        total = 0
+        for process in [root] + root.children(recursive=True):
+            try:
+                total += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        self.peak = max(self.peak, total)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def __enter__(self):
+        if HAS_PSUTIL:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        if HAS_PSUTIL:
+            self.thread.join()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1) if HAS_PSUTIL else None
+
+
+# ========== 单组基准 ==========
+def run_scenario(backend, concurrency, clips, jobs, encoder, output_dir, overlap_pixels=135):
+    """
+    以指定引擎和并发数渲染 jobs 个配对（在素材间轮换组合），返回该组的统计结果
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    render = BACKENDS[backend]
+    threads = max(1, CPU_PHYSICAL_CORES // concurrency)
+    infos = {path: probe_video(path) for _, path in clips}
+    combos = [(a, b) for a in clips for b in clips if a[0] != b[0]]
+    tasks = []
+    for index in range(jobs):
+        (name_a, a_file), (name_b, b_file) = combos[index % len(combos)]
+        output_file = os.path.join(output_dir, f"{backend}_c{concurrency}_{index:03d}_{name_a}_{name_b}.mp4")
+        tasks.append((a_file, b_file, output_file, "A 的音频", "A 的时长", overlap_pixels))
+
+    executor, manager, _ = create_process_pool(concurrency)
+    results = []
+    try:
+        with PeakRssSampler() as sampler:
+            start = time.perf_counter()
+            futures = []
+            for args in tasks:
+                pair_infos = (infos[args[0]], infos[args[1]])
+                if backend == "ffmpeg":
+                    futures.append(executor.submit(render, args, None, pair_infos, encoder, threads))
+                else:
+                    futures.append(executor.submit(render, args, None, encoder, threads, pair_infos))
+            wait(futures)
+            wall = time.perf_counter() - start
+        results = [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=True)
+        manager.shutdown()
+
+    frames = sum(stats.get("frames", 0) for _, _, _, _, stats in results)
+    succeeded = sum(1 for success, *_ in results if success)
+    output_bytes = sum(os.path.getsize(args[2]) for args in tasks if os.path.exists(args[2]))
+    return {
+        "backend": backend,
+        "encoder": encoder,
+        "concurrency": concurrency,
+        "threads_per_job": threads,
+        "jobs": jobs,
+        "succeeded": succeeded,
+        "wall_seconds": round(wall, 3),
+        "frames": frames,
+        "fps": round(frames / wall, 2) if wall > 0 else 0,
+        "videos_per_hour": round(succeeded / wall * 3600, 1) if wall > 0 else 0,
+        "peak_rss_mb": sampler.peak_mb,
+        "output_bytes": output_bytes,
+        "job_stats": [stats for *_, stats in results],
+        "errors": [log.strip().splitlines()[-1] for success, _, _, log, _ in results if not success and log.strip()]
+    }
+
+
+# ========== 结果保存与对比 ==========
+def scenario_key(result):
+    return f"{result['backend']}|{result['encoder']}|c{result['concurrency']}|{result['duration']}s"
+
+
+def machine_info():
+    """运行环境信息（便于区分不同机器/ffmpeg版本的结果）"""
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_physical": CPU_PHYSICAL_CORES,
+        "cpu_logical": CPU_LOGICAL_CORES,
+        "memory_gb": round(psutil.virtual_memory().total / 1024 ** 3, 1) if HAS_PSUTIL else None,
+        "ffmpeg": _ffmpeg_fingerprint(get_ffmpeg_binary())
+    }
+
+
+def compare_results(current, previous):
+    """按 引擎|编码器|并发|时长 对齐两次结果，输出fps和峰值内存的变化"""
+    old = {scenario_key(r): r for r in previous.get("results", [])}
+    lines = []
+    for result in current["results"]:
+        before = old.get(scenario_key(result))
+        if not before or not before["fps"]:
+            continue
+        change = (result["fps"] / before["fps"] - 1) * 100
+        line = f"{scenario_key(result)}：{before['fps']} → {result['fps']} fps（{change:+.1f}%）"
+        if result["peak_rss_mb"] and before.get("peak_rss_mb"):
+            line += f"，峰值内存 {before['peak_rss_mb']} → {result['peak_rss_mb']} MB"
+        lines.append(line)
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="视频拼接渲染基准测试（合成素材）")
+    parser.add_argument("--backends", default="ffmpeg,moviepy,bounded", help="渲染引擎列表，逗号分隔")
+    parser.add_argument("--concurrency", default="1,2", help="并发数列表，逗号分隔")
+    parser.add_argument("--durations", default="5,20", help="素材时长（秒）列表，逗号分隔")
+    parser.add_argument("--jobs", type=int, default=4, help="每组渲染的视频数")
+    parser.add_argument("--encoder", default=None, help="编码器（默认按探测结果自动选择）")
+    parser.add_argument("--compare", help="与之前保存的结果JSON对比")
+    parser.add_argument("--keep", action="store_true", help="保留渲染输出（默认每组结束后删除）")
+    args = parser.parse_args(argv)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    for backend in backends:
+        if backend not in BACKENDS:
+            parser.error(f"未知的渲染引擎：{backend}")
+    concurrency_list = [int(c) for c in args.concurrency.split(",")]
+    durations = [int(d) for d in args.durations.split(",")]
+    encoder = select_encoder(args.encoder)
+
+    print(f"生成测试素材：{', '.join(CLIP_SIZES)} × {durations} 秒", file=sys.stderr)
+    clips = prepare_clips(durations)
+    report = {"created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+              "machine": machine_info(), "results": []}
+    for duration in durations:
+        for backend in backends:
+            for concurrency in concurrency_list:
+                output_dir = os.path.join(BENCH_DIR, "out")
+                print(f"▶ {backend} | 并发{concurrency} | {duration}秒素材 × {args.jobs}个", file=sys.stderr)
+                result = run_scenario(backend, concurrency, clips[duration], args.jobs, encoder, output_dir)
+                result["duration"] = duration
+                report["results"].append(result)
+                print(f"  {result['wall_seconds']}秒，{result['fps']} fps，峰值内存 {result['peak_rss_mb']} MB，"
+                      f"输出 {result['output_bytes'] / 1024 / 1024:.1f} MB，成功 {result['succeeded']}/{args.jobs}",
+                      file=sys.stderr)
+                if not args.keep:
+                    shutil.rmtree(output_dir, ignore_errors=True)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_file = os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存：{result_file}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            for line in compare_results(report, json.load(f)):
+                print(line, file=sys.stderr)
+    print(json.dumps({"result_file": result_file, "results": [
+        {k: r[k] for k in ("backend", "encoder", "concurrency", "duration", "wall_seconds", "fps",
+                           "peak_rss_mb", "output_bytes", "succeeded")}
+        for r in report["results"]
+    ]}, ensure_ascii=False))
+    return 0
+
+
+# spawn子进程以__mp_main__导入本文件，不会执行main()
+if __name__ == "__main__":
+    sys.exit(main())
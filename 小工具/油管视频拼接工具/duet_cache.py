@@ -0,0 +1,211 @@
+"""
+视频拼接缓存（无GUI）
+1. 源视频预处理缓存：每个源视频只裁剪/缩放一次，生成全I帧中间文件，
+   按内容哈希命名，后续配对渲染直接读取中间文件（N+M次解码代替N×M次）。
+2. 元数据缓存：ffprobe结果按 路径+修改时间+大小（+版本号） 保存到JSON，跨会话复用。
+3. 感知哈希：按需计算源视频的dHash，与元数据保存在同一缓存条目中。
+"""
+import os
+import json
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from duet_worker import (
+    THREADS_PER_VIDEO, CPU_PHYSICAL_CORES,
+    get_ffmpeg_binary, probe_video, compute_crop_size
+)
+
+# ========== 缓存配置 ==========
+NORMALIZE_CACHE_DIR = "duet_cache"
+# 预处理参数变化时递增版本号，旧缓存自动失效
+NORMALIZE_VERSION = 1
+# 内容哈希：文件大小 + 头尾各4MB（避免为超大文件读完整个文件）
+CONTENT_HASH_CHUNK = 4 * 1024 * 1024
+PROBE_CACHE_FILE = "duet_probe_cache.json"
+# 元数据字段变化时递增版本号（如新增audio_codec），旧条目重新探测
+PROBE_VERSION = 2
+PROBE_WORKERS = 8
+# 感知哈希取帧位置（视频时长的比例），每帧缩成9×8灰度图计算64位dHash
+PHASH_POSITIONS = (0.25, 0.5, 0.75)
+
+_probe_cache = None
+_probe_cache_dirty = False
+_probe_lock = threading.Lock()
+
+
+# ========== 内容哈希 ==========
+def file_content_hash(path):
+    """计算视频文件的内容哈希（大小+头尾采样），与文件名/路径无关"""
+    size = os.path.getsize(path)
+    sha = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        sha.update(f.read(CONTENT_HASH_CHUNK))
+        if size > CONTENT_HASH_CHUNK * 2:
+            f.seek(-CONTENT_HASH_CHUNK, os.SEEK_END)
+            sha.update(f.read(CONTENT_HASH_CHUNK))
+    return sha.hexdigest()[:20]
+
+
+# ========== 元数据缓存（ffprobe结果跨会话复用） ==========
+def load_probe_cache(cache_file=PROBE_CACHE_FILE):
+    """加载元数据缓存（只加载一次）"""
+    global _probe_cache
+    with _probe_lock:
+        if _probe_cache is None:
+            _probe_cache = {}
+            if os.path.exists(cache_file):
+                try:
+                    with open(cache_file, "r", encoding="utf-8") as f:
+                        _probe_cache = json.load(f)
+                except Exception:
+                    _probe_cache = {}
+        return _probe_cache
+
+
+def save_probe_cache(cache_file=PROBE_CACHE_FILE):
+    """有变化时保存元数据缓存（临时文件+原子替换）"""
+    global _probe_cache_dirty
+    with _probe_lock:
+        if not _probe_cache_dirty or _probe_cache is None:
+            return
+        temp_file = cache_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(_probe_cache, f, ensure_ascii=False)
+        os.replace(temp_file, cache_file)
+        _probe_cache_dirty = False
+
+
+def get_video_info(path):
+    """读取视频元数据：路径、修改时间、大小都未变时直接使用缓存，否则ffprobe一次"""
+    global _probe_cache_dirty
+    cache = load_probe_cache()
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    with _probe_lock:
+        entry = cache.get(key)
+    if (entry and entry.get("version") == PROBE_VERSION
+            and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size):
+        return entry["info"]
+
+    info = probe_video(path)
+    with _probe_lock:
+        cache[key] = {"version": PROBE_VERSION, "mtime": stat.st_mtime, "size": stat.st_size, "info": info}
+        _probe_cache_dirty = True
+    return info
+
+
+def probe_videos(paths, max_workers=PROBE_WORKERS, log_callback=None):
+    """
+    并行读取一批视频的元数据（已缓存的不会启动ffprobe）
+    :return: {路径: 元数据}，无法读取的视频不在结果中
+    """
+    log_callback = log_callback or (lambda msg: None)
+    infos = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_path = {executor.submit(get_video_info, p): p for p in dict.fromkeys(paths)}
+        for future in as_completed(future_to_path):
+            path = future_to_path[future]
+            try:
+                infos[path] = future.result()
+            except Exception as e:
+                log_callback(f"⚠️ 无法读取视频信息，已跳过：{os.path.basename(path)} → {str(e)}\n")
+    save_probe_cache()
+    return infos
+
+
+# ========== 感知哈希（画面几乎相同的源视频去重） ==========
+def compute_perceptual_hash(path, duration):
+    """在若干位置各取一帧计算dHash（相邻像素亮度比较），拼接为十六进制字符串"""
+    bits = []
+    for position in PHASH_POSITIONS:
+        cmd = [get_ffmpeg_binary(), "-v", "error", "-ss", f"{duration * position:.3f}", "-i", path,
+               "-frames:v", "1", "-vf", "scale=9:8,format=gray", "-f", "rawvideo", "-"]
+        result = subprocess.run(cmd, capture_output=True)
+        data = result.stdout
+        if result.returncode != 0 or len(data) < 72:
+            raise RuntimeError(result.stderr.decode("utf-8", errors="ignore").strip()[-300:] or "无法取帧")
+        for row in range(8):
+            for col in range(8):
+                bits.append("1" if data[row * 9 + col] > data[row * 9 + col + 1] else "0")
+    return f"{int(''.join(bits), 2):0{len(bits) // 4}x}"
+
+
+def get_perceptual_hash(path):
+    """读取感知哈希（缓存在元数据条目中，文件未变时不重新取帧）"""
+    global _probe_cache_dirty
+    info = get_video_info(path)
+    key = os.path.abspath(path)
+    with _probe_lock:
+        entry = _probe_cache.get(key, {})
+        if entry.get("phash"):
+            return entry["phash"]
+    phash = compute_perceptual_hash(path, info["duration"])
+    with _probe_lock:
+        _probe_cache.setdefault(key, entry)["phash"] = phash
+        _probe_cache_dirty = True
+    return phash
+
+
+def hamming_distance(hash_a, hash_b):
+    """两个十六进制哈希的汉明距离"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+# ========== 单个源视频预处理 ==========
+def normalize_source(path, cache_dir=NORMALIZE_CACHE_DIR):
+    """
+    将源视频裁剪为9:16并缩放到1080高，编码为全I帧中间文件（快速解码/随机定位）
+    :return: (中间文件路径, 是否命中缓存)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, f"{file_content_hash(path)}_v{NORMALIZE_VERSION}.mkv")
+    if os.path.exists(cache_file) and os.path.getsize(cache_file) > 0:
+        return cache_file, True
+
+    info = get_video_info(path)
+    x1, y1, crop_w, crop_h, scaled_w = compute_crop_size(info["width"], info["height"])
+
+    # 先写临时文件再原子重命名，避免中断后留下半个缓存文件
+    temp_file = cache_file + ".part.mkv"
+    cmd = [
+        get_ffmpeg_binary(), "-y", "-loglevel", "error", "-i", path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", f"crop={crop_w}:{crop_h}:{x1}:{y1},scale={scaled_w}:1080",
+        # yuv444p 允许奇数宽度（与moviepy缩放后的宽度保持一致）
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "12", "-g", "1", "-bf", "0",
+        "-pix_fmt", "yuv444p", "-c:a", "copy",
+        "-threads", str(THREADS_PER_VIDEO), temp_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="ignore")
+    if result.returncode != 0:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise RuntimeError(result.stderr.strip()[-500:] or f"ffmpeg退出码{result.returncode}")
+    os.replace(temp_file, cache_file)
+    return cache_file, False
+
+
+# ========== 批量预处理 ==========
+def prepare_intermediates(paths, cache_dir=NORMALIZE_CACHE_DIR, max_workers=None, log_callback=None):
+    """
+    并行预处理一批源视频（去重后每个只处理一次）
+    :return: {源路径: 中间文件路径}，预处理失败的源视频不在结果中（渲染时直接读取源文件）
+    """
+    log_callback = log_callback or (lambda msg: None)
+    unique_paths = list(dict.fromkeys(paths))
+    mapping = {}
+    workers = max_workers or max(1, CPU_PHYSICAL_CORES // THREADS_PER_VIDEO)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        future_to_path = {executor.submit(normalize_source, p, cache_dir): p for p in unique_paths}
+        for future in as_completed(future_to_path):
+            path = future_to_path[future]
+            try:
+                cache_file, cached = future.result()
+                mapping[path] = cache_file
+                state = "命中缓存" if cached else "预处理完成"
+                log_callback(f"📦 {state}：{os.path.basename(path)}（{len(mapping)}/{len(unique_paths)}）\n")
+            except Exception as e:
+                log_callback(f"⚠️ 预处理失败，将直接读取源文件：{os.path.basename(path)} → {str(e)}\n")
+    return mapping
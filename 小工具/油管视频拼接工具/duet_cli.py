@@ -0,0 +1,137 @@
+"""
+视频拼接命令行版（无GUI，适合无显示器的Linux渲染节点）
+用法：python duet_cli.py batch.yaml   （也支持 .json）
+标准输出每行一个JSON事件（batch_start / progress / job_done / batch_end），
+可读日志输出到标准错误。不导入tkinter/customtkinter。
+
+批次文件示例（YAML）：
+    folder_a: /data/A
+    folder_b: /data/B
+    output_folder: /data/O
+    mode: random          # random / exhaustive / 1vN（也可直接写 随机模式 / 穷举模式 / 1vN模式）
+    num_generate: 5
+    audio_source: A       # A / B
+    duration_source: A    # A / B
+    overlap_pixels: 135
+    encoder: auto         # auto / libx264 / h264_nvenc ...
+    max_workers: 4        # 可选，并发上限
+    dedup_sources: false  # 可选，按感知哈希跳过画面几乎相同的源视频
+"""
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+
+from duet_worker import ENCODER_PROFILES
+from duet_runner import DuetBatchRunner, MODES
+
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+# ========== 批次文件字段映射（英文简写 → 内部取值，与GUI保存的清单保持一致） ==========
+MODE_ALIASES = {"random": "随机模式", "exhaustive": "穷举模式", "1vn": "1vN模式"}
+SOURCE_ALIASES = {"a": "A", "b": "B"}
+SPEC_DEFAULTS = {
+    "mode": "random", "num_generate": 5, "audio_source": "A", "duration_source": "A",
+    "overlap_pixels": 135, "encoder": "auto", "max_workers": None,
+    "dedup_sources": False
+}
+
+_print_lock = threading.Lock()
+
+
+def load_spec(path, overrides=None):
+    """读取批次文件（.yaml/.yml需要PyYAML，其余按JSON解析），合并命令行覆盖项后规范化字段"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            if not HAS_YAML:
+                raise ValueError("读取YAML批次文件需要安装PyYAML：pip install pyyaml")
+            raw = yaml.safe_load(f) or {}
+        else:
+            raw = json.load(f)
+    raw.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    return normalize_spec(raw, base_dir=os.path.dirname(os.path.abspath(path)))
+
+
+def normalize_spec(raw, base_dir="."):
+    """补全默认值、把英文简写转为内部取值，相对路径按批次文件所在目录解析"""
+    spec = dict(SPEC_DEFAULTS, **raw)
+    for key in ("folder_a", "folder_b", "output_folder"):
+        if not spec.get(key):
+            raise ValueError(f"批次文件缺少字段：{key}")
+        spec[key] = os.path.normpath(os.path.join(base_dir, os.path.expanduser(str(spec[key]))))
+
+    mode = str(spec["mode"])
+    spec["mode"] = MODE_ALIASES.get(mode.lower(), mode)
+    if spec["mode"] not in MODES:
+        raise ValueError(f"未知的拼接模式：{mode}")
+
+    for key, suffix in (("audio_source", " 的音频"), ("duration_source", " 的时长")):
+        value = str(spec[key]).strip()
+        letter = SOURCE_ALIASES.get(value.lower(), value[:1].upper())
+        if letter not in ("A", "B"):
+            raise ValueError(f"{key} 只能是 A 或 B：{value}")
+        spec[key] = letter + suffix
+
+    if spec["mode"] != "穷举模式" and int(spec["num_generate"]) <= 0:
+        raise ValueError("num_generate 必须是正整数")
+    spec["num_generate"] = str(int(spec["num_generate"]))
+    spec["overlap_pixels"] = int(spec["overlap_pixels"])
+    if spec["encoder"] != "auto" and spec["encoder"] not in ENCODER_PROFILES:
+        raise ValueError(f"不支持的编码器：{spec['encoder']}（可选：auto, {', '.join(ENCODER_PROFILES)}）")
+    return spec
+
+
+def emit_event(event):
+    """标准输出写一行JSON事件（立即刷新，便于管道实时读取）"""
+    with _print_lock:
+        sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+
+def emit_log(message):
+    """可读日志写到标准错误，不干扰标准输出的JSON事件"""
+    with _print_lock:
+        sys.stderr.write(message if message.endswith("\n") else message + "\n")
+        sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="视频拼接命令行版（批次文件驱动，JSON行输出进度）")
+    parser.add_argument("spec", help="批次文件路径（.yaml/.yml/.json）")
+    parser.add_argument("--encoder", help="覆盖批次文件中的编码器")
+    parser.add_argument("--max-workers", type=int, help="覆盖批次文件中的并发上限")
+    parser.add_argument("--quiet", action="store_true", help="不输出可读日志，只输出JSON事件")
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load_spec(args.spec, {"encoder": args.encoder, "max_workers": args.max_workers})
+    except (OSError, ValueError) as e:
+        emit_event({"type": "error", "message": str(e)})
+        return 2
+
+    runner = DuetBatchRunner(spec, log_callback=None if args.quiet else emit_log, event_callback=emit_event)
+    # Ctrl+C / SIGTERM：处理函数只设置取消标志，由主线程的run()取消未开始的任务，
+    # 等待渲染中的任务结束后输出汇总（渲染子进程忽略Ctrl+C）
+    signal.signal(signal.SIGINT, lambda signum, frame: runner.cancel())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda signum, frame: runner.cancel())
+
+    try:
+        summary = runner.run()
+    except Exception as e:
+        emit_event({"type": "error", "message": str(e)})
+        return 2
+    if summary["cancelled"]:
+        return 130
+    return 1 if summary["failed"] else 0
+
+
+# spawn子进程以__mp_main__导入本文件，不会执行main()
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+视频拼接配对规划（无GUI）
+1. 整个批次内不放回抽样：随机模式不会出现重复配对，1vN模式每个A的N个B互不相同，
+   并优先使用本批次中用得少的B，让B视频被均匀使用。
+2. 跨批次记忆：批次清单中已完成的(A, B)配对视为历史，优先抽取没做过的配对，
+   新配对不够时才用历史配对补足。
+3. 可选：按感知哈希跳过画面几乎相同的源视频（同一素材的不同文件名/转码版本）。
+"""
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from duet_cache import PROBE_WORKERS, get_perceptual_hash, hamming_distance, save_probe_cache
+
+# ========== 规划配置 ==========
+# 感知哈希汉明距离不超过该值视为同一画面（哈希共192位）
+PHASH_THRESHOLD = 12
+# 随机模式候选配对数不超过该值时直接枚举，否则拒绝采样（避免为超大文件夹生成完整笛卡尔积）
+ENUMERATE_LIMIT = 200000
+
+
+# ========== 历史配对 ==========
+def load_pair_history(manifest):
+    """批次清单中已完成的(A, B)配对"""
+    return {
+        (os.path.abspath(job["a_file"]), os.path.abspath(job["b_file"]))
+        for job in manifest.get("jobs", {}).values() if job.get("status") == "done"
+    }
+
+
+# ========== 感知哈希去重 ==========
+def dedupe_similar_sources(paths, threshold=PHASH_THRESHOLD, log_callback=None):
+    """
+    去掉画面与前面某个视频几乎相同的源视频（保留先出现的）
+    :return: 去重后的路径列表（无法计算哈希的视频保留）
+    """
+    log_callback = log_callback or (lambda msg: None)
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as executor:
+        futures = {path: executor.submit(get_perceptual_hash, path) for path in paths}
+    save_probe_cache()
+
+    kept, kept_hashes = [], []
+    for path in paths:
+        try:
+            phash = futures[path].result()
+        except Exception as e:
+            log_callback(f"⚠️ 无法计算感知哈希，按不重复处理：{os.path.basename(path)} → {str(e)}\n")
+            kept.append(path)
+            continue
+        duplicate = next((kept[i] for i, h in kept_hashes if hamming_distance(phash, h) <= threshold), None)
+        if duplicate:
+            log_callback(f"🪞 画面与 {os.path.basename(duplicate)} 几乎相同，已跳过：{os.path.basename(path)}\n")
+            continue
+        kept_hashes.append((len(kept), phash))
+        kept.append(path)
+    return kept
+
+
+# ========== 配对抽样 ==========
+def sample_random_pairs(videos_a, videos_b, n_value, history=frozenset()):
+    """
+    随机模式：从 A×B 中不放回抽取n个配对，先抽历史中没有的，不够时再用历史配对补足
+    :return: (配对列表, 使用的历史配对数)；n超过可组合总数时只返回全部组合
+    """
+    total = len(videos_a) * len(videos_b)
+    n_value = min(n_value, total)
+
+    def pair_at(index):
+        return videos_a[index // len(videos_b)], videos_b[index % len(videos_b)]
+
+    def is_new(pair):
+        return (os.path.abspath(pair[0]), os.path.abspath(pair[1])) not in history
+
+    if total <= ENUMERATE_LIMIT:
+        indices = list(range(total))
+        random.shuffle(indices)
+        fresh = [i for i in indices if is_new(pair_at(i))]
+        seen = set(fresh[:n_value])
+        chosen = fresh[:n_value] + [i for i in indices if i not in seen][:n_value - len(seen)]
+    else:
+        # 组合数很大时历史配对占比很小，拒绝采样几乎一次命中
+        chosen, seen = [], set()
+        attempts = 0
+        while len(chosen) < n_value:
+            index = random.randrange(total)
+            attempts += 1
+            if index in seen or (attempts < n_value * 20 and not is_new(pair_at(index))):
+                continue
+            seen.add(index)
+            chosen.append(index)
+
+    pairs = [pair_at(i) for i in chosen]
+    return pairs, sum(1 for pair in pairs if not is_new(pair))
+
+
+def sample_one_vs_n_pairs(videos_a, videos_b, n_value, history=frozenset()):
+    """
+    1vN模式：每个A抽N个互不相同的B，优先没和该A配过的B，其次本批次用得少的B
+    :return: (配对列表, 使用的历史配对数)
+    """
+    usage = {b_file: 0 for b_file in videos_b}
+    pairs, reused = [], 0
+    for a_file in videos_a:
+        a_key = os.path.abspath(a_file)
+        candidates = list(videos_b)
+        random.shuffle(candidates)
+        # 稳定排序：没做过的在前，同类中本批次用得少的在前，其余保持随机顺序
+        candidates.sort(key=lambda b: ((a_key, os.path.abspath(b)) in history, usage[b]))
+        for b_file in candidates[:n_value]:
+            usage[b_file] += 1
+            reused += (a_key, os.path.abspath(b_file)) in history
+            pairs.append((a_file, b_file))
+    return pairs, reused
+
+
+def make_pairs(mode, videos_a, videos_b, n_value, history=frozenset(), log_callback=None):
+    """按模式生成(A, B)配对列表（穷举模式的历史配对由清单的完成校验跳过）"""
+    log_callback = log_callback or (lambda msg: None)
+    if mode == "穷举模式":
+        return [(a, b) for a in videos_a for b in videos_b]
+    if mode == "随机模式":
+        pairs, reused = sample_random_pairs(videos_a, videos_b, n_value, history)
+        if len(pairs) < n_value:
+            log_callback(f"⚠️ A×B 只有 {len(pairs)} 种不同配对，少于生成数量 {n_value}，按 {len(pairs)} 个生成\n")
+    elif mode == "1vN模式":
+        pairs, reused = sample_one_vs_n_pairs(videos_a, videos_b, n_value, history)
+    else:
+        raise ValueError(f"未知的拼接模式：{mode}")
+    if reused:
+        log_callback(f"♻️ 未做过的配对不足，使用了 {reused} 个历史配对\n")
+    return pairs
@@ -0,0 +1,492 @@
+"""
+视频拼接分布式任务队列（无GUI）
+协调端把批次规划出的配对任务发布到SQLite队列文件，多个工作进程/多台机器（共享文件系统，
+路径挂载一致）从队列领取任务渲染。领取的任务带租约，工作进程渲染期间定时心跳续租；
+工作进程崩溃后租约过期，任务自动被其他工作进程重新领取（超过最大次数记为失败）。
+
+用法：
+    python duet_queue.py publish batch.yaml --queue /shared/duet_queue.db   发布任务
+    python duet_queue.py worker --queue /shared/duet_queue.db --processes 4 启动工作进程
+    python duet_queue.py watch --queue /shared/duet_queue.db               汇总进度并回写清单
+单机测试：同一台机器上开多个worker（或 --processes N）即可。
+标准输出为JSON行事件，可读日志输出到标准错误（与duet_cli.py一致）。
+"""
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+from duet_worker import HAS_PSUTIL, THREADS_PER_VIDEO, process_single_pair, select_encoder, probe_video
+from duet_batch import PART_SUFFIX, load_manifest, save_manifest, finish_job
+from duet_runner import DuetBatchRunner
+from duet_cli import load_spec, emit_event, emit_log
+
+if HAS_PSUTIL:
+    import psutil
+
+# ========== 队列配置 ==========
+QUEUE_FILE = "duet_queue.db"
+# 租约时长（秒）：超过该时间没有心跳的任务视为工作进程已崩溃
+LEASE_SECONDS = 60
+HEARTBEAT_INTERVAL = 10
+# 单个任务最多领取次数（含崩溃后的重新领取和渲染失败后的重试）
+MAX_ATTEMPTS = 3
+# 队列为空但仍有任务在其他工作进程手中时的轮询间隔（秒）
+IDLE_POLL_INTERVAL = 5
+WATCH_INTERVAL = 2
+# 渲染子进程返回结果后，等待其写完日志并退出的最长时间（秒），超时才强制结束
+CHILD_EXIT_GRACE = 30
+# 结束序号：任务每次结束时取全表最大值+1（在写锁内递增，不依赖各机器的时钟），协调端按序号增量回写清单
+NEXT_VERSION_SQL = "(SELECT COALESCE(MAX(version), 0) + 1 FROM jobs)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    output_folder TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    fps REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+"""
+
+
+# ========== SQLite任务队列 ==========
+class DuetJobQueue:
+    """
+    SQLite任务队列（每个进程各自打开连接；领取用 BEGIN IMMEDIATE 保证同一任务只被一个进程拿到）
+    状态：pending 待领取 / leased 渲染中 / done 完成 / failed 失败
+    """
+
+    def __init__(self, path=QUEUE_FILE):
+        self.path = path
+        # 网络文件系统不支持WAL，使用默认回滚日志；timeout等待其他进程释放写锁
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+        if "version" not in {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}:
+            # 旧版本队列文件：补上结束序号列，已结束的任务按rowid编号
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            self.conn.execute("UPDATE jobs SET version=rowid WHERE status IN ('done', 'failed')")
+
+    def close(self):
+        self.conn.close()
+
+    def publish(self, items):
+        """
+        发布任务（已存在的任务不会重复插入，失败的任务重置为待领取）
+        :param items: [{"job": 清单任务, "args": 渲染参数, "infos": (A元数据, B元数据), "encoder": 编码器}]
+        :return: 新发布/重置的任务数
+        """
+        now = time.time()
+        count = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for item in items:
+                job = item["job"]
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO jobs (job_id, output_folder, payload, updated_at) VALUES (?, ?, ?, ?)",
+                    (job["job_id"], os.path.dirname(job["output_file"]),
+                     json.dumps(item, ensure_ascii=False), now)
+                )
+                if cursor.rowcount == 0:
+                    cursor = self.conn.execute(
+                        "UPDATE jobs SET status='pending', attempts=0, error='', payload=?, updated_at=? "
+                        "WHERE job_id=? AND status='failed'",
+                        (json.dumps(item, ensure_ascii=False), now, job["job_id"])
+                    )
+                count += cursor.rowcount
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """
+        领取一个任务（待领取的优先，其次是租约已过期的）
+        :return: (任务ID, 任务内容) 或 None
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 租约过期且已达最大次数的任务不再重试
+            self.conn.execute(
+                "UPDATE jobs SET status='failed', error='工作进程多次中断，超过最大重试次数', updated_at=?, "
+                f"version={NEXT_VERSION_SQL} WHERE status='leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, MAX_ATTEMPTS)
+            )
+            row = self.conn.execute(
+                "SELECT job_id, payload FROM jobs "
+                "WHERE status='pending' OR (status='leased' AND lease_until < ?) "
+                "ORDER BY status='leased', rowid LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status='leased', worker=?, lease_until=?, attempts=attempts+1, "
+                "progress=0, fps=0, updated_at=? WHERE job_id=?",
+                (worker_id, now + lease_seconds, now, row[0])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return row[0], json.loads(row[1])
+
+    def heartbeat(self, job_id, worker_id, progress=0.0, fps=0.0, lease_seconds=LEASE_SECONDS):
+        """续租并上报进度；任务已被其他工作进程接手时返回False"""
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_until=?, progress=?, fps=?, updated_at=? "
+            "WHERE job_id=? AND worker=? AND status='leased'",
+            (now + lease_seconds, progress, fps, now, job_id, worker_id)
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id, worker_id, success, result=None, error=""):
+        """
+        提交任务结果：成功记为done；失败时未达最大次数重新排队，否则记为failed
+        :return: 是否仍持有该任务（租约丢失后的结果被忽略）
+        """
+        now = time.time()
+        if success:
+            status_sql = "'done'"
+        else:
+            status_sql = f"CASE WHEN attempts >= {MAX_ATTEMPTS} THEN 'failed' ELSE 'pending' END"
+        cursor = self.conn.execute(
+            f"UPDATE jobs SET status={status_sql}, progress=?, result=?, error=?, lease_until=0, updated_at=?, "
+            f"version={NEXT_VERSION_SQL} WHERE job_id=? AND worker=? AND status='leased'",
+            (1.0 if success else 0.0, json.dumps(result, ensure_ascii=False) if result else None,
+             error, now, job_id, worker_id)
+        )
+        return cursor.rowcount > 0
+
+    def counts(self):
+        """各状态任务数（租约过期的leased也计为leased，等待被重新领取）"""
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        for status, count in self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        return counts
+
+    def snapshot(self):
+        """汇总进度：各状态数、完成比例（已完成数+渲染中任务的进度）、总编码fps、各工作进程任务数"""
+        counts = self.counts()
+        total = sum(counts.values())
+        progress, fps, workers = 0.0, 0.0, {}
+        for worker, job_progress, job_fps in self.conn.execute(
+                "SELECT worker, progress, fps FROM jobs WHERE status='leased' AND lease_until >= ?", (time.time(),)):
+            progress += job_progress
+            fps += job_fps
+            workers[worker] = workers.get(worker, 0) + 1
+        fraction = (counts["done"] + counts["failed"] + progress) / total if total else 1.0
+        return {"type": "queue_progress", "total": total, **counts, "fraction": round(fraction, 4),
+                "fps": round(fps, 1), "workers": workers}
+
+    def finished_jobs(self, since=0):
+        """读取结束序号大于 since 的已结束任务（用于回写清单）"""
+        return self.conn.execute(
+            "SELECT job_id, output_folder, status, result, error, version FROM jobs "
+            "WHERE status IN ('done', 'failed') AND version > ?", (since,)
+        ).fetchall()
+
+
+# ========== 协调端：发布与汇总 ==========
+def publish_batch(spec, queue_path, log_callback=None):
+    """按批次文件规划任务（与单机版相同的清单/跳过逻辑）并发布到队列，返回发布数"""
+    # 中间文件缓存目录是协调端的相对路径，默认不预处理，工作进程直接读取源视频
+    spec = dict(spec, use_normalized_cache=spec.get("use_normalized_cache", False))
+    plan = DuetBatchRunner(spec, log_callback=log_callback).plan()
+    items = []
+    for job, args in plan["task_args"]:
+        a_file, b_file = os.path.abspath(args[0]), os.path.abspath(args[1])
+        items.append({
+            "job": job,
+            "args": [a_file, b_file] + list(args[2:]),
+            "infos": [plan["infos"].get(args[0]), plan["infos"].get(args[1])],
+            "encoder": spec.get("encoder", "auto")
+        })
+    job_queue = DuetJobQueue(queue_path)
+    try:
+        return job_queue.publish(items), len(plan["done_jobs"])
+    finally:
+        job_queue.close()
+
+
+def sync_manifests(job_queue, since=0):
+    """把队列中已结束任务的结果回写到各输出文件夹的批次清单，返回已回写的最大结束序号"""
+    latest = since
+    by_folder = {}
+    for job_id, output_folder, status, result, error, version in job_queue.finished_jobs(since):
+        by_folder.setdefault(output_folder, []).append((job_id, status, result, error))
+        latest = max(latest, version)
+    for output_folder, rows in by_folder.items():
+        manifest = load_manifest(output_folder)
+        for job_id, status, result, error in rows:
+            job = manifest["jobs"].get(job_id)
+            if job is None:
+                continue
+            if status == "done" and result:
+                job.update(json.loads(result))
+            else:
+                job["status"] = "failed"
+                job["error"] = error
+        save_manifest(output_folder, manifest)
+    return latest
+
+
+def watch_queue(queue_path, interval=WATCH_INTERVAL):
+    """协调端：定时输出汇总进度并回写清单，全部任务结束后返回汇总"""
+    job_queue = DuetJobQueue(queue_path)
+    since = 0
+    try:
+        while True:
+            snapshot = job_queue.snapshot()
+            emit_event(snapshot)
+            since = sync_manifests(job_queue, since)
+            if snapshot["pending"] == 0 and snapshot["leased"] == 0:
+                return snapshot
+            time.sleep(interval)
+    finally:
+        job_queue.close()
+
+
+# ========== 工作端 ==========
+def render_job_process(args, infos, encoder, threads, log_queue, result_conn):
+    """渲染子进程：自成进程组（租约丢失时连同ffmpeg一起结束），结果经管道返回"""
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    try:
+        result = process_single_pair(tuple(args), log_queue, tuple(infos), encoder, threads)
+    except Exception as e:
+        result = (False, args[0], args[1], f"{str(e)}\n", None)
+    result_conn.send(result)
+    result_conn.close()
+
+
+def kill_process_tree(process):
+    """结束渲染子进程及其ffmpeg子进程（POSIX按进程组，其他平台用psutil遍历子孙进程）"""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    elif HAS_PSUTIL:
+        try:
+            children = psutil.Process(process.pid).children(recursive=True)
+        except psutil.NoSuchProcess:
+            children = []
+        for child in children:
+            try:
+                child.kill()
+            except psutil.NoSuchProcess:
+                pass
+    if process.is_alive():
+        process.kill()
+    process.join()
+
+
+def render_claimed_job(job_queue, worker_id, job_id, item, threads, verbose):
+    """
+    渲染一个已领取的任务：渲染在子进程执行（写入本工作进程专用的临时文件），后台线程心跳续租和上报进度；
+    租约丢失时立即结束渲染，确认仍持有任务后才重命名输出文件
+    :return: 成功True / 失败False / 租约丢失已放弃None
+    """
+    job = item["job"]
+    args = list(item["args"])
+    # 临时文件带工作进程标识，租约过期后被重新领取时两个工作进程不会写同一个文件
+    temp_file = f"{job['output_file']}.{worker_id.replace(':', '_')}{PART_SUFFIX}"
+    args[2] = temp_file
+    ctx = multiprocessing.get_context("spawn")
+    local_queue = ctx.Queue()
+    result_conn, child_conn = ctx.Pipe(duplex=False)
+    state = {"fraction": 0.0, "fps": 0.0}
+    stop = threading.Event()
+    lease_lost = threading.Event()
+
+    def heartbeat_loop():
+        # 心跳线程使用独立连接（sqlite连接不能跨线程共享）
+        heartbeat_queue = DuetJobQueue(job_queue.path)
+        try:
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                if not heartbeat_queue.heartbeat(job_id, worker_id, state["fraction"], state["fps"]):
+                    lease_lost.set()
+                    return
+        finally:
+            heartbeat_queue.close()
+
+    def drain():
+        while True:
+            try:
+                message = local_queue.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                return
+            if isinstance(message, dict):
+                state["fraction"], state["fps"] = message["fraction"], message["fps"]
+            elif verbose:
+                emit_log(f"[{worker_id}] {message}")
+
+    heartbeat_thread = threading.Thread(target=heartbeat_loop, daemon=True)
+    heartbeat_thread.start()
+    result = None
+    process = None
+    try:
+        encoder = select_encoder(item.get("encoder"))
+        process = ctx.Process(target=render_job_process,
+                              args=(args, item["infos"], encoder, threads, local_queue, child_conn))
+        process.start()
+        child_conn.close()
+        # 日志队列在等待结果时定时取出，避免渲染期间堆积
+        while not lease_lost.is_set():
+            if result_conn.poll(1.0):
+                result = result_conn.recv()
+                break
+            drain()
+            if not process.is_alive() and not result_conn.poll():
+                break
+    except Exception as e:
+        result = (False, args[0], args[1], f"{str(e)}\n", None)
+    finally:
+        stop.set()
+        heartbeat_thread.join()
+        if process is not None and process.pid is not None:
+            # 返回结果后子进程通常还在把日志写进队列：继续取日志等它自行退出，租约丢失或超时才强制结束
+            deadline = time.monotonic() + CHILD_EXIT_GRACE
+            while not lease_lost.is_set() and process.is_alive() and time.monotonic() < deadline:
+                drain()
+                process.join(0.2)
+            if lease_lost.is_set() or process.is_alive():
+                kill_process_tree(process)
+            process.join()
+        drain()
+        result_conn.close()
+
+    # 租约已被其他工作进程接手：只清理自己的临时文件，不动正式输出和队列状态
+    if lease_lost.is_set() or not job_queue.heartbeat(job_id, worker_id, 1.0 if result and result[0] else 0.0):
+        emit_log(f"⚠️ [{worker_id}] 任务租约已失效（已被其他工作进程接手），放弃渲染：{job_id}\n")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        return None
+
+    if result is None:
+        result = (False, args[0], args[1], f"渲染进程异常退出（退出码{process.exitcode if process else '未知'}）\n", None)
+    success, _, _, log_msg, stats = result
+    error = "" if success else (log_msg.strip().splitlines() or ["渲染失败"])[-1]
+    # 上面的心跳已确认仍持有任务并续租，成功时原子重命名为正式文件名，并把大小/时长作为结果提交（由协调端回写清单）
+    finish_job(job, success, error, probe=probe_video, temp_file=temp_file)
+    result = {key: job[key] for key in ("status", "error", "size", "duration", "finished_at")}
+    result["stats"] = stats
+    result["worker"] = worker_id
+    job_queue.complete(job_id, worker_id, success, result, error)
+    return success
+
+
+def run_worker(queue_path, worker_index=0, threads=None, verbose=True):
+    """工作进程主循环：领取→渲染→提交，队列中没有待领取且没有渲染中的任务时退出"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_index}"
+    job_queue = DuetJobQueue(queue_path)
+    emit_event({"type": "worker_start", "worker": worker_id})
+    done = failed = lost = 0
+    try:
+        while True:
+            claimed = job_queue.claim(worker_id)
+            if claimed is None:
+                counts = job_queue.counts()
+                if counts["leased"] == 0 and counts["pending"] == 0:
+                    break
+                # 其他工作进程还有任务在渲染，等待其完成或租约过期后接手
+                time.sleep(IDLE_POLL_INTERVAL)
+                continue
+            job_id, item = claimed
+            emit_event({"type": "job_claimed", "worker": worker_id, "job_id": job_id})
+            success = render_claimed_job(job_queue, worker_id, job_id, item, threads or THREADS_PER_VIDEO, verbose)
+            if success is None:
+                lost += 1
+                emit_event({"type": "job_lost", "worker": worker_id, "job_id": job_id})
+                continue
+            if success:
+                done += 1
+            else:
+                failed += 1
+            emit_event({"type": "job_done", "worker": worker_id, "job_id": job_id, "success": success})
+    finally:
+        job_queue.close()
+    emit_event({"type": "worker_end", "worker": worker_id, "completed": done, "failed": failed, "lost": lost})
+    return failed
+
+
+def run_worker_process(queue_path, worker_index, threads, verbose):
+    """--processes 的子进程入口：有任务失败时以非零退出码结束"""
+    sys.exit(1 if run_worker(queue_path, worker_index, threads, verbose) else 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="视频拼接分布式任务队列（SQLite队列文件，租约+心跳）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    publish_parser = sub.add_parser("publish", help="按批次文件规划任务并发布到队列")
+    publish_parser.add_argument("spec", help="批次文件路径（.yaml/.yml/.json，格式同duet_cli.py）")
+    publish_parser.add_argument("--encoder", help="覆盖批次文件中的编码器（auto时各工作节点自行探测）")
+    worker_parser = sub.add_parser("worker", help="启动工作进程领取并渲染任务")
+    worker_parser.add_argument("--processes", type=int, default=1, help="本机启动的工作进程数")
+    worker_parser.add_argument("--threads", type=int, help="单个任务的编码线程数")
+    worker_parser.add_argument("--quiet", action="store_true", help="不输出渲染日志")
+    sub.add_parser("watch", help="汇总显示进度并把结果回写批次清单")
+    sub.add_parser("status", help="输出一次当前进度")
+    for sub_parser in sub.choices.values():
+        sub_parser.add_argument("--queue", default=QUEUE_FILE, help="队列文件路径（多机时放在共享目录）")
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        try:
+            spec = load_spec(args.spec, {"encoder": args.encoder})
+            published, skipped = publish_batch(spec, args.queue, log_callback=emit_log)
+        except (OSError, ValueError) as e:
+            emit_event({"type": "error", "message": str(e)})
+            return 2
+        emit_event({"type": "published", "queue": args.queue, "published": published, "skipped": skipped})
+        return 0
+
+    if args.command == "worker":
+        if args.processes <= 1:
+            return 1 if run_worker(args.queue, 0, args.threads, not args.quiet) else 0
+        # 多个工作进程（spawn方式，与渲染进程池一致），各自独立领取任务
+        ctx = multiprocessing.get_context("spawn")
+        processes = [ctx.Process(target=run_worker_process, args=(args.queue, i, args.threads, not args.quiet))
+                     for i in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return 0 if all(p.exitcode == 0 for p in processes) else 1
+
+    if args.command == "watch":
+        snapshot = watch_queue(args.queue)
+        return 1 if snapshot["failed"] else 0
+
+    job_queue = DuetJobQueue(args.queue)
+    try:
+        emit_event(job_queue.snapshot())
+    finally:
+        job_queue.close()
+    return 0
+
+
+# spawn子进程以__mp_main__导入本文件，不会执行main()
+if __name__ == "__main__":
+    sys.exit(main())
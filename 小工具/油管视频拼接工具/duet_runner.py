@@ -0,0 +1,277 @@
+"""
+视频拼接批次运行器（无GUI）
+把 扫描→探测→配对→清单→预处理→调度→进程池渲染→耗时报告 的完整流程封装为一个类，
+GUI(generate_duet5.py)和命令行(duet_cli.py)共用同一套渲染核心。
+日志(文本)和事件(字典)都通过回调输出，本模块及其依赖都不导入tkinter。
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from duet_worker import (
+    RENDER_BACKEND, ENCODER_PROFILES,
+    process_single_pair, create_process_pool, select_encoder
+)
+from duet_scheduler import AdaptiveScheduler
+from duet_cache import NORMALIZE_CACHE_DIR, prepare_intermediates, probe_videos, get_video_info
+from duet_planner import PHASH_THRESHOLD, make_pairs, load_pair_history, dedupe_similar_sources
+from duet_batch import (
+    PART_SUFFIX, load_manifest, save_manifest, get_resumable_pairs,
+    plan_jobs, split_done_jobs, finish_job, write_timing_report
+)
+
+# ========== 运行配置 ==========
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+MODES = ["随机模式", "穷举模式", "1vN模式"]
+AUDIO_SOURCES = ["A 的音频", "B 的音频"]
+DURATION_SOURCES = ["A 的时长", "B 的时长"]
+# 穷举模式等源视频被重复使用时，先把每个源视频预处理为中间文件（只解码/裁剪/缩放一次）
+USE_NORMALIZED_CACHE = True
+
+
+# ========== 文件扫描 ==========
+def list_video_files(folder):
+    """获取文件夹中的视频文件名列表"""
+    if not folder or not os.path.isdir(folder):
+        return []
+    return [f for f in os.listdir(folder) if f.lower().endswith(VIDEO_EXTENSIONS)]
+
+
+# ========== 批次运行器 ==========
+class DuetBatchRunner:
+    """
+    单个批次的运行器（在调用线程中同步执行，cancel()可从其他线程调用）
+    spec字段：folder_a, folder_b, output_folder, mode, num_generate, audio_source,
+             duration_source, overlap_pixels, encoder(可选，默认auto), max_workers(可选),
+             use_normalized_cache(可选), dedup_sources(可选，按感知哈希跳过画面相同的源视频)
+    事件：batch_start / progress / job_done / batch_end（均为带type字段的字典）
+    """
+
+    def __init__(self, spec, log_callback=None, event_callback=None):
+        self.spec = spec
+        self.log = log_callback or (lambda msg: None)
+        self.emit = event_callback or (lambda event: None)
+        self.cancelled = threading.Event()
+        self.executor = None
+        self.manager = None
+        self.log_queue = None
+
+    def cancel(self):
+        """
+        取消批次：只设置标志（可在信号处理函数或其他线程中调用），
+        由run()所在线程取消未开始的任务，已在渲染的任务完成后结束
+        """
+        self.cancelled.set()
+
+    def drain_log_queue(self):
+        """转发子进程日志队列中已有的日志和进度事件"""
+        if self.log_queue is None:
+            return
+        try:
+            while True:
+                message = self.log_queue.get_nowait()
+                if isinstance(message, dict):
+                    self.emit(message)
+                else:
+                    self.log(message)
+        except queue.Empty:
+            pass
+        except Exception:
+            # 管理进程已关闭
+            pass
+
+    def plan(self):
+        """
+        探测+配对+登记清单+预处理（不渲染），命令行版和分布式任务队列发布共用
+        :return: {manifest, settings, jobs, done_jobs, task_args: [(任务, 渲染参数)], infos}
+        """
+        spec = self.spec
+        output_folder = spec["output_folder"]
+        mode = spec["mode"]
+        audio_source = spec["audio_source"]
+        duration_source = spec["duration_source"]
+        overlap_pixels = int(spec["overlap_pixels"])
+        os.makedirs(output_folder, exist_ok=True)
+
+        # 获取视频列表
+        videos_a = [os.path.join(spec["folder_a"], f) for f in list_video_files(spec["folder_a"])]
+        videos_b = [os.path.join(spec["folder_b"], f) for f in list_video_files(spec["folder_b"])]
+
+        # 读取元数据（命中缓存时不启动ffprobe），跳过无法读取的视频
+        infos = probe_videos(videos_a + videos_b, log_callback=self.log)
+        videos_a = [p for p in videos_a if p in infos]
+        videos_b = [p for p in videos_b if p in infos]
+        if spec.get("dedup_sources"):
+            threshold = spec.get("phash_threshold", PHASH_THRESHOLD)
+            videos_a = dedupe_similar_sources(videos_a, threshold, log_callback=self.log)
+            videos_b = dedupe_similar_sources(videos_b, threshold, log_callback=self.log)
+        if not videos_a or not videos_b:
+            raise ValueError("没有可读取的A/B视频")
+        n_value = int(spec.get("num_generate") or 0)
+        if mode == "1vN模式" and len(videos_b) < n_value:
+            raise ValueError(f"1vN模式下，B文件夹可读取的视频数量({len(videos_b)}个)不足")
+
+        settings = {
+            "folder_a": spec["folder_a"], "folder_b": spec["folder_b"],
+            "mode": mode, "num_generate": str(spec.get("num_generate", "")),
+            "audio_source": audio_source, "duration_source": duration_source,
+            "overlap_pixels": overlap_pixels
+        }
+
+        # 生成配对列表（上一批次参数相同且未完成时直接续跑，随机模式不重新抽样；
+        # 新批次不放回抽样，并优先避开清单中已完成过的配对）
+        manifest = load_manifest(output_folder)
+        pairs = get_resumable_pairs(manifest, settings)
+        if pairs:
+            self.log(f"♻️ 检测到未完成的同参数批次，继续执行（共 {len(pairs)} 个视频）\n")
+        else:
+            pairs = make_pairs(mode, videos_a, videos_b, n_value,
+                               history=load_pair_history(manifest), log_callback=self.log)
+            icon = {"随机模式": "🎲", "穷举模式": "🔍", "1vN模式": "🎯"}[mode]
+            self.log(f"{icon} {mode}：将并行生成 {len(pairs)} 个视频\n")
+
+        # 登记到批次清单：已完成且校验通过的任务直接跳过
+        jobs = plan_jobs(manifest, pairs, output_folder, settings,
+                         audio_source, duration_source, overlap_pixels)
+        done_jobs, todo_jobs = split_done_jobs(jobs, probe=get_video_info)
+        save_manifest(output_folder, manifest)
+        if done_jobs:
+            self.log(f"⏭️ 跳过已完成的 {len(done_jobs)} 个视频，待生成 {len(todo_jobs)} 个\n")
+
+        # 源视频预处理：被多个配对复用的源视频只处理一次，渲染阶段读取中间文件
+        source_map = {}
+        if spec.get("use_normalized_cache", USE_NORMALIZED_CACHE):
+            use_count = {}
+            for job in todo_jobs:
+                use_count[job["a_file"]] = use_count.get(job["a_file"], 0) + 1
+                use_count[job["b_file"]] = use_count.get(job["b_file"], 0) + 1
+            reused = [p for p, c in use_count.items() if c > 1]
+            if reused:
+                self.log(f"📦 预处理 {len(reused)} 个复用源视频（缓存目录：{NORMALIZE_CACHE_DIR}）\n")
+                source_map = prepare_intermediates(reused, log_callback=self.log)
+                infos.update(probe_videos(list(source_map.values()), log_callback=self.log))
+
+        # 准备任务参数（输出文件名由清单确定；先写入临时文件，成功后原子重命名）
+        task_args = []
+        for job in todo_jobs:
+            a_file, b_file = job["a_file"], job["b_file"]
+            task_args.append((job, (
+                source_map.get(a_file, a_file), source_map.get(b_file, b_file),
+                job["output_file"] + PART_SUFFIX, audio_source, duration_source, overlap_pixels
+            )))
+        return {"manifest": manifest, "settings": settings, "jobs": jobs, "done_jobs": done_jobs,
+                "task_args": task_args, "infos": infos}
+
+    def run(self):
+        """
+        执行整个批次
+        :return: 汇总 {total, skipped, completed, failed, cancelled, wall_seconds, report}
+        """
+        start_time = time.time()
+        spec = self.spec
+        output_folder = spec["output_folder"]
+        summary = {"total": 0, "skipped": 0, "completed": 0, "failed": 0,
+                   "cancelled": False, "wall_seconds": 0, "report": None}
+        try:
+            plan = self.plan()
+            manifest, settings, infos = plan["manifest"], plan["settings"], plan["infos"]
+            jobs, done_jobs, task_args = plan["jobs"], plan["done_jobs"], plan["task_args"]
+            todo_jobs = [job for job, _ in task_args]
+            summary["total"] = len(jobs)
+            summary["skipped"] = len(done_jobs)
+            for job in todo_jobs:
+                job["status"] = "running"
+
+            encoder = select_encoder(spec.get("encoder"))
+            self.log(f"🎬 编码器：{ENCODER_PROFILES[encoder]['label']}\n")
+
+            # 自适应调度，按CPU/内存/编码器类型决定并发数，并把核心分给各任务的编码线程
+            max_pixels = max((info["width"] * info["height"] for info in infos.values()), default=1920 * 1080)
+            scheduler = AdaptiveScheduler(encoder, RENDER_BACKEND, source_pixels=max_pixels,
+                                          max_workers=spec.get("max_workers"))
+            self.log(scheduler.describe())
+            self.emit({"type": "batch_start", "total": len(jobs), "skipped": len(done_jobs),
+                       "todo": len(todo_jobs), "encoder": encoder, "max_workers": scheduler.max_concurrency})
+
+            # spawn进程池只加载duet_worker渲染代码，绕开GIL；日志经队列实时回传
+            self.executor, self.manager, self.log_queue = create_process_pool(scheduler.max_concurrency)
+            report_rows = []
+            completed = len(done_jobs)
+
+            # 按当前并发数逐步提交，完成一个补一个（内存压力升高时后续提交自动减少）
+            pending_tasks = list(task_args)
+            future_to_task = {}
+            while pending_tasks or future_to_task:
+                if self.cancelled.is_set() and pending_tasks:
+                    # 取消：未开始的任务恢复为待执行；已在渲染的任务继续等待，结果照常写入清单
+                    for job, _ in pending_tasks:
+                        job["status"] = "pending"
+                    pending_tasks = []
+                    save_manifest(output_folder, manifest)
+                    self.log(f"⏹️ 已取消，等待 {len(future_to_task)} 个渲染中的任务结束\n")
+                while pending_tasks and len(future_to_task) < scheduler.concurrency:
+                    job, args = pending_tasks.pop(0)
+                    future = self.executor.submit(
+                        process_single_pair, args, self.log_queue, (infos.get(args[0]), infos.get(args[1])),
+                        encoder, scheduler.threads_per_job()
+                    )
+                    future_to_task[future] = job
+
+                finished, _ = wait(list(future_to_task), timeout=0.5, return_when=FIRST_COMPLETED)
+                self.drain_log_queue()
+                adjust_msg = scheduler.adjust()
+                if adjust_msg:
+                    self.log(adjust_msg)
+
+                for future in finished:
+                    job = future_to_task.pop(future)
+                    success = self.handle_job_result(future, job, manifest, report_rows)
+                    completed += 1
+                    summary["completed" if success else "failed"] += 1
+                    self.emit({"type": "job_done", "job": os.path.basename(job["output_file"] + PART_SUFFIX),
+                               "job_id": job["job_id"], "output_file": job["output_file"], "success": success,
+                               "error": job["error"], "completed": completed, "total": len(jobs)})
+            self.drain_log_queue()
+
+            # 写出耗时报告（各阶段耗时/编码fps，便于对比编码器和线程数）
+            summary["wall_seconds"] = round(time.time() - start_time, 2)
+            if report_rows:
+                json_file, csv_file = write_timing_report(output_folder, report_rows, {
+                    "encoder": encoder, "backend": RENDER_BACKEND, "max_workers": scheduler.max_concurrency,
+                    "final_workers": scheduler.concurrency, "settings": settings,
+                    "wall_seconds": summary["wall_seconds"]
+                })
+                summary["report"] = json_file
+                self.log(f"📈 耗时报告已保存：{os.path.basename(json_file)} / {os.path.basename(csv_file)}\n")
+        finally:
+            summary["cancelled"] = self.cancelled.is_set()
+            summary["wall_seconds"] = round(time.time() - start_time, 2)
+            # 先等渲染中的任务结束再关闭管理进程，子进程写日志队列时不会遇到断开的管道
+            if self.executor:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+            self.drain_log_queue()
+            if self.manager:
+                self.manager.shutdown()
+            self.executor = None
+            self.manager = None
+            self.log_queue = None
+        self.emit(dict(summary, type="batch_end"))
+        return summary
+
+    def handle_job_result(self, future, job, manifest, report_rows):
+        """处理单个任务结果：更新清单和耗时报告行，返回是否成功"""
+        success = False
+        try:
+            # 日志已通过队列实时转发，这里只统计结果并更新清单
+            success, a_file, b_file, log_msg, stats = future.result()
+            error = "" if success else log_msg.strip().splitlines()[-1]
+            finish_job(job, success, error, probe=get_video_info)
+            report_rows.append({"job_id": job["job_id"], "a_file": job["a_file"], "b_file": job["b_file"],
+                                "success": success, "stats": stats})
+        except Exception as e:
+            finish_job(job, False, str(e))
+            self.log(f"❌ 进程执行错误：{str(e)}\n")
+        save_manifest(self.spec["output_folder"], manifest)
+        return success
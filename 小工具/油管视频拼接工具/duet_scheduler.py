@@ -0,0 +1,91 @@
+"""
+视频拼接自适应并发调度（无GUI）
+根据CPU核心数、可用内存、编码器类型决定同时渲染的视频数，并把CPU核心
+平均分给每个任务的编码线程（避免 并发数×单视频线程数 远超核心数）。
+运行中按实测CPU占用和内存压力动态增减并发。
+"""
+import time
+
+from duet_worker import CPU_PHYSICAL_CORES, HAS_PSUTIL, ENCODER_PROFILES
+
+if HAS_PSUTIL:
+    import psutil
+
+# ========== 调度配置 ==========
+# 硬件编码器的并发会话上限（消费级显卡NVENC通常限制3~5路）
+HARDWARE_SESSION_LIMITS = {"h264_nvenc": 3, "h264_qsv": 4, "h264_vaapi": 4}
+# 软件编码时每个任务至少分到的编码线程数
+MIN_THREADS_PER_JOB = 2
+# 单个1080p任务的内存估算（MB），源视频分辨率更高时按像素数放大
+JOB_MEMORY_MB = {"ffmpeg": 400, "moviepy": 1500, "bounded": 300}
+# 系统内存占用超过上限时减少并发，低于下限且CPU未跑满时增加并发
+MEMORY_HIGH_PERCENT = 85
+MEMORY_LOW_PERCENT = 70
+CPU_TARGET_PERCENT = 90
+# 两次调整之间的最短间隔（秒）
+ADJUST_INTERVAL = 5.0
+
+
+class AdaptiveScheduler:
+    """自适应并发调度器：决定当前允许的并发任务数和每个任务的编码线程数"""
+
+    def __init__(self, encoder, backend, source_pixels=1920 * 1080, max_workers=None):
+        self.encoder = encoder
+        self.backend = backend
+        self.is_hardware = encoder in HARDWARE_SESSION_LIMITS
+        scale = max(1.0, source_pixels / (1920 * 1080))
+        self.job_memory_mb = JOB_MEMORY_MB.get(backend, JOB_MEMORY_MB["moviepy"]) * scale
+
+        if self.is_hardware:
+            limit = HARDWARE_SESSION_LIMITS[encoder]
+        else:
+            limit = max(1, CPU_PHYSICAL_CORES // MIN_THREADS_PER_JOB)
+        self.max_concurrency = max(1, min(limit, max_workers or CPU_PHYSICAL_CORES))
+        self.concurrency = max(1, min(self.max_concurrency, self.memory_limit()))
+        self.last_adjust = time.monotonic()
+        if HAS_PSUTIL:
+            # 第一次调用只建立基准，之后返回两次调用之间的平均占用
+            psutil.cpu_percent(interval=None)
+
+    def memory_limit(self):
+        """按当前可用内存估算最多能同时跑几个任务"""
+        if not HAS_PSUTIL:
+            return self.max_concurrency
+        available_mb = psutil.virtual_memory().available / (1024 * 1024)
+        return max(1, int(available_mb // self.job_memory_mb))
+
+    def threads_per_job(self):
+        """把物理核心平均分给并发任务；硬件编码只需少量线程负责解码/滤镜"""
+        threads = max(1, CPU_PHYSICAL_CORES // self.concurrency)
+        return min(threads, 4) if self.is_hardware else threads
+
+    def adjust(self):
+        """
+        根据实测CPU占用和内存压力调整并发数（已在运行的任务不受影响，只影响后续提交）
+        :return: 调整说明文本，未调整时返回None
+        """
+        now = time.monotonic()
+        if not HAS_PSUTIL or now - self.last_adjust < ADJUST_INTERVAL:
+            return None
+        self.last_adjust = now
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory().percent
+
+        old = self.concurrency
+        if memory > MEMORY_HIGH_PERCENT and self.concurrency > 1:
+            self.concurrency -= 1
+            reason = f"内存占用{memory:.0f}%"
+        elif (memory < MEMORY_LOW_PERCENT and cpu < CPU_TARGET_PERCENT
+              and self.concurrency < min(self.max_concurrency, self.memory_limit())):
+            self.concurrency += 1
+            reason = f"CPU占用{cpu:.0f}%，内存占用{memory:.0f}%"
+        else:
+            return None
+        return (f"⚙️ 并发调整：{old} → {self.concurrency}（{reason}），"
+                f"单视频线程：{self.threads_per_job()}\n")
+
+    def describe(self):
+        """当前调度参数说明"""
+        label = ENCODER_PROFILES.get(self.encoder, {}).get("label", self.encoder)
+        return (f"⚙️ 自适应调度：{label}，初始并发 {self.concurrency}（上限 {self.max_concurrency}），"
+                f"单视频线程 {self.threads_per_job()}，单任务内存估算 {self.job_memory_mb:.0f}MB\n")
@@ -0,0 +1,1113 @@
+"""
+视频拼接渲染核心（无GUI）
+只包含渲染相关代码，不导入customtkinter/tkinter，
+可被spawn方式的进程池安全导入（子进程不会再创建VideoDuetApp窗口）。
+"""
+import os
+import json
+import math
+import time
+import shutil
+import tempfile
+import queue
+import signal
+import threading
+import subprocess
+import multiprocessing
+from functools import lru_cache
+from multiprocessing.managers import SyncManager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+# ========== 核心配置：按要求调整 ==========
+# 视频编码器："auto" 启动时探测ffmpeg实际可用的编码器并按优先级选择；
+# 也可固定为 "libx264" 等（无显卡机器测试软件编码路径时使用，环境变量 DUET_ENCODER 优先）
+VIDEO_ENCODER = os.environ.get("DUET_ENCODER", "auto")
+ENCODER_CACHE_FILE = "duet_encoder_cache.json"
+# 渲染引擎："ffmpeg" 单进程滤镜图（默认，失败自动回退） / "moviepy" 逐帧Python合成 /
+# "bounded" 限内存逐帧合成（ffmpeg解码时裁剪缩放，复用uint8缓冲区，适合4K源视频大批量并发）；
+# 环境变量 DUET_BACKEND 优先
+RENDER_BACKEND = os.environ.get("DUET_BACKEND", "ffmpeg")
+# 长视频分段并行编码（ffmpeg引擎）：基准时长不少于SEGMENT_MIN_DURATION秒时，
+# 按SEGMENT_SECONDS切成帧对齐的时间段并行编码，再用concat分离器无损拼接，音频整段处理一次
+SEGMENT_ENABLED = True
+SEGMENT_MIN_DURATION = 600
+SEGMENT_SECONDS = 60
+# 每段至少分到的编码线程数；硬件编码受会话数限制，最多同时编码的段数
+SEGMENT_MIN_THREADS = 2
+SEGMENT_HARDWARE_PARALLEL = 2
+
+# 获取CPU物理核心数（psutil可选，缺失时由GUI负责提示）
+try:
+    import psutil
+    HAS_PSUTIL = True
+    CPU_PHYSICAL_CORES = psutil.cpu_count(logical=False) or os.cpu_count() or 4
+    CPU_LOGICAL_CORES = psutil.cpu_count(logical=True)
+except ImportError:
+    HAS_PSUTIL = False
+    CPU_PHYSICAL_CORES = os.cpu_count() or 4
+    CPU_LOGICAL_CORES = CPU_PHYSICAL_CORES
+THREADS_PER_VIDEO = max(1, CPU_PHYSICAL_CORES // 2)
+# 限内存逐帧合成：单任务帧缓冲区内存预算（MB）；每路解码管道自有的缓冲区数
+# （主循环持有当前帧时解码线程仍有一个缓冲区读下一帧，不占全局许可，保证总能前进）；
+# 每路额外预读帧数上限（需要从所有渲染进程共享的信号量取许可，按 并发数 × 每任务解码路数 × 预读帧数 分配）
+JOB_MEMORY_BUDGET_MB = 64
+BASE_FRAME_BUFFERS = 2
+READAHEAD_FRAMES = 4
+READERS_PER_JOB = 2
+_frame_semaphore = None
+
+# ========== 编码器配置（按自动选择优先级排列） ==========
+ENCODER_PROFILES = {
+    # params：全局参数（如硬件设备）；filter：编码前需要追加的滤镜（如上传到显存）
+    "h264_nvenc": {"label": "硬件编码(NVIDIA NVENC)", "preset": "p1", "params": [], "filter": None},
+    "h264_qsv": {"label": "硬件编码(Intel QSV)", "preset": "veryfast", "params": [], "filter": None},
+    "h264_vaapi": {
+        "label": "硬件编码(VAAPI)", "preset": None,
+        "params": ["-vaapi_device", "/dev/dri/renderD128"], "filter": "format=nv12,hwupload"
+    },
+    "libx264": {"label": "极速软件编码(x264)", "preset": "ultrafast", "params": [], "filter": None},
+    "libx265": {"label": "软件编码(x265)", "preset": "ultrafast", "params": [], "filter": None},
+    "libsvtav1": {"label": "软件编码(SVT-AV1)", "preset": "12", "params": [], "filter": None},
+}
+_available_encoders = None
+_encoder_lock = threading.Lock()
+
+
+# ========== 编码器探测（小尺寸试编码，结果缓存） ==========
+def _ffmpeg_fingerprint(ffmpeg_bin):
+    """ffmpeg版本指纹：换了ffmpeg后重新探测"""
+    path = shutil.which(ffmpeg_bin) or ffmpeg_bin
+    try:
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime}"
+    except OSError:
+        return path
+
+
+def test_encoder(encoder, ffmpeg_bin=None):
+    """用0.2秒的纯色画面试编码，返回编码器是否真正可用（驱动/硬件缺失时会失败）"""
+    profile = ENCODER_PROFILES[encoder]
+    cmd = [ffmpeg_bin or get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error",
+           "-f", "lavfi", "-i", "color=c=black:s=256x256:r=30:d=0.2"]
+    cmd += profile["params"] + (["-vf", profile["filter"]] if profile["filter"] else []) + ["-c:v", encoder]
+    if profile["preset"]:
+        cmd += ["-preset", profile["preset"]]
+    cmd += ["-f", "null", "-"]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=30)
+        return result.returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def detect_encoders(force=False, cache_file=ENCODER_CACHE_FILE):
+    """探测可用编码器（同一个ffmpeg只探测一次，结果保存到缓存文件）"""
+    global _available_encoders
+    with _encoder_lock:
+        if _available_encoders is not None and not force:
+            return _available_encoders
+
+        ffmpeg_bin = get_ffmpeg_binary()
+        fingerprint = _ffmpeg_fingerprint(ffmpeg_bin)
+        if not force and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached.get("ffmpeg") == fingerprint:
+                    _available_encoders = cached["encoders"]
+                    return _available_encoders
+            except Exception:
+                pass
+
+        _available_encoders = [name for name in ENCODER_PROFILES if test_encoder(name, ffmpeg_bin)]
+        try:
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump({"ffmpeg": fingerprint, "encoders": _available_encoders}, f, ensure_ascii=False, indent=2)
+        except OSError:
+            pass
+        return _available_encoders
+
+
+def select_encoder(preferred=None):
+    """选择编码器：指定的编码器可用则使用，否则按优先级选第一个可用的（兜底libx264）"""
+    preferred = preferred or VIDEO_ENCODER
+    if preferred != "auto" and preferred in ENCODER_PROFILES:
+        # 显式指定时信任配置（测试时无需探测）
+        return preferred
+    available = detect_encoders()
+    return next((name for name in ENCODER_PROFILES if name in available), "libx264")
+
+
+# ========== 日志回调 ==========
+def make_log_callback(log_messages, log_queue=None):
+    """日志回调：本地累积，并在提供队列时实时推送给GUI进程"""
+    def log_callback(msg):
+        log_messages.append(msg)
+        if log_queue is not None:
+            log_queue.put(msg)
+    return log_callback
+
+
+# ========== 进度与耗时统计 ==========
+# 进度事件最短推送间隔（秒），避免队列被逐帧事件淹没
+PROGRESS_INTERVAL = 0.5
+
+
+def make_progress_callback(job, log_queue=None):
+    """进度回调：把(阶段, 已编码帧数, 编码fps, 完成比例)作为字典事件推送给GUI"""
+    def progress_callback(stage, frame=0, fps=0.0, fraction=0.0):
+        if log_queue is not None:
+            log_queue.put({"type": "progress", "job": job, "stage": stage,
+                           "frame": frame, "fps": round(fps, 1), "fraction": round(fraction, 4)})
+    return progress_callback
+
+
+def make_moviepy_logger(progress_callback, total_frames):
+    """moviepy(proglog)日志器：把写视频的逐帧进度转为进度回调"""
+    from proglog import ProgressBarLogger
+
+    class CallbackLogger(ProgressBarLogger):
+        def __init__(self):
+            super().__init__()
+            self.start_time = None
+            self.last_emit = 0
+
+        def bars_callback(self, bar, attr, value, old_value=None):
+            if bar != "t" or attr != "index":
+                return
+            now = time.perf_counter()
+            if self.start_time is None:
+                self.start_time = now
+            if now - self.last_emit >= PROGRESS_INTERVAL:
+                self.last_emit = now
+                elapsed = max(now - self.start_time, 1e-6)
+                progress_callback("encode", value, value / elapsed, min(1.0, value / max(total_frames, 1)))
+
+    return CallbackLogger()
+
+
+def run_ffmpeg_with_progress(cmd, duration, progress_callback):
+    """运行ffmpeg并解析 -progress 输出，实时回调编码帧数/fps/完成比例；返回(退出码, 错误输出, 帧数)"""
+    cmd = cmd[:1] + ["-progress", "pipe:1", "-nostats"] + cmd[1:]
+    frame = 0
+    with tempfile.TemporaryFile() as err_file:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err_file,
+                                text=True, encoding="utf-8", errors="ignore")
+        state = {}
+        last_emit = 0
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            state[key] = value
+            if key != "progress":
+                continue
+            try:
+                frame = int(state.get("frame") or 0)
+                fps = float(state.get("fps") or 0)
+                out_us = int(state.get("out_time_us") or state.get("out_time_ms") or 0)
+            except ValueError:
+                continue
+            now = time.perf_counter()
+            if now - last_emit >= PROGRESS_INTERVAL or value == "end":
+                last_emit = now
+                fraction = min(1.0, out_us / 1e6 / duration) if duration else 0.0
+                progress_callback("encode", frame, fps, fraction)
+        proc.wait()
+        err_file.seek(0)
+        stderr = err_file.read().decode("utf-8", errors="ignore")
+    return proc.returncode, stderr, frame
+
+
+def make_stats(backend, encoder, timings, frames, duration, threads):
+    """单个任务的统计信息（各阶段耗时、帧数、平均编码fps）"""
+    encode_seconds = timings.get("encode", 0)
+    return {
+        "backend": backend,
+        "encoder": encoder,
+        "threads": threads,
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+        "total_seconds": round(sum(timings.values()), 3),
+        "frames": frames,
+        "duration": round(duration, 3),
+        "fps": round(frames / encode_seconds, 2) if encode_seconds > 0 else 0
+    }
+
+
+# ========== 渐变蒙板缓存与整数合成（moviepy引擎） ==========
+@lru_cache(maxsize=32)
+def get_alpha_ramp(width, overlap, side):
+    """
+    按(宽度, 重叠像素, 左/右)生成一次的uint8逐列透明度（0~255），同一进程内所有任务共享
+    蒙板每一行都相同，只保存一行，合成时按列广播，代替每个任务新建 1080×宽 的float32蒙板
+    :param side: "left" 右侧淡出 / "right" 左侧淡入
+    """
+    alpha = np.full(width, 255, dtype=np.uint8)
+    if overlap > 0:
+        ramp = np.rint(np.linspace(255, 0, overlap)).astype(np.uint8)
+        if side == "left":
+            alpha[-overlap:] = ramp[-width:]
+        else:
+            alpha[:overlap] = ramp[::-1][:width]
+    alpha.flags.writeable = False  # 共享只读，防止某个任务意外修改
+    return alpha
+
+
+def blend_into(canvas, frame, x, alpha):
+    """
+    把一帧按逐列uint8透明度整数混合到画布的x位置（超出画布的部分裁掉）
+    完全不透明的列直接复制，只有渐变区做 (src*a + dst*(255-a) + 127) // 255 的uint16运算
+    """
+    canvas_h, canvas_w = canvas.shape[:2]
+    frame_w = frame.shape[1]
+    x0, x1 = max(0, x), min(canvas_w, x + frame_w)
+    if x1 <= x0:
+        return
+    src = frame[:canvas_h, x0 - x:x1 - x, :3]
+    dst = canvas[:src.shape[0], x0:x1]
+    a = alpha[x0 - x:x1 - x]
+
+    partial = np.flatnonzero(a < 255)
+    if len(partial) == 0:
+        dst[:] = src
+        return
+    p0, p1 = partial[0], partial[-1] + 1
+    a16 = a[p0:p1].astype(np.uint16)[None, :, None]
+    dst[:, p0:p1] = ((src[:, p0:p1].astype(np.uint16) * a16
+                      + dst[:, p0:p1].astype(np.uint16) * (255 - a16) + 127) // 255).astype(np.uint8)
+    dst[:, :p0] = src[:, :p0]
+    dst[:, p1:] = src[:, p1:]
+
+
+def make_duet_frame_function(clip_a, clip_b, left_x, right_x, overlap, size=(1080, 1080)):
+    """
+    生成合成帧函数：黑色画布上先混合A再混合B，画布缓冲区复用（写入器逐帧同步消费）
+    """
+    canvas = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    alpha_a = get_alpha_ramp(clip_a.w, overlap, "left")
+    alpha_b = get_alpha_ramp(clip_b.w, overlap, "right")
+
+    def make_frame(t):
+        canvas.fill(0)
+        blend_into(canvas, clip_a.get_frame(t), left_x, alpha_a)
+        blend_into(canvas, clip_b.get_frame(t), right_x, alpha_b)
+        return canvas
+
+    return make_frame
+
+
+# ========== 视频处理函数（进程池子进程中执行） ==========
+def process_single_pair(args, log_queue=None, infos=None, encoder=None, threads=None):
+    """
+    按RENDER_BACKEND选择渲染引擎，ffmpeg引擎失败时自动回退moviepy
+    :param infos: 可选，主进程已缓存的 (A元数据, B元数据)，避免子进程重复探测
+    :param encoder: 可选，主进程选定的编码器，缺省时按VIDEO_ENCODER选择
+    :param threads: 可选，调度器分配的编码线程数，缺省时使用THREADS_PER_VIDEO
+    :return: (是否成功, A路径, B路径, 日志文本, 统计信息)
+    """
+    encoder = encoder or select_encoder()
+    threads = threads or THREADS_PER_VIDEO
+    if RENDER_BACKEND == "ffmpeg":
+        success, a_file, b_file, log_msg, stats = process_single_pair_ffmpeg(args, log_queue, infos, encoder, threads)
+        if success:
+            return (success, a_file, b_file, log_msg, stats)
+        fallback_msg = "⚠️ ffmpeg引擎失败，回退moviepy引擎重新合成\n"
+        if log_queue is not None:
+            log_queue.put(fallback_msg)
+        success, a_file, b_file, moviepy_log, stats = process_single_pair_moviepy(args, log_queue, encoder, threads, infos)
+        return (success, a_file, b_file, log_msg + fallback_msg + moviepy_log, stats)
+    if RENDER_BACKEND == "bounded":
+        return process_single_pair_bounded(args, log_queue, encoder, threads, infos)
+    return process_single_pair_moviepy(args, log_queue, encoder, threads, infos)
+
+
+def process_single_pair_moviepy(args, log_queue=None, encoder="libx264", threads=THREADS_PER_VIDEO, infos=None):
+    """moviepy引擎：逐帧合成单个视频（音频兼容时不经过moviepy，渲染后流复制合并）"""
+    from moviepy.editor import VideoFileClip, VideoClip
+
+    a_file, b_file, output_file, audio_source, duration_source, overlap_pixels = args
+    log_messages = []
+    log_callback = make_log_callback(log_messages, log_queue)
+    progress_callback = make_progress_callback(os.path.basename(output_file), log_queue)
+    timings = {}
+    frames = 0
+    duration = 0
+
+    clip_a = None
+    clip_b = None
+    final = None
+    try:
+        # 加载并预处理视频（统一9:16竖屏）
+        stage_start = time.perf_counter()
+        progress_callback("probe")
+        raw_a = VideoFileClip(a_file)
+        raw_b = VideoFileClip(b_file)
+        timings["probe"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        progress_callback("preprocess")
+
+        # 预处理A视频
+        target_ratio = 9 / 16
+        current_ratio = raw_a.w / raw_a.h
+        if abs(current_ratio - target_ratio) > 0.05:
+            if current_ratio > target_ratio:
+                target_w = int(raw_a.h * target_ratio)
+                raw_a = raw_a.crop(x_center=raw_a.w // 2, width=target_w)
+            else:
+                target_h = int(raw_a.w / target_ratio)
+                raw_a = raw_a.crop(y_center=raw_a.h // 2, height=target_h)
+        clip_a = raw_a.resize(height=1080)
+
+        # 预处理B视频
+        current_ratio = raw_b.w / raw_b.h
+        if abs(current_ratio - target_ratio) > 0.05:
+            if current_ratio > target_ratio:
+                target_w = int(raw_b.h * target_ratio)
+                raw_b = raw_b.crop(x_center=raw_b.w // 2, width=target_w)
+            else:
+                target_h = int(raw_b.w / target_ratio)
+                raw_b = raw_b.crop(y_center=raw_b.h // 2, height=target_h)
+        clip_b = raw_b.resize(height=1080)
+
+        w = clip_a.w
+        # 时长基准处理
+        duration = 0
+        if duration_source == "A 的时长":
+            duration_clip = clip_a
+            adjust_clip = clip_b
+            duration = duration_clip.duration
+            log_callback(f"调试：以A视频时长({duration:.2f}秒)为基准\n")
+        else:
+            duration_clip = clip_b
+            adjust_clip = clip_a
+            duration = duration_clip.duration
+            log_callback(f"调试：以B视频时长({duration:.2f}秒)为基准\n")
+
+        # 调整时长（裁剪/循环）
+        if adjust_clip.duration > duration:
+            adjust_clip = adjust_clip.subclip(0, duration)
+            log_callback(f"调试：视频时长过长，裁剪至{duration:.2f}秒\n")
+        elif adjust_clip.duration < duration:
+            adjust_clip = adjust_clip.loop(duration=duration)
+            log_callback(f"调试：视频时长不足，循环至{duration:.2f}秒\n")
+
+        # 赋值回原变量
+        if duration_source == "A 的时长":
+            clip_b = adjust_clip
+        else:
+            clip_a = adjust_clip
+
+        # 选择音频来源
+        audio_clip = clip_a if audio_source == "A 的音频" else clip_b
+        info_a, info_b = infos if infos else (None, None)
+        info_a = info_a or probe_video(a_file)
+        info_b = info_b or probe_video(b_file)
+        audio_mode = plan_audio(info_a, info_b, audio_source, duration_source)
+        if audio_mode:
+            log_callback(f"调试：{AUDIO_MODE_LABELS[audio_mode]}\n")
+        timings["preprocess"] = time.perf_counter() - stage_start
+
+        # 生成渐变蒙板
+        stage_start = time.perf_counter()
+        progress_callback("mask")
+        overlap = max(0, min(overlap_pixels, int(w * 1.5)))
+        total_width = 2 * w - overlap
+        left_pos_x = (1080 - total_width) / 2
+        right_pos_x = left_pos_x + w - overlap
+
+        # 蒙板按(宽度, 重叠)缓存为只读uint8逐列透明度，合成时整数混合（不再逐帧做float乘法）
+        fps = max(clip_a.fps or 30, clip_b.fps or 30)
+        make_frame = make_duet_frame_function(clip_a, clip_b, int(left_pos_x), int(right_pos_x), int(overlap))
+        timings["mask"] = time.perf_counter() - stage_start
+
+        # 合成最终视频
+        final = VideoClip(make_frame, duration=duration)
+        if audio_mode == "encode":
+            final = final.set_audio(audio_clip.audio)
+        # 音频流复制时先写无声视频，再与源音频合并
+        video_file = output_file + ".video.mp4" if audio_mode in ("copy", "loop") else output_file
+
+        # 编码参数（按探测到的编码器选择codec/preset）
+        profile = ENCODER_PROFILES[encoder]
+        log_callback(f"开始{profile['label']}：{os.path.basename(output_file)}（单视频线程数：{threads}）\n")
+        stage_start = time.perf_counter()
+        frames = int(duration * fps)
+        final.write_videofile(
+            video_file,
+            fps=fps,
+            codec=encoder,
+            audio_codec="aac",
+            threads=threads,
+            preset=profile["preset"] or "medium",
+            audio_bitrate="128k",
+            ffmpeg_params=profile["params"] + (["-vf", profile["filter"]] if profile["filter"] else [])
+            + ["-movflags", "+faststart", "-loglevel", "info"],
+            verbose=False,  # 关键修改2：关闭冗余输出，避免日志刷屏
+            logger=make_moviepy_logger(progress_callback, frames)  # 只转发逐帧进度，不输出文本
+        )
+        if video_file != output_file:
+            audio_info = info_a if audio_source == "A 的音频" else info_b
+            audio_file = a_file if audio_source == "A 的音频" else b_file
+            mux_audio_copy(video_file, audio_file, audio_mode, audio_info["duration"], duration, output_file)
+        timings["encode"] = time.perf_counter() - stage_start
+        progress_callback("done", frames, frames / max(timings["encode"], 1e-6), 1.0)
+
+        log_callback(f"生成完成：{os.path.basename(output_file)}\n")
+        return (True, a_file, b_file, "".join(log_messages), make_stats("moviepy", encoder, timings, frames, duration, threads))
+    except Exception as e:
+        error_msg = f"错误：{os.path.basename(a_file)} + {os.path.basename(b_file)} → {str(e)}\n"
+        log_callback(error_msg)
+        return (False, a_file, b_file, "".join(log_messages), make_stats("moviepy", encoder, timings, frames, duration, threads))
+    finally:
+        # 强制释放资源
+        if clip_a: clip_a.close()
+        if clip_b: clip_b.close()
+        if final: final.close()
+        if 'raw_a' in locals(): raw_a.close()
+        if 'raw_b' in locals(): raw_b.close()
+        if 'video_file' in locals() and video_file != output_file and os.path.exists(video_file):
+            os.remove(video_file)
+
+# ========== ffmpeg滤镜图引擎（单进程完成裁剪/缩放/循环/蒙板/叠加） ==========
+def get_ffmpeg_binary():
+    """获取ffmpeg可执行文件（优先使用moviepy配置的ffmpeg）"""
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def get_ffprobe_binary():
+    """获取ffprobe可执行文件（与ffmpeg同目录优先）"""
+    ffmpeg_bin = get_ffmpeg_binary()
+    folder = os.path.dirname(ffmpeg_bin)
+    if folder:
+        candidate = os.path.join(folder, "ffprobe" + (".exe" if os.name == "nt" else ""))
+        if os.path.exists(candidate):
+            return candidate
+    return shutil.which("ffprobe")
+
+
+def probe_video(path):
+    """轻量读取视频元数据（宽、高、帧率、时长、是否有音频），不解码画面"""
+    ffprobe_bin = get_ffprobe_binary()
+    if ffprobe_bin:
+        result = subprocess.run(
+            [ffprobe_bin, "-v", "error", "-show_entries",
+             "format=duration:stream=codec_type,codec_name,width,height,avg_frame_rate,r_frame_rate",
+             "-of", "json", path],
+            capture_output=True, text=True, encoding="utf-8", errors="ignore"
+        )
+        if result.returncode == 0:
+            data = json.loads(result.stdout or "{}")
+            streams = data.get("streams", [])
+            video = next((s for s in streams if s.get("codec_type") == "video"), None)
+            audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+            if video:
+                fps = 0
+                for key in ("avg_frame_rate", "r_frame_rate"):
+                    num, _, den = (video.get(key) or "0/0").partition("/")
+                    try:
+                        fps = float(num) / float(den or 1)
+                    except (ValueError, ZeroDivisionError):
+                        fps = 0
+                    if fps > 0:
+                        break
+                return {
+                    "width": int(video["width"]),
+                    "height": int(video["height"]),
+                    "fps": fps,
+                    "duration": float(data.get("format", {}).get("duration") or 0),
+                    "has_audio": audio is not None,
+                    "audio_codec": audio.get("codec_name") if audio else None
+                }
+
+    # 无ffprobe时使用moviepy的信息解析（只读取文件头）
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    infos = ffmpeg_parse_infos(path)
+    width, height = infos["video_size"]
+    return {
+        "width": int(width),
+        "height": int(height),
+        "fps": float(infos.get("video_fps") or 0),
+        "duration": float(infos.get("duration") or 0),
+        "has_audio": bool(infos.get("audio_found")),
+        "audio_codec": None  # 无法确定编码时按需重新编码
+    }
+
+
+def compute_crop_size(width, height):
+    """计算9:16裁剪区域与缩放后尺寸（与moviepy的crop/resize取整方式一致）"""
+    target_ratio = 9 / 16
+    current_ratio = width / height
+    x1, y1, crop_w, crop_h = 0, 0, width, height
+    if abs(current_ratio - target_ratio) > 0.05:
+        if current_ratio > target_ratio:
+            target_w = int(height * target_ratio)
+            x_center = width // 2
+            x1 = int(x_center - target_w / 2)
+            crop_w = int(x_center + target_w / 2) - x1
+        else:
+            target_h = int(width / target_ratio)
+            y_center = height // 2
+            y1 = int(y_center - target_h / 2)
+            crop_h = int(y_center + target_h / 2) - y1
+    scaled_w = int(crop_w * 1080 / crop_h)
+    return x1, y1, crop_w, crop_h, scaled_w
+
+
+def build_duet_filter_graph(info_a, info_b, audio_source, duration_source, overlap_pixels, encode_audio=True,
+                            segment_length=None):
+    """
+    构建与create_duet几何一致的filter_complex，返回(滤镜图, 时长, 帧率, 音频标签, 日志)
+    :param encode_audio: False时音频走流复制，不进入滤镜图（音频标签为None）
+    :param segment_length: 分段编码时单段的时长（画面裁剪到该时长，返回的时长仍为整段时长）
+    """
+    logs = []
+    x1_a, y1_a, cw_a, ch_a, w = compute_crop_size(info_a["width"], info_a["height"])
+    x1_b, y1_b, cw_b, ch_b, w_b = compute_crop_size(info_b["width"], info_b["height"])
+
+    # 时长基准（另一路通过 -stream_loop 循环后再裁剪）
+    if duration_source == "A 的时长":
+        duration = info_a["duration"]
+        logs.append(f"调试：以A视频时长({duration:.2f}秒)为基准\n")
+        adjust_duration = info_b["duration"]
+    else:
+        duration = info_b["duration"]
+        logs.append(f"调试：以B视频时长({duration:.2f}秒)为基准\n")
+        adjust_duration = info_a["duration"]
+    if adjust_duration > duration:
+        logs.append(f"调试：视频时长过长，裁剪至{duration:.2f}秒\n")
+    elif adjust_duration < duration:
+        logs.append(f"调试：视频时长不足，循环至{duration:.2f}秒\n")
+
+    fps = max(info_a["fps"] or 30, info_b["fps"] or 30)
+    length = segment_length or duration
+
+    # 位置计算（与moviepy合成一致：坐标向零取整）
+    overlap = max(0, min(overlap_pixels, int(w * 1.5)))
+    overlap = min(overlap, w, w_b)
+    total_width = 2 * w - overlap
+    left_pos_x = int((1080 - total_width) / 2)
+    right_pos_x = int((1080 - total_width) / 2 + w - overlap)
+
+    chains = [f"color=c=black:s=1080x1080:r={fps}:d={length:.6f}[bg]"]
+    for idx, (x1, y1, cw, ch, sw) in enumerate([(x1_a, y1_a, cw_a, ch_a, w), (x1_b, y1_b, cw_b, ch_b, w_b)]):
+        chains.append(
+            f"[{idx}:v]crop={cw}:{ch}:{x1}:{y1},scale={sw}:1080,"
+            f"trim=duration={length:.6f},setpts=PTS-STARTPTS,fps={fps},format=yuva420p[v{idx}]"
+        )
+
+    left_label, right_label = "v0", "v1"
+    if overlap > 0:
+        # 渐变蒙板只计算一帧，再用loop滤镜复用，避免逐帧求值
+        last = max(overlap - 1, 1)
+        start = w - overlap
+        mask_exprs = [
+            (w, f"if(gte(X,{start}),255*(1-(X-{start})/{last}),255)"),
+            (w_b, f"if(lt(X,{overlap}),255*X/{last},255)")
+        ]
+        for idx, (mw, expr) in enumerate(mask_exprs):
+            chains.append(
+                f"color=c=white:s={mw}x1080:r={fps}:d={1 / fps:.6f},format=gray,geq=lum='{expr}',"
+                f"loop=loop=-1:size=1:start=0,trim=duration={length:.6f},setpts=PTS-STARTPTS[m{idx}]"
+            )
+            chains.append(f"[v{idx}][m{idx}]alphamerge[a{idx}]")
+        left_label, right_label = "a0", "a1"
+
+    chains.append(f"[bg][{left_label}]overlay=x={left_pos_x}:y=0:shortest=1[tmp]")
+    chains.append(f"[tmp][{right_label}]overlay=x={right_pos_x}:y=0:shortest=1,format=yuv420p[outv]")
+
+    # 音频来源
+    audio_idx = 0 if audio_source == "A 的音频" else 1
+    audio_info = info_a if audio_idx == 0 else info_b
+    audio_label = None
+    if audio_info["has_audio"] and encode_audio:
+        chains.append(f"[{audio_idx}:a]atrim=duration={duration:.6f},asetpts=PTS-STARTPTS[outa]")
+        audio_label = "outa"
+
+    return ";".join(chains), duration, fps, audio_label, logs
+
+
+# ========== 音频流复制（兼容时直接复制，循环用concat拼接） ==========
+# 可直接复制到mp4输出的音频编码（其他编码重新编码为AAC，保证各平台兼容）
+AUDIO_COPY_CODECS = {"aac"}
+
+
+def plan_audio(info_a, info_b, audio_source, duration_source):
+    """
+    决定音频处理方式
+    :return: None 无音频 / "copy" 直接复制（过长时按包裁剪） / "loop" concat拼接后复制 / "encode" 重新编码
+    """
+    use_a = audio_source == "A 的音频"
+    info = info_a if use_a else info_b
+    if not info["has_audio"]:
+        return None
+    if info.get("audio_codec") not in AUDIO_COPY_CODECS or info["duration"] <= 0:
+        return "encode"
+    duration = (info_a if duration_source == "A 的时长" else info_b)["duration"]
+    is_basis = use_a == (duration_source == "A 的时长")
+    if not is_basis and info["duration"] < duration:
+        return "loop"
+    return "copy"
+
+
+def make_audio_concat_input(source, source_duration, duration, list_file):
+    """把音频源重复写入concat清单（流级别循环，不解码为PCM），返回作为额外输入的ffmpeg参数"""
+    repeat = int(math.ceil(duration / source_duration)) + 1
+    path = os.path.abspath(source).replace("'", "'\\''")
+    with open(list_file, "w", encoding="utf-8") as f:
+        f.write(f"file '{path}'\n" * repeat)
+    return ["-f", "concat", "-safe", "0", "-i", list_file]
+
+
+def mux_audio_copy(video_file, audio_file, audio_mode, audio_duration, duration, output_file):
+    """把已渲染的无声视频与源音频流复制合并（moviepy引擎使用）"""
+    list_file = output_file + ".audio.txt"
+    cmd = [get_ffmpeg_binary(), "-y", "-loglevel", "error", "-i", video_file]
+    try:
+        if audio_mode == "loop":
+            cmd += make_audio_concat_input(audio_file, audio_duration, duration, list_file)
+        else:
+            cmd += ["-i", audio_file]
+        cmd += ["-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-t", f"{duration:.6f}",
+                "-movflags", "+faststart", output_file]
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="ignore")
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip()[-500:] or f"ffmpeg退出码{result.returncode}")
+    finally:
+        if os.path.exists(list_file):
+            os.remove(list_file)
+
+
+AUDIO_MODE_LABELS = {"copy": "直接复制音频流", "loop": "拼接复制音频流（循环）", "encode": "重新编码音频为AAC"}
+
+
+def build_audio_args(audio_mode, audio_file, audio_info, looped, duration, list_file, input_index):
+    """
+    画面来自其他输入（分段拼接/管道）时，整段音频作为额外输入的ffmpeg参数
+    :return: (输入参数, 映射与编码参数)；无音频时都为空
+    """
+    if not audio_mode:
+        return [], []
+    if audio_mode == "loop":
+        inputs = make_audio_concat_input(audio_file, audio_info["duration"], duration, list_file)
+    else:
+        inputs = (["-stream_loop", "-1"] if looped else []) + ["-i", audio_file]
+    codec = ["-c:a", "aac", "-b:a", "128k"] if audio_mode == "encode" else ["-c:a", "copy"]
+    return inputs, ["-map", f"{input_index}:a:0"] + codec
+
+
+# ========== 长视频分段并行编码 ==========
+def get_loop_flags(info_a, info_b, duration_source, duration):
+    """非基准视频时长不足时需要循环输入（-stream_loop）"""
+    loop_a = duration_source != "A 的时长" and info_a["duration"] < duration
+    loop_b = duration_source == "A 的时长" and info_b["duration"] < duration
+    return loop_a, loop_b
+
+
+def render_segmented(args, info_a, info_b, audio_mode, duration, fps, encoder, threads,
+                     progress_callback, log_callback):
+    """
+    分段并行编码：每段独立ffmpeg（输入按段起点定位，循环输入按源时长取模），
+    段边界对齐到整帧，每段以关键帧开始；最后concat分离器流复制拼接画面并整段合并音频
+    :return: 编码总帧数
+    """
+    a_file, b_file, output_file, audio_source, duration_source, overlap_pixels = args
+    profile = ENCODER_PROFILES[encoder]
+    ffmpeg_bin = get_ffmpeg_binary()
+    total_frames = max(1, int(round(duration * fps)))
+    segment_frames = max(1, int(round(SEGMENT_SECONDS * fps)))
+    segments = [(start, min(segment_frames, total_frames - start)) for start in range(0, total_frames, segment_frames)]
+    parallel = min(len(segments), max(2, threads // SEGMENT_MIN_THREADS))
+    if not encoder.startswith("lib"):
+        parallel = min(parallel, SEGMENT_HARDWARE_PARALLEL)
+    segment_threads = max(1, threads // parallel)
+    loop_a, loop_b = get_loop_flags(info_a, info_b, duration_source, duration)
+    log_callback(f"✂️ 长视频分段并行编码：共{len(segments)}段，同时编码{parallel}段，每段线程数{segment_threads}\n")
+
+    segment_dir = output_file + ".segments"
+    os.makedirs(segment_dir, exist_ok=True)
+    done_frames = [0] * len(segments)
+    speeds = [0.0] * len(segments)
+    progress_lock = threading.Lock()
+
+    def encode_segment(index):
+        start_frame, frame_count = segments[index]
+        start = start_frame / fps
+        # 滤镜图多留一帧余量，由 -frames:v 精确控制每段帧数
+        graph = build_duet_filter_graph(info_a, info_b, audio_source, duration_source, overlap_pixels,
+                                        encode_audio=False, segment_length=(frame_count + 1) / fps)[0]
+        if profile["filter"]:
+            graph = graph.replace("format=yuv420p[outv]", f"format=yuv420p,{profile['filter']}[outv]")
+        cmd = [ffmpeg_bin, "-y", "-loglevel", "error"] + profile["params"]
+        for path, info, looped in ((a_file, info_a, loop_a), (b_file, info_b, loop_b)):
+            offset = start % info["duration"] if looped and info["duration"] > 0 else start
+            cmd += (["-stream_loop", "-1"] if looped else []) + ["-ss", f"{offset:.6f}", "-i", path]
+        cmd += ["-filter_complex", graph, "-map", "[outv]", "-c:v", encoder]
+        cmd += (["-preset", profile["preset"]] if profile["preset"] else [])
+        cmd += ["-threads", str(segment_threads), "-r", f"{fps}", "-frames:v", str(frame_count),
+                os.path.join(segment_dir, f"{index:04d}.mkv")]
+
+        def on_progress(stage, frame=0, speed=0.0, fraction=0.0):
+            with progress_lock:
+                done_frames[index] = frame
+                speeds[index] = speed if fraction < 1.0 else 0.0
+                progress_callback("encode", sum(done_frames), sum(speeds), min(1.0, sum(done_frames) / total_frames))
+
+        returncode, stderr, frames = run_ffmpeg_with_progress(cmd, frame_count / fps, on_progress)
+        if returncode != 0:
+            raise RuntimeError(f"第{index + 1}段编码失败：" + (stderr.strip()[-400:] or f"ffmpeg退出码{returncode}"))
+        return frames
+
+    try:
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            frames = sum(executor.map(encode_segment, range(len(segments))))
+
+        # 拼接画面（流复制）并整段处理音频，避免分段音频在段边界产生接缝
+        list_file = os.path.join(segment_dir, "segments.txt")
+        with open(list_file, "w", encoding="utf-8") as f:
+            for index in range(len(segments)):
+                path = os.path.abspath(os.path.join(segment_dir, f"{index:04d}.mkv")).replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+        audio_idx = 0 if audio_source == "A 的音频" else 1
+        audio_inputs, audio_outputs = build_audio_args(
+            audio_mode, args[audio_idx], (info_a, info_b)[audio_idx], (loop_a, loop_b)[audio_idx],
+            duration, os.path.join(segment_dir, "audio.txt"), 1
+        )
+        cmd = [ffmpeg_bin, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_file]
+        cmd += audio_inputs + ["-map", "0:v:0", "-c:v", "copy"] + audio_outputs
+        cmd += ["-t", f"{duration:.6f}", "-movflags", "+faststart", output_file]
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="ignore")
+        if result.returncode != 0:
+            raise RuntimeError("分段拼接失败：" + (result.stderr.strip()[-400:] or f"ffmpeg退出码{result.returncode}"))
+        return frames
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+
+def process_single_pair_ffmpeg(args, log_queue=None, infos=None, encoder="libx264", threads=THREADS_PER_VIDEO):
+    """ffmpeg引擎：一个filter_complex + 单个子进程完成整段合成，无Python逐帧搬运"""
+    a_file, b_file, output_file, audio_source, duration_source, overlap_pixels = args
+    log_messages = []
+    log_callback = make_log_callback(log_messages, log_queue)
+    progress_callback = make_progress_callback(os.path.basename(output_file), log_queue)
+    timings = {}
+    frames = 0
+    duration = 0
+    list_file = output_file + ".audio.txt"
+    try:
+        stage_start = time.perf_counter()
+        progress_callback("probe")
+        info_a, info_b = infos if infos else (None, None)
+        info_a = info_a or probe_video(a_file)
+        info_b = info_b or probe_video(b_file)
+        timings["probe"] = time.perf_counter() - stage_start
+
+        # 滤镜图中的蒙板只在ffmpeg内生成一帧，这里统计的是构建滤镜图的耗时
+        stage_start = time.perf_counter()
+        progress_callback("mask")
+        audio_mode = plan_audio(info_a, info_b, audio_source, duration_source)
+        filter_graph, duration, fps, audio_label, logs = build_duet_filter_graph(
+            info_a, info_b, audio_source, duration_source, overlap_pixels, encode_audio=audio_mode == "encode"
+        )
+        timings["mask"] = time.perf_counter() - stage_start
+        for msg in logs:
+            log_callback(msg)
+
+        profile = ENCODER_PROFILES[encoder]
+        if SEGMENT_ENABLED and duration >= SEGMENT_MIN_DURATION:
+            if audio_mode:
+                log_callback(f"调试：{AUDIO_MODE_LABELS[audio_mode]}\n")
+            stage_start = time.perf_counter()
+            frames = render_segmented(args, info_a, info_b, audio_mode, duration, fps, encoder, threads,
+                                      progress_callback, log_callback)
+            timings["encode"] = time.perf_counter() - stage_start
+            progress_callback("done", frames, frames / max(timings["encode"], 1e-6), 1.0)
+            log_callback(f"生成完成：{os.path.basename(output_file)}\n")
+            return (True, a_file, b_file, "".join(log_messages), make_stats("ffmpeg", encoder, timings, frames, duration, threads))
+
+        # 非基准视频循环输入（-stream_loop），由滤镜图中的trim裁剪到基准时长
+        loop_a, loop_b = get_loop_flags(info_a, info_b, duration_source, duration)
+        if profile["filter"]:
+            filter_graph = filter_graph.replace("format=yuv420p[outv]", f"format=yuv420p,{profile['filter']}[outv]")
+        cmd = [get_ffmpeg_binary(), "-y", "-loglevel", "error"] + profile["params"]
+        cmd += (["-stream_loop", "-1"] if loop_a else []) + ["-i", a_file]
+        cmd += (["-stream_loop", "-1"] if loop_b else []) + ["-i", b_file]
+        audio_idx = 0 if audio_source == "A 的音频" else 1
+        if audio_mode == "loop":
+            audio_info = info_a if audio_idx == 0 else info_b
+            cmd += make_audio_concat_input(args[audio_idx], audio_info["duration"], duration, list_file)
+        cmd += ["-filter_complex", filter_graph, "-map", "[outv]"]
+        if audio_label:
+            cmd += ["-map", f"[{audio_label}]", "-c:a", "aac", "-b:a", "128k"]
+        elif audio_mode == "copy":
+            cmd += ["-map", f"{audio_idx}:a:0", "-c:a", "copy"]
+        elif audio_mode == "loop":
+            cmd += ["-map", "2:a:0", "-c:a", "copy"]
+        if audio_mode:
+            log_callback(f"调试：{AUDIO_MODE_LABELS[audio_mode]}\n")
+        cmd += ["-c:v", encoder] + (["-preset", profile["preset"]] if profile["preset"] else [])
+        cmd += ["-threads", str(threads), "-r", f"{fps}", "-t", f"{duration:.6f}",
+                "-movflags", "+faststart", output_file]
+
+        log_callback(f"开始ffmpeg滤镜图{profile['label']}：{os.path.basename(output_file)}（单视频线程数：{threads}）\n")
+        # ffmpeg内解码+合成+编码在同一进程流水线完成，统一计入encode阶段
+        stage_start = time.perf_counter()
+        returncode, stderr, frames = run_ffmpeg_with_progress(cmd, duration, progress_callback)
+        timings["encode"] = time.perf_counter() - stage_start
+        if returncode != 0:
+            raise RuntimeError(stderr.strip()[-500:] or f"ffmpeg退出码{returncode}")
+        progress_callback("done", frames, frames / max(timings["encode"], 1e-6), 1.0)
+
+        log_callback(f"生成完成：{os.path.basename(output_file)}\n")
+        return (True, a_file, b_file, "".join(log_messages), make_stats("ffmpeg", encoder, timings, frames, duration, threads))
+    except Exception as e:
+        log_callback(f"错误：{os.path.basename(a_file)} + {os.path.basename(b_file)} → {str(e)}\n")
+        return (False, a_file, b_file, "".join(log_messages), make_stats("ffmpeg", encoder, timings, frames, duration, threads))
+    finally:
+        if os.path.exists(list_file):
+            os.remove(list_file)
+
+
+# ========== 限内存逐帧合成（ffmpeg解码 → 复用uint8缓冲区 → 整数混合 → ffmpeg编码） ==========
+def ignore_sigint():
+    """子进程忽略Ctrl+C（由主进程统一处理取消，渲染中的任务可以正常结束）"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def init_render_worker(frame_semaphore):
+    """进程池子进程初始化：忽略Ctrl+C，保存所有渲染进程共享的预读帧信号量"""
+    global _frame_semaphore
+    ignore_sigint()
+    _frame_semaphore = frame_semaphore
+
+
+class FrameReader:
+    """
+    解码帧读取器：后台线程把 stream 中的rgb24帧读入复用的uint8缓冲区
+    每路自有BASE_FRAME_BUFFERS个缓冲区；额外的预读缓冲区需要从 semaphore 取许可，
+    取不到时只用已有的缓冲区（等待主循环归还），许可耗尽时只是少预读，不会卡死
+    """
+
+    def __init__(self, stream, shape, max_buffers=BASE_FRAME_BUFFERS, proc=None, semaphore=None):
+        self.stream = stream
+        self.proc = proc
+        self.semaphore = semaphore
+        self.shape = shape
+        self.frame_bytes = shape[0] * shape[1] * shape[2]
+        self.max_buffers = max(BASE_FRAME_BUFFERS, max_buffers)
+        self.buffers = 0
+        self.permits = 0
+        self.finished = False
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        self.thread = threading.Thread(target=self.decode_loop, daemon=True)
+        self.thread.start()
+
+    def get_buffer(self):
+        """取一个空闲缓冲区：优先复用，其次新建（自有缓冲区直接建，预读缓冲区需要许可），否则等待归还"""
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            pass
+        if self.buffers < BASE_FRAME_BUFFERS:
+            self.buffers += 1
+            return np.empty(self.shape, dtype=np.uint8)
+        if self.buffers < self.max_buffers and (self.semaphore is None or self.semaphore.acquire(False)):
+            if self.semaphore is not None:
+                self.permits += 1
+            self.buffers += 1
+            return np.empty(self.shape, dtype=np.uint8)
+        return self.free.get()
+
+    def decode_loop(self):
+        while True:
+            buffer = self.get_buffer()
+            if buffer is None:
+                return
+            view = memoryview(buffer).cast("B")
+            filled = 0
+            while filled < self.frame_bytes:
+                count = self.stream.readinto(view[filled:])
+                if not count:
+                    break
+                filled += count
+            if filled < self.frame_bytes:
+                self.ready.put(None)
+                return
+            self.ready.put(buffer)
+
+    def read(self):
+        """取下一帧（读完后返回None）；用完后必须release归还缓冲区"""
+        if self.finished:
+            return None
+        frame = self.ready.get()
+        self.finished = frame is None
+        return frame
+
+    def release(self, buffer):
+        self.free.put(buffer)
+
+    def close(self):
+        self.free.put(None)
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.kill()
+            self.proc.wait()
+        self.thread.join(timeout=5)
+        for _ in range(self.permits):
+            self.semaphore.release()
+        self.permits = 0
+
+
+def open_frame_reader(path, info, frame_count, fps, looped, max_buffers=BASE_FRAME_BUFFERS):
+    """启动ffmpeg解码管道：裁剪/缩放/帧率转换/循环都在ffmpeg内完成，Python只接收最终尺寸的rgb24帧"""
+    x1, y1, crop_w, crop_h, scaled_w = compute_crop_size(info["width"], info["height"])
+    cmd = [get_ffmpeg_binary(), "-loglevel", "error", "-nostdin"]
+    cmd += (["-stream_loop", "-1"] if looped else []) + ["-i", path]
+    cmd += ["-an", "-vf", f"crop={crop_w}:{crop_h}:{x1}:{y1},scale={scaled_w}:1080,fps={fps}",
+            "-frames:v", str(frame_count), "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+    return FrameReader(proc.stdout, (1080, scaled_w, 3), max_buffers, proc=proc, semaphore=_frame_semaphore)
+
+
+def process_single_pair_bounded(args, log_queue=None, encoder="libx264", threads=THREADS_PER_VIDEO, infos=None):
+    """
+    限内存引擎：两路ffmpeg解码管道按最终尺寸输出帧，Python按uint8整数混合到复用画布，
+    再写入编码ffmpeg的标准输入；单任务帧缓冲区内存不超过JOB_MEMORY_BUDGET_MB
+    """
+    a_file, b_file, output_file, audio_source, duration_source, overlap_pixels = args
+    log_messages = []
+    log_callback = make_log_callback(log_messages, log_queue)
+    progress_callback = make_progress_callback(os.path.basename(output_file), log_queue)
+    timings = {}
+    frames = 0
+    duration = 0
+    readers = []
+    encoder_proc = None
+    list_file = output_file + ".audio.txt"
+    try:
+        stage_start = time.perf_counter()
+        progress_callback("probe")
+        info_a, info_b = infos if infos else (None, None)
+        info_a = info_a or probe_video(a_file)
+        info_b = info_b or probe_video(b_file)
+        timings["probe"] = time.perf_counter() - stage_start
+
+        # 几何与时长沿用滤镜图引擎的计算（只取时长/帧率/日志），蒙板使用缓存的uint8透明度
+        stage_start = time.perf_counter()
+        progress_callback("mask")
+        _, duration, fps, _, logs = build_duet_filter_graph(
+            info_a, info_b, audio_source, duration_source, overlap_pixels, encode_audio=False
+        )
+        for msg in logs:
+            log_callback(msg)
+        w_a = compute_crop_size(info_a["width"], info_a["height"])[4]
+        w_b = compute_crop_size(info_b["width"], info_b["height"])[4]
+        overlap = min(max(0, min(overlap_pixels, int(w_a * 1.5))), w_a, w_b)
+        total_width = 2 * w_a - overlap
+        left_pos_x = int((1080 - total_width) / 2)
+        right_pos_x = int((1080 - total_width) / 2 + w_a - overlap)
+        alpha_a = get_alpha_ramp(w_a, overlap, "left")
+        alpha_b = get_alpha_ramp(w_b, overlap, "right")
+        timings["mask"] = time.perf_counter() - stage_start
+
+        # 内存预算：画布 + 每路自有缓冲区，剩余预算用于预读（每多一帧两路各一帧）
+        frame_pair_bytes = 1080 * (w_a + w_b) * 3
+        base_bytes = 1080 * 1080 * 3 + BASE_FRAME_BUFFERS * frame_pair_bytes
+        extra = max(0, (JOB_MEMORY_BUDGET_MB * 1024 * 1024 - base_bytes) // frame_pair_bytes)
+        max_buffers = BASE_FRAME_BUFFERS + min(READAHEAD_FRAMES, extra)
+        log_callback(f"🧮 限内存合成：帧缓冲约 {(base_bytes + (max_buffers - BASE_FRAME_BUFFERS) * frame_pair_bytes) / 1048576:.0f}MB"
+                     f"（预算 {JOB_MEMORY_BUDGET_MB}MB），每路最多缓冲 {max_buffers} 帧\n")
+
+        total_frames = max(1, int(round(duration * fps)))
+        loop_a, loop_b = get_loop_flags(info_a, info_b, duration_source, duration)
+        readers = [open_frame_reader(a_file, info_a, total_frames, fps, loop_a, max_buffers),
+                   open_frame_reader(b_file, info_b, total_frames, fps, loop_b, max_buffers)]
+
+        audio_mode = plan_audio(info_a, info_b, audio_source, duration_source)
+        if audio_mode:
+            log_callback(f"调试：{AUDIO_MODE_LABELS[audio_mode]}\n")
+        audio_idx = 0 if audio_source == "A 的音频" else 1
+        audio_inputs, audio_outputs = build_audio_args(
+            audio_mode, args[audio_idx], (info_a, info_b)[audio_idx], (loop_a, loop_b)[audio_idx],
+            duration, list_file, 1
+        )
+        profile = ENCODER_PROFILES[encoder]
+        cmd = [get_ffmpeg_binary(), "-y", "-loglevel", "error"] + profile["params"]
+        cmd += ["-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "1080x1080", "-r", f"{fps}", "-i", "-"]
+        cmd += audio_inputs + ["-map", "0:v:0"] + audio_outputs
+        cmd += ["-vf", profile["filter"]] if profile["filter"] else ["-pix_fmt", "yuv420p"]
+        cmd += ["-c:v", encoder] + (["-preset", profile["preset"]] if profile["preset"] else [])
+        cmd += ["-threads", str(threads), "-t", f"{duration:.6f}", "-movflags", "+faststart", output_file]
+
+        log_callback(f"开始限内存逐帧合成{profile['label']}：{os.path.basename(output_file)}（单视频线程数：{threads}）\n")
+        stage_start = time.perf_counter()
+        canvas = np.zeros((1080, 1080, 3), dtype=np.uint8)
+        current = [None, None]
+        last_emit = 0
+        with tempfile.TemporaryFile() as err_file:
+            encoder_proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=err_file)
+            try:
+                for index in range(total_frames):
+                    # 某一路提前读完（时长取整误差）时沿用最后一帧
+                    for i, reader in enumerate(readers):
+                        frame = reader.read()
+                        if frame is not None:
+                            if current[i] is not None:
+                                reader.release(current[i])
+                            current[i] = frame
+                    if current[0] is None or current[1] is None:
+                        raise RuntimeError("源视频解码失败，没有读到画面")
+                    canvas.fill(0)
+                    blend_into(canvas, current[0], left_pos_x, alpha_a)
+                    blend_into(canvas, current[1], right_pos_x, alpha_b)
+                    encoder_proc.stdin.write(canvas.data)
+                    frames = index + 1
+                    now = time.perf_counter()
+                    if now - last_emit >= PROGRESS_INTERVAL:
+                        last_emit = now
+                        progress_callback("encode", frames, frames / max(now - stage_start, 1e-6), frames / total_frames)
+                encoder_proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = encoder_proc.wait()
+            err_file.seek(0)
+            stderr = err_file.read().decode("utf-8", errors="ignore")
+        timings["encode"] = time.perf_counter() - stage_start
+        if returncode != 0:
+            raise RuntimeError(stderr.strip()[-500:] or f"ffmpeg退出码{returncode}")
+        progress_callback("done", frames, frames / max(timings["encode"], 1e-6), 1.0)
+
+        log_callback(f"生成完成：{os.path.basename(output_file)}\n")
+        return (True, a_file, b_file, "".join(log_messages), make_stats("bounded", encoder, timings, frames, duration, threads))
+    except Exception as e:
+        log_callback(f"错误：{os.path.basename(a_file)} + {os.path.basename(b_file)} → {str(e)}\n")
+        return (False, a_file, b_file, "".join(log_messages), make_stats("bounded", encoder, timings, frames, duration, threads))
+    finally:
+        for reader in readers:
+            reader.close()
+        if encoder_proc is not None and encoder_proc.poll() is None:
+            encoder_proc.kill()
+            encoder_proc.wait()
+        if os.path.exists(list_file):
+            os.remove(list_file)
+
+
+# ========== 进程池（spawn安全，日志通过队列实时回传GUI） ==========
+def create_process_pool(max_workers=None):
+    """创建spawn方式的进程池与日志队列（Windows/macOS/Linux行为一致）"""
+    ctx = multiprocessing.get_context("spawn")
+    # 日志队列的管理进程同样忽略Ctrl+C，取消时仍能转发渲染中任务的日志
+    manager = SyncManager(ctx=ctx)
+    manager.start(ignore_sigint)
+    log_queue = manager.Queue()
+    max_workers = max_workers or CPU_PHYSICAL_CORES
+    # 限内存引擎的预读帧许可在所有渲染进程之间共享（每个任务的每路解码管道各READAHEAD_FRAMES个）
+    frame_semaphore = ctx.Semaphore(max_workers * READERS_PER_JOB * READAHEAD_FRAMES)
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx,
+                                   initializer=init_render_worker, initargs=(frame_semaphore,))
+    return executor, manager, log_queue
@@ -1,186 +1,31 @@
 import os
 import sys
-import random
-import hashlib  # 新增：用于生成唯一文件名，避免重复
-import numpy as np
 import json
 from datetime import datetime
 import tkinter.messagebox as msgbox
-from moviepy.editor import VideoFileClip, CompositeVideoClip, ImageClip
-import tempfile
 import time
 
 import customtkinter as ctk
 from tkinter import filedialog, Menu
 import threading
 import subprocess
-# 关键修改1：替换ProcessPoolExecutor为ThreadPoolExecutor（避免多进程复制GUI）
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 关键修改1：渲染代码拆分到无GUI的duet_worker模块，进程池子进程只需要渲染代码
+from duet_worker import (
+    RENDER_BACKEND, HAS_PSUTIL, ENCODER_PROFILES,
+    CPU_PHYSICAL_CORES, detect_encoders, select_encoder
+)
+from duet_cache import probe_videos
+# 批次流程（探测/配对/清单/预处理/调度/渲染）与命令行版duet_cli.py共用
+from duet_runner import DuetBatchRunner, list_video_files
 
 # ========== 核心配置：按要求调整 ==========
-USE_HARDWARE_ENCODE = True
 CONFIG_FILE = "video_duet_config.json"
 
 # ========== 初始化优化 ==========
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
-# 获取CPU物理核心数
-try:
-    import psutil
-    CPU_PHYSICAL_CORES = psutil.cpu_count(logical=False)
-    CPU_LOGICAL_CORES = psutil.cpu_count(logical=True)
-    THREADS_PER_VIDEO = max(1, CPU_PHYSICAL_CORES // 2)
-except ImportError:
-    msgbox.showwarning("提示", "未安装psutil，建议执行 pip install psutil 以获得最佳性能！")
-    CPU_PHYSICAL_CORES = os.cpu_count() or 4
-    THREADS_PER_VIDEO = max(1, CPU_PHYSICAL_CORES // 2)
-
-# ========== 多线程视频处理函数（替换多进程） ==========
-def process_single_pair(args):
-    """多线程执行单个视频合成（避免多进程复制GUI窗口）"""
-    a_file, b_file, output_file, audio_source, duration_source, overlap_pixels = args
-    log_messages = []
-
-    def log_callback(msg):
-        log_messages.append(msg)
-
-    clip_a = None
-    clip_b = None
-    final = None
-    try:
-        # 加载并预处理视频（统一9:16竖屏）
-        raw_a = VideoFileClip(a_file)
-        raw_b = VideoFileClip(b_file)
-
-        # 预处理A视频
-        target_ratio = 9 / 16
-        current_ratio = raw_a.w / raw_a.h
-        if abs(current_ratio - target_ratio) > 0.05:
-            if current_ratio > target_ratio:
-                target_w = int(raw_a.h * target_ratio)
-                raw_a = raw_a.crop(x_center=raw_a.w // 2, width=target_w)
-            else:
-                target_h = int(raw_a.w / target_ratio)
-                raw_a = raw_a.crop(y_center=raw_a.h // 2, height=target_h)
-        clip_a = raw_a.resize(height=1080)
-
-        # 预处理B视频
-        current_ratio = raw_b.w / raw_b.h
-        if abs(current_ratio - target_ratio) > 0.05:
-            if current_ratio > target_ratio:
-                target_w = int(raw_b.h * target_ratio)
-                raw_b = raw_b.crop(x_center=raw_b.w // 2, width=target_w)
-            else:
-                target_h = int(raw_b.w / target_ratio)
-                raw_b = raw_b.crop(y_center=raw_b.h // 2, height=target_h)
-        clip_b = raw_b.resize(height=1080)
-
-        w = clip_a.w
-        # 时长基准处理
-        duration = 0
-        if duration_source == "A 的时长":
-            duration_clip = clip_a
-            adjust_clip = clip_b
-            duration = duration_clip.duration
-            log_callback(f"调试：以A视频时长({duration:.2f}秒)为基准\n")
-        else:
-            duration_clip = clip_b
-            adjust_clip = clip_a
-            duration = duration_clip.duration
-            log_callback(f"调试：以B视频时长({duration:.2f}秒)为基准\n")
-
-        # 调整时长（裁剪/循环）
-        if adjust_clip.duration > duration:
-            adjust_clip = adjust_clip.subclip(0, duration)
-            log_callback(f"调试：视频时长过长，裁剪至{duration:.2f}秒\n")
-        elif adjust_clip.duration < duration:
-            adjust_clip = adjust_clip.loop(duration=duration)
-            log_callback(f"调试：视频时长不足，循环至{duration:.2f}秒\n")
-
-        # 赋值回原变量
-        if duration_source == "A 的时长":
-            clip_b = adjust_clip
-        else:
-            clip_a = adjust_clip
-
-        # 选择音频来源
-        audio_clip = clip_a if audio_source == "A 的音频" else clip_b
-
-        # 生成渐变蒙板
-        overlap = max(0, min(overlap_pixels, int(w * 1.5)))
-        total_width = 2 * w - overlap
-        left_pos_x = (1080 - total_width) / 2
-        right_pos_x = left_pos_x + w - overlap
-
-        if overlap > 0:
-            fade_out = np.linspace(1.0, 0.0, int(overlap))
-            fade_in = np.linspace(0.0, 1.0, int(overlap))
-
-            left_mask_array = np.ones((1080, w), dtype=np.float32)
-            left_mask_array[:, -int(overlap):] = np.tile(fade_out, (1080, 1))
-            mask_left = ImageClip(left_mask_array, ismask=True).set_duration(duration)
-            clip_a = clip_a.set_mask(mask_left)
-
-            right_mask_array = np.ones((1080, w), dtype=np.float32)
-            right_mask_array[:, :int(overlap)] = np.tile(fade_in, (1080, 1))
-            mask_right = ImageClip(right_mask_array, ismask=True).set_duration(duration)
-            clip_b = clip_b.set_mask(mask_right)
-
-        # 合成最终视频
-        fps = max(clip_a.fps or 30, clip_b.fps or 30)
-        final = CompositeVideoClip([
-            clip_a.set_position((left_pos_x, 0)),
-            clip_b.set_position((right_pos_x, 0))
-        ], size=(1080, 1080)).set_audio(audio_clip.audio)
-
-        # 编码参数（硬件/软件最优配置）
-        encode_info = "硬件编码(NVIDIA NVENC)" if USE_HARDWARE_ENCODE else "极速软件编码"
-        log_callback(f"开始{encode_info}：{os.path.basename(output_file)}（单视频线程数：{THREADS_PER_VIDEO}）\n")
-
-        if USE_HARDWARE_ENCODE:
-            # NVIDIA硬件编码
-            final.write_videofile(
-                output_file,
-                fps=fps,
-                codec="h264_nvenc",
-                audio_codec="aac",
-                threads=THREADS_PER_VIDEO,
-                preset="p1",
-                audio_bitrate="128k",
-                ffmpeg_params=["-movflags", "+faststart", "-loglevel", "info"],
-                verbose=False,  # 关键修改2：关闭冗余输出，避免日志刷屏
-                logger=None     # 禁用moviepy的日志器，减少干扰
-            )
-        else:
-            # 软件极速编码
-            final.write_videofile(
-                output_file,
-                fps=fps,
-                codec="libx264",
-                audio_codec="aac",
-                threads=THREADS_PER_VIDEO,
-                preset="ultrafast",
-                audio_bitrate="128k",
-                ffmpeg_params=["-movflags", "+faststart", "-loglevel", "info"],
-                verbose=False,
-                logger=None
-            )
-
-        log_callback(f"生成完成：{os.path.basename(output_file)}\n")
-        return (True, a_file, b_file, "".join(log_messages))
-    except Exception as e:
-        error_msg = f"错误：{os.path.basename(a_file)} + {os.path.basename(b_file)} → {str(e)}\n"
-        log_callback(error_msg)
-        return (False, a_file, b_file, "".join(log_messages))
-    finally:
-        # 强制释放资源
-        if clip_a: clip_a.close()
-        if clip_b: clip_b.close()
-        if final: final.close()
-        if 'raw_a' in locals(): raw_a.close()
-        if 'raw_b' in locals(): raw_b.close()
-
 # ========== GUI主程序 ==========
 class VideoDuetApp(ctk.CTk):
     def __init__(self):
@@ -212,8 +57,12 @@ class VideoDuetApp(ctk.CTk):
         # 运行状态
         self.is_running = False
         self.is_cancelled = False
-        self.executor = None
+        self.runner = None
         self.task_start_time = None
+        # 实时进度：{任务名: (完成比例, 编码fps)}
+        self.job_progress = {}
+        self.batch_total = 0
+        self.batch_completed = 0
 
         # 布局参数
         pad_y = 10
@@ -221,13 +70,14 @@ class VideoDuetApp(ctk.CTk):
         row = 0
 
         # 性能信息提示
-        perf_info = f"编码模式：{'硬件' if USE_HARDWARE_ENCODE else '软件'} | 单视频线程：{THREADS_PER_VIDEO} | 并行线程数：{CPU_PHYSICAL_CORES}"
-        ctk.CTkLabel(
+        perf_info = f"渲染引擎：{RENDER_BACKEND} | 编码器：检测中... | 并发/单视频线程：自适应（物理核心 {CPU_PHYSICAL_CORES}）"
+        self.perf_label = ctk.CTkLabel(
             self,
             text=perf_info,
             font=ctk.CTkFont(size=10),
             text_color="#2E8B57"
-        ).grid(row=row, column=0, columnspan=3, padx=pad_x, pady=5, sticky="w")
+        )
+        self.perf_label.grid(row=row, column=0, columnspan=3, padx=pad_x, pady=5, sticky="w")
         row += 1
 
         # 拼接模式选择
@@ -369,6 +219,11 @@ class VideoDuetApp(ctk.CTk):
         self.progress_bar.set(0)
         row += 1
 
+        # 实时渲染状态（进行中任务数/总编码fps）
+        self.status_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=11), text_color="gray")
+        self.status_label.grid(row=row, column=0, columnspan=3, padx=pad_x, pady=(0, 5), sticky="w")
+        row += 1
+
         # 日志区域
         log_header_frame = ctk.CTkFrame(self)
         log_header_frame.grid(row=row, column=0, columnspan=3, padx=pad_x, pady=(10, 5), sticky="ew")
@@ -386,7 +241,7 @@ class VideoDuetApp(ctk.CTk):
         self.log_text = ctk.CTkTextbox(self, height=250, width=900, wrap="word")
         self.log_text.grid(row=row, column=0, columnspan=3, padx=pad_x, pady=(0, 20))
         self.log_text.insert("end", f"✅ 初始化完成（{perf_info}）\n")
-        self.log_text.insert("end", "📌 提示：多线程优化提升批量总效率，单个视频速度已达硬件上限\n")
+        self.log_text.insert("end", "📌 提示：多进程并行提升批量总效率，单个视频速度已达硬件上限\n")
         self.log_text.insert("end", "📌 建议：生成前关闭后台程序，使用SSD存放视频文件\n")
 
         # 布局优化
@@ -394,7 +249,23 @@ class VideoDuetApp(ctk.CTk):
         self.on_mode_change()
         self.update_folder_labels()
 
+        # 后台探测可用编码器（结果缓存，只有首次或更换ffmpeg后才真正试编码）
+        threading.Thread(target=self.detect_encoder_background, daemon=True).start()
+
+        # psutil提示放在窗口创建后（避免导入模块时弹窗，子进程导入也不会弹出）
+        if not HAS_PSUTIL:
+            msgbox.showwarning("提示", "未安装psutil，建议执行 pip install psutil 以获得最佳性能！")
+
     # ========== 辅助函数 ==========
+    def detect_encoder_background(self):
+        """后台探测编码器并更新性能信息"""
+        available = detect_encoders()
+        encoder = select_encoder()
+        label = ENCODER_PROFILES[encoder]["label"]
+        perf_info = f"渲染引擎：{RENDER_BACKEND} | 编码器：{label} | 并发/单视频线程：自适应（物理核心 {CPU_PHYSICAL_CORES}）"
+        self.after(0, lambda: self.perf_label.configure(text=perf_info))
+        self.after(0, lambda: self.log(f"🔎 可用编码器：{', '.join(available) or '无'}，当前使用：{encoder}\n"))
+
     def add_divider(self, row):
         """添加分割线"""
         divider = ctk.CTkFrame(self, height=2, fg_color=("#333333", "#777777"))
@@ -453,8 +324,8 @@ class VideoDuetApp(ctk.CTk):
     def on_close(self):
         """关闭窗口"""
         self.save_config()
-        if self.executor:
-            self.executor.shutdown(wait=False)
+        if self.runner:
+            self.runner.cancel()
         self.destroy()
 
     def shorten_path(self, path, count=0):
@@ -481,11 +352,15 @@ class VideoDuetApp(ctk.CTk):
             text_color="black" if self.output_folder else "gray"
         )
 
+        # 后台预热元数据缓存（只对新增/修改过的视频运行ffprobe，下次打开无需等待）
+        paths = [os.path.join(self.folder_a, f) for f in self.get_video_files(self.folder_a)]
+        paths += [os.path.join(self.folder_b, f) for f in self.get_video_files(self.folder_b)]
+        if paths:
+            threading.Thread(target=probe_videos, args=(paths,), daemon=True).start()
+
     def get_video_files(self, folder):
         """获取视频文件列表"""
-        if not folder or not os.path.isdir(folder):
-            return []
-        return [f for f in os.listdir(folder) if f.lower().endswith(('.mp4', '.mov', '.avi', '.mkv'))]
+        return list_video_files(folder)
 
     def update_overlap_label(self, val):
         """更新蒙板宽度标签"""
@@ -527,7 +402,7 @@ class VideoDuetApp(ctk.CTk):
 
     # ========== 生成逻辑 ==========
     def start_generation(self):
-        """开始生成（多线程并行）"""
+        """开始生成（多进程并行）"""
         # 基础校验
         if not self.folder_a or not self.folder_b or not self.output_folder:
             self.log("❌ 请先选择所有文件夹！\n")
@@ -585,7 +460,7 @@ class VideoDuetApp(ctk.CTk):
         self.btn_cancel.configure(state="normal")
         self.progress_bar.set(0)
         self.task_start_time = time.time()
-        self.log(f"🚀 开始极速生成（模式：{self.mode_var.get()}，并行线程数：{CPU_PHYSICAL_CORES}）\n")
+        self.log(f"🚀 开始极速生成（模式：{self.mode_var.get()}，并发数按CPU/内存自适应）\n")
         self.log(f"⏱️ 任务开始时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
 
         # 启动后台线程
@@ -596,83 +471,64 @@ class VideoDuetApp(ctk.CTk):
     def cancel_generation(self):
         """取消生成"""
         self.is_cancelled = True
-        self.log("🛑 正在取消所有线程，请等待当前任务完成...\n")
-        if self.executor:
-            self.executor.shutdown(wait=False)
-
-    def generate_videos(self):
-        """多线程核心生成逻辑"""
-        try:
-            os.makedirs(self.output_folder, exist_ok=True)
+        self.log("🛑 正在取消所有进程，请等待当前任务完成...\n")
+        if self.runner:
+            self.runner.cancel()
+
+    def handle_runner_event(self, event):
+        """主线程处理运行器事件：逐帧进度、任务完成、批次开始"""
+        if event["type"] == "progress":
+            self.handle_progress_event(event)
+            self.refresh_progress()
+        elif event["type"] == "job_done":
+            self.batch_completed = event["completed"]
+            self.finish_job_progress(event["job"])
+        elif event["type"] == "batch_start":
+            self.batch_total = event["total"]
+            self.batch_completed = event["skipped"]
+            self.refresh_progress()
+
+    def handle_progress_event(self, event):
+        """记录单个任务的进度事件（完成的任务由结果统计负责计数）"""
+        if event["stage"] == "done":
+            self.job_progress.pop(event["job"], None)
+        else:
+            self.job_progress[event["job"]] = (event["fraction"], event["fps"])
 
-            # 获取视频列表
-            videos_a = [os.path.join(self.folder_a, f) for f in self.get_video_files(self.folder_a)]
-            videos_b = [os.path.join(self.folder_b, f) for f in self.get_video_files(self.folder_b)]
-            count_a = len(videos_a)
-            count_b = len(videos_b)
+    def finish_job_progress(self, job_name):
+        """任务结束（成功或失败）后移出进行中列表并刷新进度"""
+        self.job_progress.pop(job_name, None)
+        self.refresh_progress()
 
-            # 生成配对列表
-            pairs = []
-            total = 0
-            time_prefix = datetime.now().strftime("%Y%m%d_%H%M%S_")
+    def refresh_progress(self):
+        """按 已完成数 + 进行中任务的完成比例 更新进度条和状态栏"""
+        if not self.batch_total:
+            return
+        partial = sum(fraction for fraction, _ in self.job_progress.values())
+        self.progress_bar.set(min(1.0, (self.batch_completed + partial) / self.batch_total))
+        total_fps = sum(fps for _, fps in self.job_progress.values())
+        self.status_label.configure(
+            text=f"已完成 {self.batch_completed}/{self.batch_total} | 渲染中 {len(self.job_progress)} 个 | 总编码速度 {total_fps:.0f} fps"
+        )
 
-            # 分模式处理
-            if self.mode_var.get() == "随机模式":
-                n_value = int(self.num_generate.get())
-                selected_a = random.choices(videos_a, k=n_value)
-                selected_b = random.choices(videos_b, k=n_value)
-                pairs = list(zip(selected_a, selected_b))
-                total = n_value
-                self.log(f"🎲 随机模式：将并行生成 {total} 个视频\n")
-
-            elif self.mode_var.get() == "穷举模式":
-                pairs = [(a, b) for a in videos_a for b in videos_b]
-                total = len(pairs)
-                self.log(f"🔍 穷举模式：将并行生成 {total} 个视频\n")
-
-            elif self.mode_var.get() == "1vN模式":
-                n_value = int(self.num_generate.get())
-                total = count_a * n_value
-                self.log(f"🎯 1vN模式：将并行生成 {total} 个视频\n")
-                for a_file in videos_a:
-                    selected_b = random.sample(videos_b, k=n_value)
-                    for b_file in selected_b:
-                        pairs.append((a_file, b_file))
-
-            # 准备任务参数（新增：生成唯一文件名，避免重复）
-            audio_source = self.audio_var.get()
-            duration_source = self.duration_var.get()
-            overlap_pixels = self.overlap_var.get()
-            task_args = []
-
-            for a_file, b_file in pairs:
-                # 生成唯一哈希值，避免文件名过长/重复
-                a_hash = hashlib.md5(a_file.encode()).hexdigest()[:16]
-                b_hash = hashlib.md5(b_file.encode()).hexdigest()[:16]
-                output_file = os.path.join(
-                    self.output_folder,
-                    f"{time_prefix}{a_hash}_{b_hash}.mp4"
-                )
-                task_args.append((a_file, b_file, output_file, audio_source, duration_source, overlap_pixels))
-
-            # 关键修改3：使用ThreadPoolExecutor替换ProcessPoolExecutor（核心修复多窗口问题）
-            completed = 0
-            self.executor = ThreadPoolExecutor(max_workers=CPU_PHYSICAL_CORES)  # 线程池不会复制GUI
-            future_to_task = {self.executor.submit(process_single_pair, args): args for args in task_args}
-
-            # 遍历完成的任务
-            for future in as_completed(future_to_task):
-                if self.is_cancelled:
-                    break
-
-                try:
-                    success, a_file, b_file, log_msg = future.result()
-                    self.log(log_msg)
-                    completed += 1
-                    # 更新进度条（线程安全）
-                    self.after(0, lambda p=completed/total: self.progress_bar.set(p))
-                except Exception as e:
-                    self.log(f"❌ 线程执行错误：{str(e)}\n")
+    def generate_videos(self):
+        """多进程核心生成逻辑（运行器在后台线程执行，日志和事件转回主线程显示）"""
+        try:
+            spec = {
+                "folder_a": self.folder_a, "folder_b": self.folder_b, "output_folder": self.output_folder,
+                "mode": self.mode_var.get(), "num_generate": self.num_generate.get(),
+                "audio_source": self.audio_var.get(), "duration_source": self.duration_var.get(),
+                "overlap_pixels": self.overlap_var.get()
+            }
+            self.job_progress = {}
+            self.batch_total = 0
+            self.batch_completed = 0
+            self.runner = DuetBatchRunner(
+                spec,
+                log_callback=lambda msg: self.after(0, self.log, msg),
+                event_callback=lambda event: self.after(0, self.handle_runner_event, event)
+            )
+            summary = self.runner.run()
 
             # 计算总耗时
             if self.task_start_time:
@@ -688,10 +544,12 @@ class VideoDuetApp(ctk.CTk):
                     self.log(f"📊 任务总执行时间：{seconds}秒\n")
 
             # 完成提示
-            if not self.is_cancelled:
+            total = summary["total"]
+            if not summary["cancelled"]:
                 self.log(f"🎉 全部{total}个视频生成完成！\n")
             else:
-                self.log(f"🛑 生成已取消，完成 {completed}/{total} 个视频\n")
+                finished = summary["skipped"] + summary["completed"] + summary["failed"]
+                self.log(f"🛑 生成已取消，完成 {finished}/{total} 个视频\n")
 
         except Exception as e:
             self.log(f"❌ 生成过程出错：{str(e)}\n")
@@ -704,12 +562,12 @@ class VideoDuetApp(ctk.CTk):
         finally:
             # 恢复状态
             self.is_running = False
-            self.executor = None
+            self.runner = None
             self.after(0, lambda: self.btn_start.configure(state="normal"))
             self.after(0, lambda: self.btn_cancel.configure(state="disabled"))
 
 # ========== 主程序入口（关键修改4：严格隔离GUI代码，避免子进程执行） ==========
 if __name__ == "__main__":
-    # 仅主进程执行GUI创建，子线程/子进程不会执行这段代码
+    # 仅主进程执行GUI创建，spawn子进程以__mp_main__导入本文件，不会执行这段代码
     app = VideoDuetApp()
     app.mainloop()
\ No newline at end of file
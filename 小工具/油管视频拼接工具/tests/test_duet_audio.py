@@ -0,0 +1,56 @@
+from duet_worker import plan_audio, build_audio_args, make_audio_concat_input
+
+
+def info(duration, codec="aac", has_audio=True):
+    return {"duration": duration, "has_audio": has_audio, "audio_codec": codec}
+
+
+def test_plan_audio_copy_when_source_is_duration_basis():
+    # 音频来自基准视频：时长正好，直接复制
+    assert plan_audio(info(10), info(5), "A 的音频", "A 的时长") == "copy"
+    assert plan_audio(info(10), info(5), "B 的音频", "B 的时长") == "copy"
+
+
+def test_plan_audio_copy_trims_longer_source():
+    # 音频来自非基准视频但更长：复制后由 -t 裁剪
+    assert plan_audio(info(5), info(10), "B 的音频", "A 的时长") == "copy"
+
+
+def test_plan_audio_loops_shorter_source():
+    assert plan_audio(info(10), info(4), "B 的音频", "A 的时长") == "loop"
+    assert plan_audio(info(4), info(10), "A 的音频", "B 的时长") == "loop"
+
+
+def test_plan_audio_reencodes_incompatible_or_unknown_codec():
+    assert plan_audio(info(10, "opus"), info(5), "A 的音频", "A 的时长") == "encode"
+    assert plan_audio(info(10, None), info(5), "A 的音频", "A 的时长") == "encode"
+    # 时长未知时无法计算循环次数
+    assert plan_audio(info(0), info(5), "A 的音频", "B 的时长") == "encode"
+
+
+def test_plan_audio_without_audio_track():
+    assert plan_audio(info(10, has_audio=False), info(5), "A 的音频", "A 的时长") is None
+
+
+def test_audio_concat_input_repeats_source(tmp_path):
+    list_file = str(tmp_path / "audio.txt")
+    source = str(tmp_path / "it's.mp4")
+    args = make_audio_concat_input(source, 4.0, 10.0, list_file)
+    assert args == ["-f", "concat", "-safe", "0", "-i", list_file]
+    with open(list_file, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    # ceil(10/4)+1 份，单引号按concat格式转义
+    assert len(lines) == 4
+    assert lines[0] == "file '" + source.replace("'", "'\\''") + "'"
+
+
+def test_build_audio_args(tmp_path):
+    list_file = str(tmp_path / "audio.txt")
+    assert build_audio_args(None, "a.mp4", info(10), False, 10, list_file, 1) == ([], [])
+    assert build_audio_args("copy", "a.mp4", info(10), False, 10, list_file, 1) == \
+        (["-i", "a.mp4"], ["-map", "1:a:0", "-c:a", "copy"])
+    inputs, outputs = build_audio_args("encode", "a.mp4", info(10, "opus"), True, 20, list_file, 1)
+    assert inputs == ["-stream_loop", "-1", "-i", "a.mp4"]
+    assert outputs == ["-map", "1:a:0", "-c:a", "aac", "-b:a", "128k"]
+    inputs, outputs = build_audio_args("loop", "a.mp4", info(4), True, 10, list_file, 2)
+    assert inputs[-2:] == ["-i", list_file] and outputs == ["-map", "2:a:0", "-c:a", "copy"]
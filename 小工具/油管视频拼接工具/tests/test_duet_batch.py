@@ -0,0 +1,88 @@
+import os
+
+from duet_batch import (PART_SUFFIX, make_job_id, make_batch_signature, get_resumable_pairs, plan_jobs,
+                        finish_job)
+
+SETTINGS = {"mode": "随机模式", "n_value": 2}
+
+
+def make_job(tmp_path, status="pending"):
+    return {"job_id": "j1", "a_file": "a.mp4", "b_file": "b.mp4", "output_file": str(tmp_path / "out.mp4"),
+            "status": status, "error": "", "size": 0, "duration": 0}
+
+
+def test_make_job_id_is_stable_and_parameter_sensitive(tmp_path, monkeypatch):
+    job_id = make_job_id("a.mp4", "b.mp4", "A 的音频", "A 的时长", 135)
+    assert job_id == make_job_id("a.mp4", "b.mp4", "A 的音频", "A 的时长", 135.0)
+    # 相对路径按绝对路径计算
+    monkeypatch.chdir(tmp_path)
+    assert job_id != make_job_id("a.mp4", "b.mp4", "A 的音频", "A 的时长", 135)
+    assert make_job_id(str(tmp_path / "a.mp4"), str(tmp_path / "b.mp4"), "A 的音频", "A 的时长", 135) == \
+        make_job_id("a.mp4", "b.mp4", "A 的音频", "A 的时长", 135)
+    assert len({job_id, make_job_id("b.mp4", "a.mp4", "A 的音频", "A 的时长", 135),
+                make_job_id("a.mp4", "b.mp4", "B 的音频", "A 的时长", 135),
+                make_job_id("a.mp4", "b.mp4", "A 的音频", "B 的时长", 135),
+                make_job_id("a.mp4", "b.mp4", "A 的音频", "A 的时长", 100)}) == 5
+
+
+def test_get_resumable_pairs(tmp_path):
+    manifest = {"jobs": {}, "last_batch": {}}
+    assert get_resumable_pairs(manifest, SETTINGS) is None
+
+    pairs = [("a1.mp4", "b1.mp4"), ("a2.mp4", "b2.mp4")]
+    jobs = plan_jobs(manifest, pairs, str(tmp_path), SETTINGS, "A 的音频", "A 的时长", 135)
+    assert manifest["last_batch"]["signature"] == make_batch_signature(SETTINGS)
+    assert get_resumable_pairs(manifest, SETTINGS) == pairs
+    # 参数不同不续跑
+    assert get_resumable_pairs(manifest, dict(SETTINGS, n_value=3)) is None
+
+    jobs[0]["status"] = "done"
+    assert get_resumable_pairs(manifest, SETTINGS) == pairs
+    jobs[1]["status"] = "done"
+    assert get_resumable_pairs(manifest, SETTINGS) is None
+
+    # 清单中缺失任务记录时不续跑
+    jobs[1]["status"] = "failed"
+    del manifest["jobs"][jobs[0]["job_id"]]
+    assert get_resumable_pairs(manifest, SETTINGS) is None
+
+
+def test_finish_job_success_renames_part_file(tmp_path):
+    job = make_job(tmp_path, "running")
+    with open(job["output_file"] + PART_SUFFIX, "wb") as f:
+        f.write(b"x" * 100)
+    finish_job(job, True, probe=lambda path: {"duration": 12.5})
+    assert job["status"] == "done" and job["error"] == ""
+    assert job["size"] == 100 and job["duration"] == 12.5
+    assert os.path.exists(job["output_file"])
+    assert not os.path.exists(job["output_file"] + PART_SUFFIX)
+    assert job["finished_at"]
+
+
+def test_finish_job_uses_given_temp_file(tmp_path):
+    job = make_job(tmp_path, "running")
+    temp_file = str(tmp_path / "out.worker_1.part.mp4")
+    other = job["output_file"] + PART_SUFFIX
+    for path in (temp_file, other):
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+    finish_job(job, True, temp_file=temp_file)
+    assert job["status"] == "done" and os.path.exists(job["output_file"])
+    # 其他工作进程的临时文件不受影响
+    assert os.path.exists(other)
+
+
+def test_finish_job_failure_removes_part_file(tmp_path):
+    job = make_job(tmp_path, "running")
+    with open(job["output_file"] + PART_SUFFIX, "wb") as f:
+        f.write(b"partial")
+    finish_job(job, False, "编码失败")
+    assert job["status"] == "failed" and job["error"] == "编码失败"
+    assert not os.path.exists(job["output_file"] + PART_SUFFIX)
+    assert not os.path.exists(job["output_file"])
+
+
+def test_finish_job_success_without_part_file_is_failure(tmp_path):
+    job = make_job(tmp_path, "running")
+    finish_job(job, True)
+    assert job["status"] == "failed" and job["error"] == "渲染失败"
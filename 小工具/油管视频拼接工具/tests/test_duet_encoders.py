@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+import duet_worker
+from duet_worker import ENCODER_PROFILES, detect_encoders, select_encoder
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """假的ffmpeg可执行文件 + 记录试编码调用的test_encoder（无需GPU和ffmpeg）"""
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_bytes(b"v1")
+    probes = []
+    working = {"h264_qsv", "libx264"}
+
+    def fake_test_encoder(encoder, ffmpeg_bin=None):
+        probes.append(encoder)
+        return encoder in working
+
+    monkeypatch.setattr(duet_worker, "get_ffmpeg_binary", lambda: str(ffmpeg))
+    monkeypatch.setattr(duet_worker, "test_encoder", fake_test_encoder)
+    monkeypatch.setattr(duet_worker, "_available_encoders", None)
+    return ffmpeg, probes, working
+
+
+def test_detect_encoders_probes_once_and_writes_cache(tmp_path, fake_ffmpeg):
+    _, probes, _ = fake_ffmpeg
+    cache_file = str(tmp_path / "encoders.json")
+    assert detect_encoders(cache_file=cache_file) == ["h264_qsv", "libx264"]
+    assert probes == list(ENCODER_PROFILES)
+    with open(cache_file, encoding="utf-8") as f:
+        assert json.load(f)["encoders"] == ["h264_qsv", "libx264"]
+
+    # 进程内直接复用
+    assert detect_encoders(cache_file=cache_file) == ["h264_qsv", "libx264"]
+    assert len(probes) == len(ENCODER_PROFILES)
+
+
+def test_detect_encoders_reuses_cache_across_processes(tmp_path, fake_ffmpeg, monkeypatch):
+    _, probes, working = fake_ffmpeg
+    cache_file = str(tmp_path / "encoders.json")
+    detect_encoders(cache_file=cache_file)
+    probes.clear()
+    working.clear()
+
+    # 模拟新进程：内存中没有结果，同一个ffmpeg读取缓存文件，不再试编码
+    monkeypatch.setattr(duet_worker, "_available_encoders", None)
+    assert detect_encoders(cache_file=cache_file) == ["h264_qsv", "libx264"]
+    assert probes == []
+
+    # force 忽略缓存重新探测
+    assert detect_encoders(force=True, cache_file=cache_file) == []
+    assert probes == list(ENCODER_PROFILES)
+
+
+def test_detect_encoders_reprobes_when_ffmpeg_changes(tmp_path, fake_ffmpeg, monkeypatch):
+    ffmpeg, probes, working = fake_ffmpeg
+    cache_file = str(tmp_path / "encoders.json")
+    detect_encoders(cache_file=cache_file)
+    probes.clear()
+    working.discard("h264_qsv")
+
+    # 换了ffmpeg（文件大小变化）后指纹不同，缓存失效
+    ffmpeg.write_bytes(b"version 2")
+    monkeypatch.setattr(duet_worker, "_available_encoders", None)
+    assert detect_encoders(cache_file=cache_file) == ["libx264"]
+    assert probes == list(ENCODER_PROFILES)
+
+
+def test_detect_encoders_ignores_corrupt_cache(tmp_path, fake_ffmpeg):
+    _, probes, _ = fake_ffmpeg
+    cache_file = tmp_path / "encoders.json"
+    cache_file.write_text("{not json", encoding="utf-8")
+    assert detect_encoders(cache_file=str(cache_file)) == ["h264_qsv", "libx264"]
+    assert probes == list(ENCODER_PROFILES)
+
+
+def test_select_encoder_priority_and_fallback(monkeypatch):
+    available = []
+    monkeypatch.setattr(duet_worker, "detect_encoders", lambda: available)
+    # 没有任何编码器通过试编码时兜底libx264
+    assert select_encoder("auto") == "libx264"
+    available[:] = ["libx264", "h264_qsv"]
+    assert select_encoder("auto") == "h264_qsv"
+    # 未知名称按自动选择处理
+    assert select_encoder("h265_magic") == "h264_qsv"
+    # 显式指定时不探测
+    available[:] = []
+    assert select_encoder("libx265") == "libx265"
+
+
+def test_select_encoder_libx264_path_without_ffmpeg(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(duet_worker, "get_ffmpeg_binary", lambda: str(tmp_path / "missing-ffmpeg"))
+    monkeypatch.setattr(duet_worker, "test_encoder", lambda encoder, ffmpeg_bin=None: False)
+    monkeypatch.setattr(duet_worker, "_available_encoders", None)
+    assert select_encoder("auto") == "libx264"
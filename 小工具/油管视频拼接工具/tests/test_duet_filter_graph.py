@@ -0,0 +1,69 @@
+from duet_worker import compute_crop_size, build_duet_filter_graph
+
+LANDSCAPE = {"width": 1920, "height": 1080, "duration": 10.0, "fps": 30, "has_audio": True, "audio_codec": "aac"}
+PORTRAIT = {"width": 1080, "height": 1920, "duration": 6.0, "fps": 25, "has_audio": False, "audio_codec": None}
+
+
+def chain(graph, prefix):
+    return next(part for part in graph.split(";") if part.startswith(prefix))
+
+
+def test_compute_crop_size():
+    # 横屏居中裁成9:16
+    assert compute_crop_size(1920, 1080) == (656, 0, 607, 1080, 607)
+    # 接近9:16时不裁剪，只缩放到1080高
+    assert compute_crop_size(1080, 1920) == (0, 0, 1080, 1920, 607)
+    # 过窄的竖屏裁掉上下
+    assert compute_crop_size(720, 1920) == (0, 320, 720, 1280, 607)
+
+
+def test_filter_graph_geometry_and_masks():
+    graph, duration, fps, audio_label, logs = build_duet_filter_graph(
+        LANDSCAPE, PORTRAIT, "A 的音频", "A 的时长", 135)
+    assert (duration, fps, audio_label) == (10.0, 30, "outa")
+    assert chain(graph, "[0:v]").startswith("[0:v]crop=607:1080:656:0,scale=607:1080,trim=duration=10.000000")
+    assert chain(graph, "[1:v]").startswith("[1:v]crop=1080:1920:0:0,scale=607:1080,")
+    # 总宽 2*607-135=1079，左图x=0，右图x=607-135
+    assert "[bg][a0]overlay=x=0:y=0:shortest=1[tmp]" in graph
+    assert "[tmp][a1]overlay=x=472:y=0:shortest=1,format=yuv420p[outv]" in graph
+    # 左图右侧淡出、右图左侧淡入，渐变宽度等于重叠像素
+    assert "geq=lum='if(gte(X,472),255*(1-(X-472)/134),255)'" in graph
+    assert "geq=lum='if(lt(X,135),255*X/134,255)'" in graph
+    assert "[0:a]atrim=duration=10.000000,asetpts=PTS-STARTPTS[outa]" in graph
+    assert any("循环" in msg for msg in logs)
+
+
+def test_filter_graph_without_overlap_has_no_masks():
+    graph = build_duet_filter_graph(LANDSCAPE, PORTRAIT, "A 的音频", "A 的时长", 0)[0]
+    assert "alphamerge" not in graph and "geq" not in graph
+    # 两图并排居中：(1080-1214)/2 向零取整
+    assert "[bg][v0]overlay=x=-67:y=0" in graph
+    assert "[tmp][v1]overlay=x=540:y=0" in graph
+
+
+def test_filter_graph_clamps_overlap_to_clip_width():
+    graph = build_duet_filter_graph(LANDSCAPE, PORTRAIT, "A 的音频", "A 的时长", 5000)[0]
+    assert "overlay=x=236:y=0:shortest=1[tmp]" in graph
+    assert "overlay=x=236:y=0:shortest=1,format=yuv420p[outv]" in graph
+
+
+def test_filter_graph_duration_source_and_audio():
+    graph, duration, fps, audio_label, logs = build_duet_filter_graph(
+        LANDSCAPE, PORTRAIT, "B 的音频", "B 的时长", 135)
+    assert duration == 6.0 and fps == 30
+    # B没有音轨
+    assert audio_label is None and "[1:a]" not in graph
+    assert any("裁剪" in msg for msg in logs)
+
+    graph, _, _, audio_label, _ = build_duet_filter_graph(
+        LANDSCAPE, PORTRAIT, "A 的音频", "A 的时长", 135, encode_audio=False)
+    assert audio_label is None and "atrim" not in graph
+
+
+def test_filter_graph_segment_length_trims_video_only():
+    graph, duration, _, _, _ = build_duet_filter_graph(
+        LANDSCAPE, PORTRAIT, "A 的音频", "A 的时长", 135, segment_length=2.5)
+    assert duration == 10.0
+    assert "color=c=black:s=1080x1080:r=30:d=2.500000[bg]" in graph
+    assert "trim=duration=2.500000" in chain(graph, "[0:v]")
+    assert "atrim=duration=10.000000" in graph
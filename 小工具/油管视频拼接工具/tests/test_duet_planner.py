@@ -0,0 +1,69 @@
+import os
+import random
+
+import pytest
+
+import duet_planner
+from duet_planner import sample_random_pairs, sample_one_vs_n_pairs, make_pairs
+
+VIDEOS_A = [f"a{i}.mp4" for i in range(5)]
+VIDEOS_B = [f"b{i}.mp4" for i in range(4)]
+
+
+def history_of(pairs):
+    return frozenset((os.path.abspath(a), os.path.abspath(b)) for a, b in pairs)
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(1234)
+
+
+def test_random_pairs_have_no_duplicates():
+    for n_value in (1, 7, 20):
+        pairs, reused = sample_random_pairs(VIDEOS_A, VIDEOS_B, n_value)
+        assert len(pairs) == n_value == len(set(pairs))
+        assert reused == 0
+
+
+def test_random_pairs_capped_at_all_combinations():
+    logs = []
+    pairs = make_pairs("随机模式", VIDEOS_A, VIDEOS_B, 50, log_callback=logs.append)
+    assert sorted(pairs) == sorted((a, b) for a in VIDEOS_A for b in VIDEOS_B)
+    assert any("20" in msg for msg in logs)
+
+
+def test_random_pairs_prefer_new_pairs_over_history():
+    done = [(a, b) for a in VIDEOS_A for b in VIDEOS_B][:15]
+    pairs, reused = sample_random_pairs(VIDEOS_A, VIDEOS_B, 5, history_of(done))
+    assert set(pairs).isdisjoint(done) and reused == 0
+
+    pairs, reused = sample_random_pairs(VIDEOS_A, VIDEOS_B, 8, history_of(done))
+    assert len(set(pairs)) == 8 and reused == 3
+
+
+def test_random_pairs_rejection_sampling_has_no_duplicates(monkeypatch):
+    monkeypatch.setattr(duet_planner, "ENUMERATE_LIMIT", 0)
+    pairs, _ = sample_random_pairs(VIDEOS_A, VIDEOS_B, 15)
+    assert len(pairs) == 15 == len(set(pairs))
+
+
+def test_one_vs_n_pairs_distinct_and_balanced():
+    pairs, reused = sample_one_vs_n_pairs(VIDEOS_A, VIDEOS_B, 2)
+    assert reused == 0 and len(pairs) == 10
+    for a_file in VIDEOS_A:
+        chosen = [b for a, b in pairs if a == a_file]
+        assert len(chosen) == len(set(chosen)) == 2
+    usage = [sum(1 for _, b in pairs if b == b_file) for b_file in VIDEOS_B]
+    assert max(usage) - min(usage) <= 1
+
+
+def test_one_vs_n_pairs_prefer_unused_b():
+    done = [("a0.mp4", "b0.mp4"), ("a0.mp4", "b1.mp4")]
+    pairs, reused = sample_one_vs_n_pairs(["a0.mp4"], VIDEOS_B, 2, history_of(done))
+    assert sorted(b for _, b in pairs) == ["b2.mp4", "b3.mp4"] and reused == 0
+
+
+def test_make_pairs_unknown_mode():
+    with pytest.raises(ValueError):
+        make_pairs("未知模式", VIDEOS_A, VIDEOS_B, 1)
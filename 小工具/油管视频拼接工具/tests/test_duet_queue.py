@@ -0,0 +1,194 @@
+import time
+import queue
+import sqlite3
+import threading
+import multiprocessing
+
+import pytest
+
+import duet_queue
+from duet_queue import DuetJobQueue, MAX_ATTEMPTS, sync_manifests
+from duet_batch import save_manifest, load_manifest
+
+
+def make_item(tmp_path, job_id):
+    return {"job": {"job_id": job_id, "output_file": str(tmp_path / f"{job_id}.mp4")},
+            "args": ["a.mp4", "b.mp4", str(tmp_path / f"{job_id}.mp4.part.mp4"), "A 的音频", "A 的时长", 135],
+            "infos": [None, None], "encoder": "libx264"}
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    q = DuetJobQueue(str(tmp_path / "queue.db"))
+    yield q
+    q.close()
+
+
+def test_claim_prefers_pending_then_reclaims_expired_lease(tmp_path, job_queue):
+    assert job_queue.publish([make_item(tmp_path, "j1"), make_item(tmp_path, "j2")]) == 2
+    # w1 的租约立即过期（模拟工作进程崩溃）
+    assert job_queue.claim("w1", lease_seconds=-1)[0] == "j1"
+    assert job_queue.claim("w2")[0] == "j2"
+    assert job_queue.claim("w3")[0] == "j1"
+    assert job_queue.claim("w4") is None
+    # 原持有者的心跳和结果都不再生效
+    assert not job_queue.heartbeat("j1", "w1")
+    assert not job_queue.complete("j1", "w1", True)
+    assert job_queue.heartbeat("j1", "w3")
+    assert job_queue.complete("j1", "w3", True, {"status": "done"})
+    assert job_queue.counts() == {"pending": 0, "leased": 1, "done": 1, "failed": 0}
+
+
+def test_expired_lease_fails_after_max_attempts(tmp_path, job_queue):
+    job_queue.publish([make_item(tmp_path, "j1")])
+    for attempt in range(MAX_ATTEMPTS):
+        assert job_queue.claim(f"w{attempt}", lease_seconds=-1)[0] == "j1"
+    assert job_queue.claim("late") is None
+    assert job_queue.counts()["failed"] == 1
+
+
+def test_failed_render_is_requeued_until_max_attempts(tmp_path, job_queue):
+    job_queue.publish([make_item(tmp_path, "j1")])
+    for attempt in range(MAX_ATTEMPTS):
+        job_queue.claim("w1")
+        job_queue.complete("j1", "w1", False, error="boom")
+    assert job_queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+    # 重新发布时失败任务重置为待领取
+    assert job_queue.publish([make_item(tmp_path, "j1")]) == 1
+
+
+def test_finished_jobs_use_sequence_not_worker_clock(tmp_path, job_queue, monkeypatch):
+    job_queue.publish([make_item(tmp_path, "j1"), make_item(tmp_path, "j2")])
+    job_queue.claim("fast-clock")
+    job_queue.complete("j1", "fast-clock", True, {"status": "done"})
+    since = max(row[5] for row in job_queue.finished_jobs(0))
+    # 另一台机器的时钟慢了一小时
+    real_time = duet_queue.time.time
+    monkeypatch.setattr(duet_queue.time, "time", lambda: real_time() - 3600)
+    job_queue.claim("slow-clock")
+    job_queue.complete("j2", "slow-clock", True, {"status": "done"})
+    assert [row[0] for row in job_queue.finished_jobs(since)] == ["j2"]
+
+
+def test_sync_manifests_writes_results_incrementally(tmp_path, job_queue):
+    save_manifest(str(tmp_path), {"jobs": {"j1": {"status": "running"}, "j2": {"status": "running"}}})
+    job_queue.publish([make_item(tmp_path, "j1"), make_item(tmp_path, "j2")])
+    job_queue.claim("w1")
+    job_queue.complete("j1", "w1", True, {"status": "done", "size": 10})
+    since = sync_manifests(job_queue)
+    assert load_manifest(str(tmp_path))["jobs"]["j1"] == {"status": "done", "size": 10}
+    assert sync_manifests(job_queue, since) == since
+    for _ in range(MAX_ATTEMPTS):
+        job_queue.claim("w1")
+        job_queue.complete("j2", "w1", False, error="boom")
+    assert sync_manifests(job_queue, since) > since
+    assert load_manifest(str(tmp_path))["jobs"]["j2"] == {"status": "failed", "error": "boom"}
+
+
+def test_old_queue_file_gets_version_column(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(duet_queue.SCHEMA.replace(",\n    version INTEGER NOT NULL DEFAULT 0", ""))
+    conn.execute("INSERT INTO jobs (job_id, output_folder, payload, status) VALUES ('j1', '.', '{}', 'done')")
+    conn.commit()
+    conn.close()
+    job_queue = DuetJobQueue(path)
+    try:
+        assert [row[0] for row in job_queue.finished_jobs(0)] == ["j1"]
+    finally:
+        job_queue.close()
+
+
+def test_worker_process_exit_code_reflects_failures(monkeypatch):
+    monkeypatch.setattr(duet_queue, "run_worker", lambda *args: 2)
+    with pytest.raises(SystemExit) as exc:
+        duet_queue.run_worker_process("q.db", 0, None, False)
+    assert exc.value.code == 1
+    monkeypatch.setattr(duet_queue, "run_worker", lambda *args: 0)
+    with pytest.raises(SystemExit) as exc:
+        duet_queue.run_worker_process("q.db", 0, None, False)
+    assert exc.value.code == 0
+
+
+class ThreadProcess:
+    """用线程模拟渲染子进程（不真的spawn，也不能被killpg）"""
+
+    def __init__(self, target, args):
+        self.thread = threading.Thread(target=target, args=args, daemon=True)
+        self.pid = None
+        self.exitcode = None
+
+    def start(self):
+        self.pid = -1
+        self.thread.start()
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.exitcode = 0
+
+
+class ThreadContext:
+    Queue = queue.Queue
+
+    def Pipe(self, duplex=True):
+        return multiprocessing.Pipe(duplex)
+
+    def Process(self, target, args):
+        return ThreadProcess(target, args)
+
+
+@pytest.fixture
+def fake_render(tmp_path, monkeypatch):
+    logs, killed = [], []
+    monkeypatch.setattr(duet_queue.multiprocessing, "get_context", lambda method: ThreadContext())
+    monkeypatch.setattr(duet_queue, "select_encoder", lambda encoder=None: "libx264")
+    monkeypatch.setattr(duet_queue, "probe_video", lambda path: {"duration": 1.0})
+    monkeypatch.setattr(duet_queue, "emit_log", logs.append)
+    monkeypatch.setattr(duet_queue, "kill_process_tree", lambda process: killed.append(process))
+    return logs, killed
+
+
+def test_render_keeps_trailing_logs_after_result(tmp_path, job_queue, fake_render, monkeypatch):
+    logs, killed = fake_render
+
+    def child(args, infos, encoder, threads, log_queue, result_conn):
+        with open(args[2], "wb") as f:
+            f.write(b"video")
+        result_conn.send((True, args[0], args[1], "", None))
+        # 结果发出后子进程还在输出日志
+        time.sleep(0.3)
+        log_queue.put("最后一行日志\n")
+
+    monkeypatch.setattr(duet_queue, "render_job_process", child)
+    job_queue.publish([make_item(tmp_path, "j1")])
+    job_id, item = job_queue.claim("w1")
+    assert duet_queue.render_claimed_job(job_queue, "w1", job_id, item, 2, True) is True
+    assert killed == []
+    assert "[w1] 最后一行日志\n" in logs
+    assert job_queue.counts()["done"] == 1
+
+
+def test_render_kills_child_after_grace_period(tmp_path, job_queue, fake_render, monkeypatch):
+    logs, killed = fake_render
+    release = threading.Event()
+
+    def child(args, infos, encoder, threads, log_queue, result_conn):
+        with open(args[2], "wb") as f:
+            f.write(b"video")
+        result_conn.send((True, args[0], args[1], "", None))
+        release.wait(5)
+
+    monkeypatch.setattr(duet_queue, "render_job_process", child)
+    monkeypatch.setattr(duet_queue, "CHILD_EXIT_GRACE", 0.3)
+    monkeypatch.setattr(duet_queue, "kill_process_tree", lambda process: (killed.append(process), release.set()))
+    job_queue.publish([make_item(tmp_path, "j1")])
+    job_id, item = job_queue.claim("w1")
+    try:
+        assert duet_queue.render_claimed_job(job_queue, "w1", job_id, item, 2, False) is True
+        assert len(killed) == 1
+    finally:
+        release.set()
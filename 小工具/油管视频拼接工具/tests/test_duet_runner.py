@@ -0,0 +1,65 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import duet_runner
+from duet_runner import DuetBatchRunner
+from duet_batch import PART_SUFFIX, load_manifest, save_manifest
+
+
+class FakeManager:
+    def shutdown(self):
+        pass
+
+
+def make_runner(tmp_path, monkeypatch, job_count, render):
+    jobs = [{"job_id": f"j{i}", "a_file": "a.mp4", "b_file": "b.mp4", "output_file": str(tmp_path / f"j{i}.mp4"),
+             "status": "pending", "error": "", "size": 0, "duration": 0} for i in range(job_count)]
+    manifest = {"jobs": {job["job_id"]: job for job in jobs}, "last_batch": {}}
+    task_args = [(job, ("a.mp4", "b.mp4", job["output_file"] + PART_SUFFIX, "A 的音频", "A 的时长", 135))
+                 for job in jobs]
+    plan = {"manifest": manifest, "settings": {}, "jobs": jobs, "done_jobs": [], "task_args": task_args, "infos": {}}
+    monkeypatch.setattr(DuetBatchRunner, "plan", lambda self: plan)
+    monkeypatch.setattr(duet_runner, "select_encoder", lambda encoder=None: "libx264")
+    monkeypatch.setattr(duet_runner, "get_video_info", lambda path: {"duration": 1.0})
+    monkeypatch.setattr(duet_runner, "process_single_pair", render)
+    monkeypatch.setattr(duet_runner, "create_process_pool",
+                        lambda workers: (ThreadPoolExecutor(workers), FakeManager(), queue.Queue()))
+    save_manifest(str(tmp_path), manifest)
+    spec = {"output_folder": str(tmp_path), "encoder": "libx264", "max_workers": 2}
+    return DuetBatchRunner(spec)
+
+
+def test_cancel_only_sets_flag(tmp_path):
+    runner = DuetBatchRunner({"output_folder": str(tmp_path)})
+    runner.executor = object()
+    runner.cancel()
+    assert runner.cancelled.is_set()
+
+
+def test_cancel_waits_for_running_jobs_and_requeues_the_rest(tmp_path, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def render(args, log_queue, infos, encoder, threads):
+        started.set()
+        release.wait(5)
+        with open(args[2], "wb") as f:
+            f.write(b"video")
+        log_queue.put("done\n")
+        return (True, args[0], args[1], "", {})
+
+    runner = make_runner(tmp_path, monkeypatch, 5, render)
+    summary = {}
+    thread = threading.Thread(target=lambda: summary.update(runner.run()))
+    thread.start()
+    assert started.wait(5)
+    runner.cancel()
+    release.set()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert summary["cancelled"]
+    statuses = [job["status"] for job in load_manifest(str(tmp_path))["jobs"].values()]
+    assert "running" not in statuses
+    assert statuses.count("done") == summary["completed"] >= 1
+    assert statuses.count("pending") == 5 - summary["completed"]
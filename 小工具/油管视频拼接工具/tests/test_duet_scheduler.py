@@ -0,0 +1,106 @@
+import types
+
+import pytest
+
+import duet_scheduler
+from duet_scheduler import AdaptiveScheduler, HARDWARE_SESSION_LIMITS, JOB_MEMORY_MB
+
+MB = 1024 * 1024
+
+
+class FakePsutil:
+    """按测试设定返回CPU占用和内存状态"""
+
+    def __init__(self):
+        self.cpu = 50.0
+        self.memory_percent = 50.0
+        self.available_mb = 64 * 1024
+
+    def cpu_percent(self, interval=None):
+        return self.cpu
+
+    def virtual_memory(self):
+        return types.SimpleNamespace(percent=self.memory_percent, available=self.available_mb * MB)
+
+
+@pytest.fixture
+def fake_psutil(monkeypatch):
+    fake = FakePsutil()
+    monkeypatch.setattr(duet_scheduler, "HAS_PSUTIL", True)
+    monkeypatch.setattr(duet_scheduler, "psutil", fake, raising=False)
+    monkeypatch.setattr(duet_scheduler, "CPU_PHYSICAL_CORES", 16)
+    monkeypatch.setattr(duet_scheduler, "ADJUST_INTERVAL", 0)
+    return fake
+
+
+def test_hardware_session_limits(fake_psutil):
+    for encoder, limit in HARDWARE_SESSION_LIMITS.items():
+        scheduler = AdaptiveScheduler(encoder, "ffmpeg")
+        assert scheduler.max_concurrency == scheduler.concurrency == limit
+        # 硬件编码每个任务最多4个线程
+        assert scheduler.threads_per_job() == 4
+    assert AdaptiveScheduler("h264_nvenc", "ffmpeg", max_workers=2).max_concurrency == 2
+
+
+def test_software_limit_splits_cores(fake_psutil):
+    scheduler = AdaptiveScheduler("libx264", "ffmpeg")
+    assert scheduler.max_concurrency == 16 // duet_scheduler.MIN_THREADS_PER_JOB
+    assert scheduler.threads_per_job() == 16 // scheduler.concurrency
+
+
+def test_memory_budget_per_backend(fake_psutil):
+    fake_psutil.available_mb = 3000
+    for backend, job_mb in JOB_MEMORY_MB.items():
+        scheduler = AdaptiveScheduler("libx264", backend)
+        assert scheduler.job_memory_mb == job_mb
+        assert scheduler.concurrency == max(1, min(8, 3000 // job_mb))
+    # 源视频像素更多时按比例放大内存估算
+    scheduler = AdaptiveScheduler("libx264", "ffmpeg", source_pixels=3840 * 2160)
+    assert scheduler.job_memory_mb == JOB_MEMORY_MB["ffmpeg"] * 4
+    assert scheduler.concurrency == 1
+    # 未知引擎按最耗内存的moviepy估算
+    assert AdaptiveScheduler("libx264", "unknown").job_memory_mb == JOB_MEMORY_MB["moviepy"]
+
+
+def test_adjust_lowers_under_memory_pressure(fake_psutil):
+    scheduler = AdaptiveScheduler("libx264", "ffmpeg")
+    start = scheduler.concurrency
+    fake_psutil.memory_percent = duet_scheduler.MEMORY_HIGH_PERCENT + 5
+    assert "内存占用" in scheduler.adjust()
+    assert scheduler.concurrency == start - 1
+    scheduler.concurrency = 1
+    assert scheduler.adjust() is None and scheduler.concurrency == 1
+
+
+def test_adjust_raises_when_idle_up_to_limits(fake_psutil):
+    fake_psutil.available_mb = 1000  # 起步只够2个ffmpeg任务
+    scheduler = AdaptiveScheduler("libx264", "ffmpeg")
+    assert scheduler.concurrency == 2
+    fake_psutil.cpu = 40
+    fake_psutil.memory_percent = 40
+    assert scheduler.adjust() is None  # 可用内存仍不足
+    fake_psutil.available_mb = 64 * 1024
+    for expected in range(3, scheduler.max_concurrency + 1):
+        assert scheduler.adjust() is not None
+        assert scheduler.concurrency == expected
+    assert scheduler.adjust() is None  # 已到核心数上限
+
+
+def test_adjust_holds_when_busy_or_too_soon(fake_psutil, monkeypatch):
+    scheduler = AdaptiveScheduler("libx264", "ffmpeg")
+    scheduler.concurrency = 2
+    fake_psutil.memory_percent = 40
+    fake_psutil.cpu = duet_scheduler.CPU_TARGET_PERCENT + 5
+    assert scheduler.adjust() is None and scheduler.concurrency == 2
+    # 两次调整之间至少间隔ADJUST_INTERVAL
+    fake_psutil.cpu = 10
+    monkeypatch.setattr(duet_scheduler, "ADJUST_INTERVAL", 3600)
+    assert scheduler.adjust() is None and scheduler.concurrency == 2
+
+
+def test_without_psutil_never_adjusts(monkeypatch):
+    monkeypatch.setattr(duet_scheduler, "HAS_PSUTIL", False)
+    monkeypatch.setattr(duet_scheduler, "CPU_PHYSICAL_CORES", 8)
+    scheduler = AdaptiveScheduler("libx264", "ffmpeg")
+    assert scheduler.concurrency == scheduler.max_concurrency == 4
+    assert scheduler.adjust() is None
@@ -0,0 +1,106 @@
+import os
+import threading
+import types
+
+import pytest
+
+import duet_worker
+from duet_worker import render_segmented
+
+INFO_A = {"width": 1080, "height": 1920, "duration": 150.0, "fps": 30, "has_audio": True, "audio_codec": "aac"}
+INFO_B = {"width": 1080, "height": 1920, "duration": 50.0, "fps": 30, "has_audio": False, "audio_codec": None}
+
+
+def option(cmd, name, occurrence=0):
+    indices = [i for i, arg in enumerate(cmd) if arg == name]
+    return cmd[indices[occurrence] + 1]
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """记录每段编码命令和最终拼接命令（不调用ffmpeg）"""
+    calls = {"segments": [], "concat": None, "concat_list": None, "fail": set()}
+    lock = threading.Lock()
+
+    def fake_run_with_progress(cmd, duration, progress_callback):
+        frames = int(option(cmd, "-frames:v"))
+        with lock:
+            calls["segments"].append(cmd)
+        index = int(os.path.basename(cmd[-1]).split(".")[0])
+        if index in calls["fail"]:
+            return 1, "编码器错误", 0
+        progress_callback("encode", frame=frames, speed=2.0, fraction=1.0)
+        return 0, "", frames
+
+    def fake_subprocess_run(cmd, **kwargs):
+        calls["concat"] = cmd
+        with open(option(cmd, "-i"), encoding="utf-8") as f:
+            calls["concat_list"] = f.read().splitlines()
+        return types.SimpleNamespace(returncode=0, stderr="")
+
+    monkeypatch.setattr(duet_worker, "get_ffmpeg_binary", lambda: "ffmpeg")
+    monkeypatch.setattr(duet_worker, "run_ffmpeg_with_progress", fake_run_with_progress)
+    monkeypatch.setattr(duet_worker.subprocess, "run", fake_subprocess_run)
+    return calls
+
+
+def render(tmp_path, duration, encoder="libx264", threads=8, audio_mode="copy", infos=(INFO_A, INFO_B)):
+    args = ("a.mp4", "b.mp4", str(tmp_path / "out.part.mp4"), "A 的音频", "A 的时长", 135)
+    logs, progress = [], []
+    frames = render_segmented(args, infos[0], infos[1], audio_mode, duration, 30, encoder, threads,
+                              lambda *a: progress.append(a), logs.append)
+    return frames, logs, progress
+
+
+def segments_by_index(calls):
+    return sorted(calls["segments"], key=lambda cmd: cmd[-1])
+
+
+def test_segment_boundaries_are_frame_aligned(tmp_path, fake_ffmpeg):
+    frames, logs, progress = render(tmp_path, 150.0)
+    commands = segments_by_index(fake_ffmpeg)
+    # 150秒×30帧，每段60秒：1800 + 1800 + 900 帧
+    assert [int(option(cmd, "-frames:v")) for cmd in commands] == [1800, 1800, 900]
+    assert frames == 4500
+    # A是基准直接定位到段起点；B只有50秒需要循环，按源时长取模定位
+    assert [option(cmd, "-ss", 0) for cmd in commands] == ["0.000000", "60.000000", "120.000000"]
+    assert [option(cmd, "-ss", 1) for cmd in commands] == ["0.000000", "10.000000", "20.000000"]
+    assert all(cmd.count("-stream_loop") == 1 for cmd in commands)
+    assert "共3段，同时编码3段，每段线程数2" in logs[0]
+    assert progress[-1][1] == 4500 and progress[-1][3] == 1.0
+
+
+def test_segment_count_for_exact_and_partial_minutes(tmp_path, fake_ffmpeg):
+    render(tmp_path, 120.0)
+    assert [int(option(cmd, "-frames:v")) for cmd in segments_by_index(fake_ffmpeg)] == [1800, 1800]
+    fake_ffmpeg["segments"].clear()
+    render(tmp_path, 60.5)
+    assert [int(option(cmd, "-frames:v")) for cmd in segments_by_index(fake_ffmpeg)] == [1800, 15]
+
+
+def test_hardware_encoder_limits_parallel_segments(tmp_path, fake_ffmpeg):
+    _, logs, _ = render(tmp_path, 300.0, encoder="h264_nvenc", threads=16)
+    assert len(fake_ffmpeg["segments"]) == 5
+    assert "同时编码2段，每段线程数8" in logs[0]
+
+
+def test_concat_copies_video_and_muxes_whole_audio(tmp_path, fake_ffmpeg):
+    render(tmp_path, 150.0)
+    cmd = fake_ffmpeg["concat"]
+    assert len(fake_ffmpeg["concat_list"]) == 3
+    assert fake_ffmpeg["concat_list"][0].endswith("0000.mkv'")
+    assert cmd[cmd.index("-map") + 1] == "0:v:0" and option(cmd, "-c:v") == "copy"
+    # 整段音频来自A（额外输入1），直接复制
+    assert option(cmd, "-i", 1) == "a.mp4"
+    assert option(cmd, "-map", 1) == "1:a:0" and option(cmd, "-c:a") == "copy"
+    assert option(cmd, "-t") == "150.000000"
+    # 分段目录在结束后清理
+    assert not os.path.exists(str(tmp_path / "out.part.mp4.segments"))
+
+
+def test_failed_segment_raises_and_cleans_up(tmp_path, fake_ffmpeg):
+    fake_ffmpeg["fail"].add(1)
+    with pytest.raises(RuntimeError, match="第2段编码失败"):
+        render(tmp_path, 150.0)
+    assert fake_ffmpeg["concat"] is None
+    assert not os.path.exists(str(tmp_path / "out.part.mp4.segments"))
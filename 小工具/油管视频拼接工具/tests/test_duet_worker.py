@@ -0,0 +1,141 @@
+import io
+import threading
+
+import numpy as np
+
+import duet_worker
+from duet_worker import FrameReader, BASE_FRAME_BUFFERS, get_alpha_ramp, blend_into
+
+SHAPE = (4, 3, 3)
+
+
+def make_stream(count):
+    """count帧rgb24数据，第i帧所有字节都是i"""
+    frame_bytes = SHAPE[0] * SHAPE[1] * SHAPE[2]
+    return io.BytesIO(b"".join(bytes([i]) * frame_bytes for i in range(count)))
+
+
+def consume(reader, timeout=5):
+    """按process_single_pair_bounded主循环的方式读帧：持有当前帧，拿到下一帧后才归还"""
+    seen = []
+
+    def run():
+        current = None
+        while True:
+            frame = reader.read()
+            if frame is None:
+                return
+            if current is not None:
+                reader.release(current)
+            current = frame
+            seen.append(int(frame[0, 0, 0]))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"读帧卡住（已读到 {seen}）"
+    return seen
+
+
+def test_frame_reader_with_exhausted_semaphore():
+    semaphore = threading.Semaphore(0)
+    reader = FrameReader(make_stream(10), SHAPE, max_buffers=6, semaphore=semaphore)
+    try:
+        assert consume(reader) == list(range(10))
+        assert reader.buffers == BASE_FRAME_BUFFERS
+        assert reader.permits == 0
+    finally:
+        reader.close()
+
+
+def test_frame_reader_single_buffer_request_does_not_hang():
+    reader = FrameReader(make_stream(5), SHAPE, max_buffers=1)
+    try:
+        assert consume(reader) == list(range(5))
+    finally:
+        reader.close()
+
+
+def test_frame_reader_returns_readahead_permits():
+    semaphore = threading.Semaphore(3)
+    reader = FrameReader(make_stream(20), SHAPE, max_buffers=BASE_FRAME_BUFFERS + 2, semaphore=semaphore)
+    assert consume(reader) == list(range(20))
+    assert reader.buffers <= BASE_FRAME_BUFFERS + 2
+    reader.close()
+    # 关闭后许可全部归还
+    assert all(semaphore.acquire(False) for _ in range(3))
+
+
+def test_frame_reader_drops_partial_trailing_frame():
+    stream = io.BytesIO(make_stream(3).getvalue() + b"\x09" * 5)
+    reader = FrameReader(stream, SHAPE)
+    try:
+        assert consume(reader) == [0, 1, 2]
+    finally:
+        reader.close()
+
+
+def test_process_pool_semaphore_scales_with_workers(monkeypatch):
+    captured = {}
+
+    class FakeContext:
+        def Semaphore(self, value):
+            captured["permits"] = value
+            return value
+
+    class FakeManager:
+        def __init__(self, ctx):
+            pass
+
+        def start(self, initializer):
+            pass
+
+        def Queue(self):
+            return None
+
+    monkeypatch.setattr(duet_worker.multiprocessing, "get_context", lambda method: FakeContext())
+    monkeypatch.setattr(duet_worker, "SyncManager", FakeManager)
+    monkeypatch.setattr(duet_worker, "ProcessPoolExecutor", lambda **kwargs: kwargs)
+    duet_worker.create_process_pool(3)
+    assert captured["permits"] == 3 * duet_worker.READERS_PER_JOB * duet_worker.READAHEAD_FRAMES
+
+
+def test_alpha_ramp_shape_and_direction():
+    left = get_alpha_ramp(10, 4, "left")
+    right = get_alpha_ramp(10, 4, "right")
+    assert left.dtype == np.uint8 and left.shape == (10,)
+    assert list(left[:6]) == [255] * 6 and left[-1] == 0
+    assert list(right[4:]) == [255] * 6 and right[0] == 0
+    assert list(left[-4:]) == list(right[:4][::-1])
+    assert not left.flags.writeable
+    assert list(get_alpha_ramp(5, 0, "left")) == [255] * 5
+    # 重叠超过宽度时只保留对应的一段渐变
+    assert get_alpha_ramp(3, 6, "left").shape == (3,)
+
+
+def test_blend_into_matches_float_reference():
+    rng = np.random.default_rng(0)
+    canvas = rng.integers(0, 256, (6, 12, 3), dtype=np.uint8)
+    frame = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    alpha = get_alpha_ramp(8, 5, "right")
+    expected = canvas.copy()
+    a = alpha[None, :, None].astype(np.float64) / 255
+    expected[:, 4:12] = np.rint(frame * a + canvas[:, 4:12] * (1 - a)).astype(np.uint8)
+
+    blend_into(canvas, frame, 4, alpha)
+    assert np.abs(canvas.astype(int) - expected.astype(int)).max() <= 1
+    # 完全不透明的列原样复制
+    assert np.array_equal(canvas[:, 9:12], frame[:, 5:8])
+
+
+def test_blend_into_clips_to_canvas():
+    canvas = np.zeros((4, 6, 3), dtype=np.uint8)
+    frame = np.full((4, 5, 3), 200, dtype=np.uint8)
+    alpha = get_alpha_ramp(5, 0, "left")
+    blend_into(canvas, frame, -2, alpha)
+    assert (canvas[:, :3] == 200).all() and (canvas[:, 3:] == 0).all()
+    blend_into(canvas, frame, 4, alpha)
+    assert (canvas[:, 4:] == 200).all()
+    before = canvas.copy()
+    blend_into(canvas, frame, 10, alpha)
+    assert np.array_equal(canvas, before)